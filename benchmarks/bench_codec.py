@@ -0,0 +1,40 @@
+"""
+Compares the JSON codecs installed on realistic pages of contacts, decoding
+the raw response bytes and encoding the normalized contacts sent on save.
+
+Usage: python -m benchmarks.bench_codec [contacts per page] [attributes] [value size]
+"""
+import json
+import sys
+import timeit
+from ganapi.codec import CODECS, available_codecs
+from benchmarks.standin_server import Dataset
+
+
+def main(page_size=100, attributes=20, value_size=32):
+    dataset = Dataset(contacts=page_size, attributes=attributes, value_size=value_size)
+    contacts = [dataset.contacts[email] for email in sorted(dataset.contacts)]
+    page = json.dumps({'count': page_size, 'next': None, 'previous': None, 'results': contacts})
+    payloads = [dict((key, contact[key]) for key in ('email', 'first_name', 'last_name', 'attributes', 'lists'))
+                for contact in contacts]
+    print 'page of {contacts} contacts, {size} KB'.format(contacts=page_size, size=len(page) // 1024)
+
+    codecs = available_codecs()
+    missing = [name for name, factory in CODECS if name not in [codec.name for codec in codecs]]
+    results = []
+    for codec in codecs:
+        decode = min(timeit.repeat(lambda: codec.decode(page), number=20, repeat=3)) / 20
+        encode = min(timeit.repeat(lambda: [codec.encode(payload) for payload in payloads], number=20, repeat=3)) / 20
+        results.append((codec.name, decode, encode))
+    stdlib = dict((name, (decode, encode)) for name, decode, encode in results)['json']
+    for name, decode, encode in results:
+        print '{name:<12} decode {decode:>8.3f} ms/page {rate:>7.1f} MB/s {decode_speedup:>6.2f}x  ' \
+              'encode {encode:>8.3f} ms/page {encode_speedup:>6.2f}x'.format(
+                  name=name, decode=decode * 1000, rate=len(page) / decode / 1e6, decode_speedup=stdlib[0] / decode,
+                  encode=encode * 1000, encode_speedup=stdlib[1] / encode)
+    if missing:
+        print 'not installed: {names}'.format(names=', '.join(missing))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:4]])
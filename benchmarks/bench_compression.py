@@ -0,0 +1,46 @@
+"""
+Saves contacts with large attributes to the local stand-in server with and
+without gzip request compression, and reads them back with and without
+compressed responses, reporting the bytes on the wire and the time taken.
+
+Usage: python -m benchmarks.bench_compression [contacts] [attributes] [value size]
+"""
+import sys
+import time
+from ganapi import Api, ContactManager
+from benchmarks.standin_server import Dataset, StandinServer
+
+
+def run(contacts, attributes, value_size, compress):
+    dataset = Dataset(contacts=contacts, attributes=attributes, value_size=value_size)
+    with StandinServer(dataset=dataset, compress_responses=compress) as server:
+        api = Api('token', base_uri=server.base_uri, compress_threshold=1024 if compress else None)
+        manager = ContactManager(api)
+        api.batch_size = 100
+        started = time.time()
+        for email in sorted(dataset.contacts):
+            contact = manager.create()
+            contact.email = email
+            contact.attributes = dict(dataset.contacts[email]['attributes'])
+            contact.overwrite()
+        saved = time.time() - started
+        started = time.time()
+        count = sum(1 for _ in manager.all(mode='dict'))
+        read = time.time() - started
+        api.close()
+        assert count == contacts
+        stats = server.stats
+    print '{label:<12} sent {sent:>8} KB in {saved:>6.2f}s ({requests} gzipped)  ' \
+          'received {received:>8} KB in {read:>6.2f}s ({responses} gzipped)'.format(
+              label='gzip' if compress else 'identity', sent=stats['bytes_received'] // 1024, saved=saved,
+              requests=stats['compressed_requests'], received=stats['bytes_sent'] // 1024, read=read,
+              responses=stats['compressed_responses'])
+
+
+def main(contacts=500, attributes=50, value_size=64):
+    for compress in (False, True):
+        run(contacts, attributes, value_size, compress)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:4]])
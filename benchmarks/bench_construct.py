@@ -0,0 +1,107 @@
+"""
+Compares the dir() based entity construction and normalization used before
+field schemas with the compiled constructors and slot-based entities, and the
+eager entities with the lazy ones in a scan reading a single field.
+
+Usage: python -m benchmarks.bench_construct [records]
+"""
+import sys
+import timeit
+from ganapi import Api, Contact, ContactManager, ListManager
+
+
+class LegacyContact():
+    email = None
+    attributes = None
+    first_name = None
+    last_name = None
+    lists = None
+    url = None
+    active = None
+    updated = None
+    created = None
+
+    def __init__(self, manager):
+        self.manager = manager
+
+    def save(self, overwrite=False):
+        return self.manager.save(self, overwrite)
+
+
+def legacy_construct(manager, data):
+    entity = LegacyContact(manager)
+    for property in dir(entity):
+        if property in data:
+            setattr(entity, property, data[property])
+    return entity
+
+
+def legacy_normalize(manager, entity):
+    data = {}
+    for property in manager.writable_fields:
+        if getattr(entity, property):
+            data[property] = getattr(entity, property)
+
+    if not isinstance(data.get('attributes'), type(dict())):
+        data['attributes'] = dict()
+
+    list_manager = ListManager(manager.api)
+    data['lists'] = []
+    if isinstance(getattr(entity, 'lists'), type([])):
+        for list in entity.lists:
+            if isinstance(list, list_manager.entity_class):
+                norm = list_manager.normalize_entity(list)
+                norm['hash'] = list.hash
+            else:
+                norm = list
+
+            data['lists'].append(norm)
+    return data
+
+
+def contact_data(i):
+    return {'url': 'https://api.getanewsletter.com/v3/contacts/contact{0}@example.com/'.format(i),
+            'email': 'contact{0}@example.com'.format(i),
+            'first_name': 'First',
+            'last_name': 'Last',
+            'attributes': {'city': 'Stockholm', 'zip': '11122'},
+            'lists': [{'hash': '2anfLVM', 'name': 'Test list'}],
+            'active': True,
+            'created': '2016-02-05T16:21:41',
+            'updated': '2016-02-08T14:40:17'}
+
+
+def report(label, legacy, compiled, records):
+    print '{label:<12} legacy {legacy:>8.2f} us  compiled {compiled:>8.2f} us  speedup {speedup:.2f}x'.format(
+        label=label, legacy=legacy / records * 1e6, compiled=compiled / records * 1e6, speedup=legacy / compiled)
+
+
+def main(records=100000):
+    manager = ContactManager(Api('token'))
+    rows = [contact_data(i) for i in range(records)]
+
+    legacy = min(timeit.repeat(lambda: [legacy_construct(manager, row) for row in rows], number=1, repeat=3))
+    compiled = min(timeit.repeat(lambda: [manager.construct_entity(row) for row in rows], number=1, repeat=3))
+    report('construct', legacy, compiled, records)
+
+    # A scan reading a single field of every record.
+    eager = min(timeit.repeat(lambda: [manager.construct_entity(row).email for row in rows], number=1, repeat=3))
+    lazy = min(timeit.repeat(lambda: [Contact.from_data(manager, row, lazy=True).email for row in rows],
+                             number=1, repeat=3))
+    print '{label:<12} eager  {eager:>8.2f} us  lazy     {lazy:>8.2f} us  speedup {speedup:.2f}x'.format(
+        label='scan', eager=eager / records * 1e6, lazy=lazy / records * 1e6, speedup=eager / lazy)
+
+    legacy_entities = [legacy_construct(manager, row) for row in rows]
+    entities = [manager.construct_entity(row) for row in rows]
+    legacy = min(timeit.repeat(lambda: [legacy_normalize(manager, e) for e in legacy_entities],
+                               number=1, repeat=3))
+    compiled = min(timeit.repeat(lambda: [manager.normalize_entity(e) for e in entities], number=1, repeat=3))
+    report('normalize', legacy, compiled, records)
+
+    legacy_size = sys.getsizeof(legacy_entities[0]) + sys.getsizeof(legacy_entities[0].__dict__)
+    print 'bytes per entity: legacy {legacy}  slots {slots}'.format(legacy=legacy_size,
+                                                                    slots=sys.getsizeof(entities[0]))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,64 @@
+"""
+Answers segment queries ("in list A and B but not C") over synthetic
+subscriptions, comparing the MembershipIndex bitsets with a scan calling
+Contact.hash_in_contacts_lists for every contact.
+
+Usage: python -m benchmarks.bench_membership [contacts] [lists] [subscription rate]
+"""
+import random
+import sys
+import time
+from ganapi import Contact
+from ganapi import membership
+from ganapi.membership import MembershipIndex
+
+
+def main(contacts=1000000, lists=20, rate=0.2):
+    random.seed(1)
+    hashes = ['list{i}'.format(i=i) for i in range(lists)]
+    rows = [('contact{i}@example.com'.format(i=i),
+             [{'hash': hash, 'subscription_cancelled': None if random.random() < 0.9 else '2016-02-15T06:50:44Z'}
+              for hash in hashes if random.random() < rate])
+            for i in xrange(contacts)]
+    a, b, c = hashes[:3]
+
+    started = time.time()
+    matches = []
+    for email, subscriptions in rows:
+        active = [subscription for subscription in subscriptions if not subscription['subscription_cancelled']]
+        if Contact.hash_in_contacts_lists(a, active) and Contact.hash_in_contacts_lists(b, active) \
+                and not Contact.hash_in_contacts_lists(c, subscriptions):
+            matches.append(email)
+    print 'scan            {elapsed:>9.1f} ms  {count} contacts'.format(elapsed=(time.time() - started) * 1000,
+                                                                     count=len(matches))
+
+    for backend in ('numpy', 'python'):
+        if backend == 'python':
+            membership.numpy = None
+        elif membership.numpy is None:
+            continue
+        started = time.time()
+        index = MembershipIndex()
+        for email, subscriptions in rows:
+            index.add(email, subscriptions)
+        for hash in hashes:
+            index.subscribers(hash, 'all')
+        built = time.time() - started
+        queried = float('inf')
+        for _ in range(5):
+            started = time.time()
+            segment = index.subscribers(a) & index.subscribers(b) - index.subscribers(c, 'all')
+            count = len(segment)
+            queried = min(queried, time.time() - started)
+        started = time.time()
+        emails = segment.emails()
+        listed = time.time() - started
+        assert emails == matches
+        print '{backend:<6} build   {built:>9.1f} ms  query + count {queried:.2f} ms  emails {listed:.1f} ms  ' \
+              '{count} contacts'.format(backend=backend, built=built * 1000, queried=queried * 1000,
+                                        listed=listed * 1000, count=count)
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:4]
+    main(*[int(arg) for arg in args[:2]] + [float(arg) for arg in args[2:]])
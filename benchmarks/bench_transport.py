@@ -0,0 +1,62 @@
+"""
+Compares a fresh connection per request with the pooled keep-alive transport of Api.
+
+Usage: python -m benchmarks.bench_transport [requests] [threads]
+"""
+import sys
+import threading
+import time
+import requests
+from ganapi import Api, ContactManager
+from benchmarks.standin_server import Dataset, StandinServer
+
+CONTACTS = 1000
+
+
+def unpooled_get(api, resource_path):
+    # The transport used before Api owned a session: one connection per call.
+    uri = u'{base_uri}{resource_path}'.format(base_uri=api.base_uri, resource_path=resource_path)
+    response = requests.get(uri, headers=api.headers)
+    response.raise_for_status()
+    return response
+
+
+def run(label, func, total, threads):
+    per_thread = total // threads
+
+    def worker():
+        for i in range(per_thread):
+            func(i)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.time()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.time() - started
+    print '{label:<32} {rate:>10.1f} req/s'.format(label=label, rate=per_thread * threads / elapsed)
+    return per_thread * threads / elapsed
+
+
+def contact_path(i):
+    return 'contacts/contact{0}@example.com/'.format(i % CONTACTS)
+
+
+def main(total=2000, threads=1):
+    with StandinServer(dataset=Dataset(contacts=CONTACTS)) as server:
+        api = Api('token', base_uri=server.base_uri, pool_maxsize=max(threads, 10))
+        threaded_api = Api('token', base_uri=server.base_uri, session_per_thread=True)
+        manager = ContactManager(api)
+
+        baseline = run('new connection per call', lambda i: unpooled_get(api, contact_path(i)), total, threads)
+        pooled = run('pooled Api.call', lambda i: api.call('GET', contact_path(i)), total, threads)
+        run('pooled ContactManager.get', lambda i: manager.get('contact{0}@example.com'.format(i % CONTACTS)),
+            total, threads)
+        run('session per thread Api.call', lambda i: threaded_api.call('GET', contact_path(i)), total, threads)
+        print 'speedup: {speedup:.2f}x'.format(speedup=pooled / baseline)
+        api.close()
+        threaded_api.close()
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
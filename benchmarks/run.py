@@ -0,0 +1,191 @@
+"""
+Offline benchmark suite.
+
+Runs repeatable benchmarks of the managers against the local stand-in API
+server and reports the throughput, the p50/p99 latency and the peak memory
+of every benchmark. Results can be saved as JSON and compared with a
+previous run to catch regressions.
+
+Usage:
+    python -m benchmarks.run --save baseline.json
+    python -m benchmarks.run --compare baseline.json --threshold 0.1
+    python -m benchmarks.run --latency 0.005 --error-rate 0.01 --only get,all
+"""
+import argparse
+import json
+import platform
+import random
+import resource
+import sys
+import time
+from ganapi import Api, ContactManager, RetryPolicy
+from benchmarks.standin_server import Dataset, StandinServer
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def measure(operation, iterations):
+    """
+        Calls operation(i) for every iteration and records the latency of each call.
+
+        :return: dict with the statistics.
+    """
+    latencies = []
+    started = time.time()
+    for i in xrange(iterations):
+        call_started = time.time()
+        operation(i)
+        latencies.append(time.time() - call_started)
+    return summarize(latencies, time.time() - started)
+
+
+def measure_iterator(iterator):
+    """
+        Records the latency of every next() call of an iterator.
+
+        :return: dict with the statistics.
+    """
+    latencies = []
+    started = time.time()
+    while True:
+        call_started = time.time()
+        try:
+            next(iterator)
+        except StopIteration:
+            break
+        latencies.append(time.time() - call_started)
+    return summarize(latencies, time.time() - started)
+
+
+def summarize(latencies, seconds):
+    return {'ops': len(latencies),
+            'seconds': seconds,
+            'ops_per_sec': len(latencies) / seconds if seconds else 0.0,
+            'p50_ms': percentile(latencies, 0.5) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+
+class Benchmarks(object):
+    """
+        The benchmarks, one method per benchmark.
+
+        :param api The Api connected to the stand-in server.
+        :param dataset The Dataset served.
+        :param iterations The number of operations of the per-call benchmarks.
+    """
+    names = ('get', 'save', 'query', 'all', 'all_prefetch', 'paginated_next')
+
+    def __init__(self, api, dataset, iterations):
+        self.api = api
+        self.manager = ContactManager(api)
+        self.emails = sorted(dataset.contacts)
+        self.iterations = iterations
+        self.random = random.Random(0)
+
+    def random_email(self):
+        return self.emails[self.random.randrange(len(self.emails))]
+
+    def get(self):
+        return measure(lambda i: self.manager.get(self.random_email()), self.iterations)
+
+    def save(self):
+        def save(i):
+            contact = self.manager.create()
+            contact.email = self.random_email()
+            contact.first_name = 'Name{0}'.format(i)
+            contact.set_persisted()
+            contact.save()
+        return measure(save, self.iterations)
+
+    def query(self):
+        return measure(lambda i: self.manager.query({'search_email': 'contact{0}'.format(i % 10)}), self.iterations)
+
+    def all(self):
+        return measure_iterator(iter(self.manager.all()))
+
+    def all_prefetch(self):
+        return measure_iterator(iter(self.manager.all(prefetch=4)))
+
+    def paginated_next(self):
+        result_set = self.manager.query({'paginate_by': self.api.batch_size})
+        return measure_iterator(iter(result_set))
+
+
+def compare(results, baseline, threshold):
+    """
+        Prints the change of every benchmark against a baseline.
+
+        :return: list with the names of the benchmarks whose throughput dropped by more than threshold.
+    """
+    regressions = []
+    print '\n{name:<16} {ops:>12} {p99:>12}'.format(name='vs baseline', ops='ops/s', p99='p99')
+    for name, result in sorted(results.items()):
+        previous = baseline.get(name)
+        if not previous or not previous['ops_per_sec']:
+            continue
+        change = result['ops_per_sec'] / previous['ops_per_sec'] - 1
+        p99_change = result['p99_ms'] / previous['p99_ms'] - 1 if previous['p99_ms'] else 0.0
+        flag = ''
+        if change < -threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print '{name:<16} {change:>+11.1%} {p99:>+11.1%}{flag}'.format(name=name, change=change, p99=p99_change,
+                                                                       flag=flag)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks against a local stand-in API server.')
+    parser.add_argument('--contacts', type=int, default=2000, help='number of contacts served')
+    parser.add_argument('--attributes', type=int, default=5, help='number of attributes of every contact')
+    parser.add_argument('--value-size', type=int, default=16, help='length of the attribute values')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='probability of a 503 response')
+    parser.add_argument('--batch-size', type=int, default=100, help='Api.batch_size used by all()')
+    parser.add_argument('--iterations', type=int, default=500, help='operations of the per-call benchmarks')
+    parser.add_argument('--only', help='comma separated benchmark names')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='compare with the results in this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.1, help='throughput drop reported as regression')
+    args = parser.parse_args(argv)
+
+    names = args.only.split(',') if args.only else Benchmarks.names
+    dataset = Dataset(contacts=args.contacts, attributes=args.attributes, value_size=args.value_size)
+    results = {}
+    with StandinServer(dataset=dataset, latency=args.latency, error_rate=args.error_rate) as server:
+        # The stand-in server fails before handling a request, so every method is safe to retry.
+        retry_policy = RetryPolicy(max_retries=10, backoff_factor=0, methods=Api.http_methods)
+        api = Api('token', base_uri=server.base_uri, retry_policy=retry_policy)
+        api.batch_size = args.batch_size
+        benchmarks = Benchmarks(api, dataset, args.iterations)
+        print '{name:<16} {ops:>8} {rate:>12} {p50:>10} {p99:>10} {rss:>12}'.format(
+            name='benchmark', ops='ops', rate='ops/s', p50='p50 ms', p99='p99 ms', rss='peak rss kb')
+        for name in names:
+            result = results[name] = getattr(benchmarks, name)()
+            print '{name:<16} {ops:>8} {ops_per_sec:>12.1f} {p50_ms:>10.3f} {p99_ms:>10.3f} {peak_rss_kb:>12}'.format(
+                name=name, **result)
+        api.close()
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'meta': {'time': time.time(),
+                                'python': platform.python_version(),
+                                'config': vars(args)},
+                       'results': results}, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f)['results'], args.threshold)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,274 @@
+"""
+A local stand-in for the Get a Newsletter API used by the benchmarks.
+
+It emulates the contacts/, lists/ and attributes/ endpoints on an in-memory
+dataset, with the same pagination as the API (count, next and previous
+links, page and paginate_by parameters), and can add latency and random
+503 errors to every response.
+
+It speaks HTTP/1.1 so that clients are able to keep connections alive,
+accepts gzipped request bodies and can gzip its responses. The bytes and
+the compressed messages seen on the wire are counted in server.stats.
+"""
+import BaseHTTPServer
+import SocketServer
+import json
+import random
+import socket
+import threading
+import time
+import urllib
+import urlparse
+import zlib
+
+
+class Dataset(object):
+    """
+        The entities served by the stand-in server.
+
+        :param contacts The number of contacts.
+        :param lists The number of lists.
+        :param attributes The number of attributes; every contact has a value for each of them.
+        :param value_size The length of the attribute values, to tune the payload size.
+        :param seed Seed of the generated data.
+    """
+    def __init__(self, contacts=1000, lists=10, attributes=5, value_size=16, seed=0):
+        rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.lists = dict((hash, {'hash': hash,
+                                  'name': 'List {0}'.format(i),
+                                  'email': 'sender@example.com',
+                                  'sender': 'Sender',
+                                  'description': '',
+                                  'created': '2016-02-05T13:38:26',
+                                  'responders': []})
+                          for i, hash in enumerate('list{0:04d}'.format(i) for i in range(lists)))
+        self.attributes = dict((code, {'name': code, 'code': code, 'usage_count': contacts})
+                               for code in ('attr{0}'.format(i) for i in range(attributes)))
+        hashes = sorted(self.lists)
+        self.contacts = {}
+        for i in range(contacts):
+            email = 'contact{0}@example.com'.format(i)
+            self.contacts[email] = {
+                'email': email,
+                'first_name': 'First{0}'.format(i),
+                'last_name': 'Last{0}'.format(i),
+                'attributes': dict((code, ''.join(rng.choice('abcdefghij') for _ in range(value_size)))
+                                   for code in self.attributes),
+                'lists': [{'hash': hash,
+                           'name': self.lists[hash]['name'],
+                           'subscription_id': i,
+                           'subscription_created': '2016-02-09T08:17:10Z',
+                           'subscription_cancelled': None if rng.random() > 0.1 else '2016-02-15T06:50:44Z'}
+                          for hash in hashes if rng.random() < 0.3],
+                'active': True,
+                'created': '2016-02-05T16:21:41',
+                'updated': '2016-02-08T14:40:17'
+            }
+
+    def collection(self, resource):
+        return {'contacts': self.contacts, 'lists': self.lists, 'attributes': self.attributes}[resource]
+
+
+class StandinHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Buffer the whole response so that headers and body leave in one segment.
+    wbufsize = -1
+    lookup_fields = {'contacts': 'email', 'lists': 'hash', 'attributes': 'code'}
+
+    def setup(self):
+        # Without TCP_NODELAY keep-alive clients stall on delayed ACKs.
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, data, headers=None):
+        body = json.dumps(data) if data is not None else ''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if self.server.compress_responses and len(body) >= self.server.compress_min_size \
+                and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            body = compressor.compress(body) + compressor.flush()
+            self.send_header('Content-Encoding', 'gzip')
+            self.server.count('compressed_responses')
+        self.server.count('bytes_sent', len(body))
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else ''
+        self.server.count('bytes_received', len(body))
+        if body and self.headers.get('Content-Encoding') == 'gzip':
+            body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+            self.server.count('compressed_requests')
+        return body
+
+    def url(self, resource, params):
+        return 'http://{host}/v3/{resource}/?{params}'.format(host=self.headers.get('Host'), resource=resource,
+                                                             params=urllib.urlencode(sorted(params.items())))
+
+    def route(self):
+        """
+            Applies the latency and error rate of the server.
+            :return: tuple (resource, id, query, body) or None if the request was answered with an error.
+        """
+        server = self.server
+        # Read the body first so that an error response leaves the kept-alive connection usable.
+        body = self.read_body()
+        if server.latency:
+            time.sleep(server.latency)
+        if server.error_rate and server.random() < server.error_rate:
+            self.send_json(503, {'detail': 'Service unavailable.'}, {'Retry-After': '0'})
+            return None
+        url = urlparse.urlparse(self.path)
+        parts = [urllib.unquote(part) for part in url.path.split('/') if part]
+        if len(parts) not in (2, 3) or parts[0] != 'v3' or parts[1] not in self.lookup_fields:
+            self.send_json(404, {'detail': 'Not found.'})
+            return None
+        return parts[1], parts[2] if len(parts) == 3 else None, dict(urlparse.parse_qsl(url.query)), body
+
+    def do_GET(self):
+        route = self.route()
+        if route is None:
+            return
+        resource, id, query, body = route
+        collection = self.server.dataset.collection(resource)
+        if id is not None:
+            with self.server.dataset.lock:
+                entity = collection.get(id)
+            if entity is None:
+                self.send_json(404, {'detail': 'Not found.'})
+            else:
+                self.send_json(200, entity)
+            return
+
+        paginate_by = int(query.get('paginate_by', 10))
+        page = int(query.get('page', 1))
+        with self.server.dataset.lock:
+            keys = sorted(collection)
+            search = query.get('search_email')
+            if search:
+                keys = [key for key in keys if key.startswith(search)]
+            results = [collection[key] for key in keys[(page - 1) * paginate_by:page * paginate_by]]
+        if page > 1 and not results:
+            self.send_json(404, {'detail': 'Invalid page.'})
+            return
+        next_link = previous_link = None
+        if page * paginate_by < len(keys):
+            next_link = self.url(resource, dict(query, page=page + 1))
+        if page > 1:
+            previous_link = self.url(resource, dict(query, page=page - 1))
+        self.send_json(200, {'count': len(keys), 'next': next_link, 'previous': previous_link, 'results': results})
+
+    def write(self, replace):
+        route = self.route()
+        if route is None:
+            return
+        resource, id, query, body = route
+        data = json.loads(body) if body else {}
+        lookup_field = self.lookup_fields[resource]
+        collection = self.server.dataset.collection(resource)
+        with self.server.dataset.lock:
+            if id is None:
+                id = data.get(lookup_field) or 'new{0}'.format(len(collection))
+                if id in collection:
+                    self.send_json(400, {lookup_field: ['Already exists.']})
+                    return
+                status = 201
+                entity = {lookup_field: id}
+            elif id in collection:
+                status = 200
+                entity = {lookup_field: id} if replace else dict(collection[id])
+            elif replace:
+                status = 201
+                entity = {lookup_field: id}
+            else:
+                self.send_json(404, {'detail': 'Not found.'})
+                return
+            entity.update(data)
+            entity['updated'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+            collection[id] = entity
+        self.send_json(status, entity)
+
+    def do_POST(self):
+        self.write(False)
+
+    def do_PATCH(self):
+        self.write(False)
+
+    def do_PUT(self):
+        self.write(True)
+
+    def do_DELETE(self):
+        route = self.route()
+        if route is None:
+            return
+        resource, id, query, body = route
+        with self.server.dataset.lock:
+            entity = self.server.dataset.collection(resource).pop(id, None)
+        if entity is None:
+            self.send_json(404, {'detail': 'Not found.'})
+        else:
+            self.send_json(204, None)
+
+
+class StandinServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+        :param dataset (optional) The Dataset to serve. Defaults to Dataset().
+        :param latency (optional) Seconds added to every response.
+        :param error_rate (optional) Probability of answering a request with 503 and Retry-After: 0.
+        :param seed (optional) Seed of the random errors.
+        :param compress_responses (optional) Gzip the responses to clients accepting it.
+        :param compress_min_size (optional) The minimum size of a compressed response body.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, handler=StandinHandler, dataset=None, latency=0.0, error_rate=0.0,
+                 seed=0, compress_responses=False, compress_min_size=1024):
+        BaseHTTPServer.HTTPServer.__init__(self, (host, port), handler)
+        self.dataset = dataset if dataset is not None else Dataset()
+        self.latency = latency
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.compress_responses = compress_responses
+        self.compress_min_size = compress_min_size
+        self.stats = dict.fromkeys(('bytes_received', 'bytes_sent', 'compressed_requests', 'compressed_responses'), 0)
+        self.thread = None
+
+    def count(self, stat, value=1):
+        with self._lock:
+            self.stats[stat] += value
+
+    def random(self):
+        with self._lock:
+            return self._random.random()
+
+    @property
+    def base_uri(self):
+        return 'http://{host}:{port}/v3/'.format(host=self.server_address[0],
+                                                 port=self.server_address[1])
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
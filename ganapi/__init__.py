@@ -1,8 +1,16 @@
-from api import Api
+from api import Api, RetryPolicy, TokenBucket
+from async_api import AsyncApi
 from attribute_manager import AttributeManager
 from contact_manager import ContactManager
 from list_manager import ListManager
+from async_managers import AsyncAttributeManager, AsyncContactManager, AsyncListManager
 from attribute import Attribute
 from contact import Contact
 from list import List
-from gan_exception import GanException
\ No newline at end of file
+from bulk import BulkReport, BulkResult, FetchReport
+from cache import LRUCache, SQLiteCache
+from codec import JsonCodec
+from scan import ScanCursor
+from session import FlushError, Session
+from gan_exception import GanException
+from metrics import Metrics
\ No newline at end of file
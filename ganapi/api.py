@@ -1,6 +1,150 @@
-import json
+import email.utils
+import random
+import threading
+import time
+import zlib
 import requests
+from requests.adapters import HTTPAdapter
+from codec import JsonCodec, get_codec
 from gan_exception import GanException
+from helpers import SingleFlight
+from metrics import endpoint_of
+
+
+class RetryPolicy(object):
+    """
+        Decides whether and when a failed call is retried.
+
+        Rate limited (429) and temporarily unavailable (502, 503, 504)
+        responses and connection errors are retried with exponential backoff
+        and full jitter. A Retry-After header sent by the service takes
+        precedence over the computed backoff. Only idempotent methods are
+        retried by default, since a POST or PATCH may have been applied
+        before the call failed. The exception is a 429: the service rejected
+        the call before doing anything, so it is retried for every method.
+
+        :param max_retries The maximum number of retries of a call.
+        :param backoff_factor The base delay in seconds; the n-th retry waits up to backoff_factor * 2 ** n.
+        :param max_backoff The maximum delay in seconds, Retry-After included.
+        :param methods The HTTP methods that may be retried.
+        :param statuses The HTTP status codes that are retried.
+        :param rejected_statuses (optional) The status codes retried for every method. Pass an empty set to
+            retry only the idempotent methods.
+    """
+    IDEMPOTENT_METHODS = frozenset(['GET', 'PUT', 'DELETE'])
+    RETRY_STATUSES = frozenset([429, 502, 503, 504])
+    REJECTED_STATUSES = frozenset([429])
+
+    def __init__(self, max_retries=3, backoff_factor=0.5, max_backoff=60,
+                 methods=IDEMPOTENT_METHODS, statuses=RETRY_STATUSES, rejected_statuses=REJECTED_STATUSES):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.methods = frozenset(methods)
+        self.statuses = frozenset(statuses)
+        self.rejected_statuses = frozenset(rejected_statuses)
+
+    def should_retry(self, method, attempt, response=None):
+        """
+            :param method string The HTTP method of the call.
+            :param attempt int The number of retries made so far.
+            :param response (optional) The response, None in case of a connection error.
+            :return: bool
+        """
+        if attempt >= self.max_retries:
+            return False
+        if response is None:
+            return method in self.methods
+        if response.status_code in self.rejected_statuses:
+            return True
+        return method in self.methods and response.status_code in self.statuses
+
+    def backoff(self, attempt):
+        """
+            :param attempt int The number of retries made so far.
+            :return: a random delay between 0 and the exponential backoff of the attempt.
+        """
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * (2 ** attempt)))
+
+    def delay(self, attempt, response=None):
+        """
+            :param attempt int The number of retries made so far.
+            :param response (optional) The response to honor the Retry-After header of.
+            :return: the number of seconds to wait before the next attempt.
+        """
+        retry_after = self.retry_after(response) if response is not None else None
+        if retry_after is not None:
+            return min(self.max_backoff, retry_after)
+        return self.backoff(attempt)
+
+    @staticmethod
+    def retry_after(response):
+        """
+            Parses the Retry-After header, given either in seconds or as an HTTP date.
+
+            :return: the number of seconds to wait or None.
+        """
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            parsed = email.utils.parsedate_tz(value)
+            if parsed is None:
+                return None
+            return max(0.0, email.utils.mktime_tz(parsed) - time.time())
+
+
+class TokenBucket(object):
+    """
+        Client-side rate limiter shared by every manager using the same Api.
+
+        Holds up to `capacity` tokens refilled at `rate` tokens per second;
+        every call takes one token, waiting when the bucket is empty.
+
+        :param rate The sustained number of calls per second.
+        :param capacity (optional) The burst size. Defaults to rate.
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.time()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Locks can not be pickled, the copy gets its own.
+        state = dict(self.__dict__)
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+            Takes a token, sleeping until one is available.
+        """
+        while True:
+            with self._lock:
+                now = time.time()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """
+            Holds back all calls for the given number of seconds, e.g. after a Retry-After.
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.time() + seconds)
 
 
 class Api(object):
@@ -19,19 +163,197 @@ class Api(object):
         :var batch_size int
     """
     batch_size = 25
+
+    """
+        The HTTP methods accepted by call()
+        :var http_methods tuple
+    """
+    http_methods = ('GET', 'POST', 'DELETE', 'PUT', 'PATCH')
+
+    """
+        The number of per-host connection pools kept by the transport
+        :var pool_connections int
+    """
+    pool_connections = 10
+
+    """
+        The maximum number of keep-alive connections kept in each per-host pool
+        :var pool_maxsize int
+    """
+    pool_maxsize = 10
+
+    """
+        Whether to wait for a free connection when a pool is exhausted instead
+        of opening an extra connection that is discarded after use
+        :var pool_block bool
+    """
+    pool_block = False
+
+    """
+        The gzip compression level of the request bodies, see compress_threshold
+        :var compress_level int
+    """
+    compress_level = 6
     """
         Initializes the API connection
         :param string token The security token.
         :param string base_uri (optional) Alternative API base URI.
+        :param int pool_connections (optional) Number of per-host connection pools.
+        :param int pool_maxsize (optional) Maximum keep-alive connections per host.
+        :param bool pool_block (optional) Block when a pool has no free connection.
+        :param bool keep_alive (optional) Reuse connections between calls. True by default.
+        :param bool session_per_thread (optional) Give every thread its own session and pool.
+        :param validator_cache (optional) Cache (e.g. LRUCache) for the validators and bodies of GET responses.
+            When set, GET requests are made conditional and 304 responses are rebuilt from the stored body.
+        :param RetryPolicy retry_policy (optional) The retry policy. Defaults to RetryPolicy(), pass False to disable retries.
+        :param TokenBucket rate_limiter (optional) Limits the rate of the calls made through this Api.
+        :param Metrics metrics (optional) Registry recording the latency, sizes, retries and status codes of the
+            calls and the time spent decoding and constructing entities.
+        :param bool coalesce_gets (optional) Let concurrent GET calls of the same resource share one request,
+            its response and the decoded data.
+        :param codec (optional) The JsonCodec, or the name of one, used for the request and response bodies.
+            Defaults to the fastest codec installed, see codec.get_codec().
+        :param int compress_threshold (optional) Gzip request bodies of at least this many bytes. None (default)
+            sends all bodies uncompressed.
     """
 
-    def __init__(self, token, base_uri=None):
+    def __init__(self, token, base_uri=None, pool_connections=None, pool_maxsize=None,
+                 pool_block=None, keep_alive=True, session_per_thread=False, validator_cache=None,
+                 retry_policy=None, rate_limiter=None, metrics=None, coalesce_gets=False,
+                 codec=None, compress_threshold=None):
         self.token = token
         self.base_uri = base_uri if base_uri else self.default_base_uri
         self.headers = {'Accept': 'application/json',
+                        'Accept-Encoding': 'gzip, deflate',
                         'Authorization': 'Token {token}'.format(token=self.token),
                         'content-type': 'application/json'
         }
+        if pool_connections is not None:
+            self.pool_connections = pool_connections
+        if pool_maxsize is not None:
+            self.pool_maxsize = pool_maxsize
+        if pool_block is not None:
+            self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.session_per_thread = session_per_thread
+        self.validator_cache = validator_cache
+        self.retry_policy = RetryPolicy() if retry_policy is None else retry_policy
+        self.rate_limiter = rate_limiter
+        self.metrics = metrics
+        self.hooks = {'pre_request': [], 'post_request': []}
+        self.single_flight = SingleFlight() if coalesce_gets else None
+        self.codec = codec if isinstance(codec, JsonCodec) else get_codec(codec)
+        self.compress_threshold = compress_threshold
+
+        self._session = None
+        self._sessions = []
+        self._local = threading.local()
+        self._session_lock = threading.Lock()
+
+    def __getstate__(self):
+        # The pooled connections are not pickled, the copy opens its own on demand.
+        state = dict(self.__dict__)
+        for name in ('_session', '_sessions', '_local', '_session_lock'):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._session = None
+        self._sessions = []
+        self._local = threading.local()
+        self._session_lock = threading.Lock()
+
+    def create_session(self):
+        """
+            Creates a requests session with a pooled keep-alive transport.
+
+            Override this method if you need to mount custom adapters or
+            configure proxies, certificates etc.
+
+            :return: requests.Session
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=self.pool_maxsize,
+                              pool_block=self.pool_block)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+        return session
+
+    @property
+    def session(self):
+        """
+            The session used by the calling thread.
+
+            All managers sharing this Api reuse the same connection pool, or
+            one pool per thread if session_per_thread is set.
+
+            :return: requests.Session
+        """
+        if self.session_per_thread:
+            session = getattr(self._local, 'session', None)
+            if session is None:
+                session = self._local.session = self.create_session()
+                with self._session_lock:
+                    self._sessions.append(session)
+            return session
+
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self.create_session()
+                    self._sessions.append(self._session)
+        return self._session
+
+    def close(self):
+        """
+            Closes all pooled connections. The Api can still be used afterwards,
+            new connections will be opened on demand.
+        """
+        with self._session_lock:
+            sessions, self._sessions = self._sessions, []
+            self._session = None
+            self._local = threading.local()
+        for session in sessions:
+            session.close()
+
+    def add_hook(self, event, hook):
+        """
+            Registers a callback invoked around every call.
+
+            'pre_request' hooks are called as hook(method, resource_path, payload) before
+            the request is sent, 'post_request' hooks as hook(method, resource_path, response, seconds)
+            once it completed, retries included. The response is None if the call failed to connect.
+
+            :param string event 'pre_request' or 'post_request'.
+            :param hook The callback.
+            :raises GanException in case of an unknown event.
+        """
+        if event not in self.hooks:
+            raise GanException(u'Invalid hook event',
+                               u'{event} is not a valid hook event! Valid events are pre_request, post_request.'.format(event=event))
+        self.hooks[event].append(hook)
+
+    def remove_hook(self, event, hook):
+        """
+            Unregisters a callback added with add_hook().
+
+            :return: bool True if the hook was registered.
+        """
+        try:
+            self.hooks[event].remove(hook)
+        except (KeyError, ValueError):
+            return False
+        return True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     def call(self, method, resource_path, payload=None):
         """
@@ -41,32 +363,181 @@ class Api(object):
             will return the response on success (200) or will raise an exception
             on failure.
 
+            With coalesce_gets set, a GET of a resource that is already being
+            fetched by another thread waits for that request and returns the
+            same response, or raises the same exception.
+
             :param method string method The HTTP method to use (e.g. GET, POST, etc.).
             :param resource_path string The path to the resource (e.g. contacts/john@example.com/)
             :param payload string The data that is sent to the service. Not used for GET or DELETE.
             :return response The Requests response object from the service.
             :raises GanException in case of invalid HTTP method or HTTPError
         """
+        if method not in self.http_methods:
+            raise GanException(u'Invalid HTTP method',
+                               u'{method} is not a valid HTTP method! Valid HTTP methods are GET, POST, DELETE, PUT, PATCH.'.format(method=method))
+
+        if method == 'GET' and self.single_flight is not None:
+            return self.single_flight.do(resource_path, self.shared_request, method, resource_path, payload)
+        return self.request(method, resource_path, payload)
+
+    def compress(self, payload):
+        """
+            Gzips a request body.
+
+            :param payload str The encoded body.
+            :return: str with the compressed body.
+        """
+        compressor = zlib.compressobj(self.compress_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(payload) + compressor.flush()
+
+    def shared_request(self, method, resource_path, payload=None):
+        """
+            Makes a call whose response is shared by coalesced callers, decoding
+            the body once for all of them.
+        """
+        response = self.request(method, resource_path, payload)
+        try:
+            response._decoded = self.decode(response)
+        except ValueError:
+            pass
+        return response
+
+    def request(self, method, resource_path, payload=None):
+        """
+            Makes a call to the API, see call().
+        """
         uri = u'{base_uri}{resource_path}'.format(base_uri=self.base_uri,
                                                   resource_path=resource_path)
 
-        if payload:
-            payload = json.dumps(payload)
-
-        if method == 'GET':
-            response = requests.get(uri, headers=self.headers)
-        elif method == 'POST':
-            response = requests.post(uri, headers=self.headers, data=payload)
-        elif method == 'DELETE':
-            response = requests.delete(uri, headers=self.headers)
-        elif method == 'PUT':
-            response = requests.put(uri, headers=self.headers, data=payload)
-        elif method == 'PATCH':
-            response = requests.patch(uri, headers=self.headers, data=payload)
+        headers = self.headers
+        if payload and method in ('POST', 'PUT', 'PATCH'):
+            payload = self.codec.encode(payload)
+            if self.compress_threshold is not None and len(payload) >= self.compress_threshold:
+                payload = self.compress(payload)
+                headers = dict(headers)
+                headers['Content-Encoding'] = 'gzip'
         else:
-            raise GanException(u'Invalid HTTP method',
-                               u'{method} is not a valid HTTP method! Valid HTTP methods are GET, POST, DELETE, PUT, PATCH.'.format(method=method))
+            payload = None
+
+        validated = None
+        if method == 'GET' and self.validator_cache is not None:
+            validated = self.validator_cache.get(resource_path)
+            if validated:
+                headers = self.conditional_headers(validated)
+
+        if self.metrics is None and not self.hooks['pre_request'] and not self.hooks['post_request']:
+            response = self.send(method, uri, headers, payload)
+        else:
+            response = self.instrumented_send(method, resource_path, uri, headers, payload)
+
+        if validated and response.status_code == 304:
+            # Not modified, reuse the body we already have.
+            response._content = validated['content']
+        elif method == 'GET' and self.validator_cache is not None and response.status_code == 200:
+            self.store_validators(resource_path, response)
 
         response.raise_for_status()
 
         return response
+
+    def instrumented_send(self, method, resource_path, uri, headers, payload):
+        """
+            Sends a request like send(), running the hooks and recording the metrics of the call.
+        """
+        for hook in self.hooks['pre_request']:
+            hook(method, resource_path, payload)
+        started = time.time()
+        response = None
+        try:
+            response = self.send(method, uri, headers, payload)
+        finally:
+            seconds = time.time() - started
+            if self.metrics is not None:
+                if response is None:
+                    self.metrics.observe_request(method, endpoint_of(resource_path), 'error', seconds,
+                                                 len(payload) if payload else 0)
+                else:
+                    self.metrics.observe_request(method, endpoint_of(resource_path), response.status_code, seconds,
+                                                 len(payload) if payload else 0, len(response.content),
+                                                 getattr(response, 'retries', 0))
+            for hook in self.hooks['post_request']:
+                hook(method, resource_path, response, seconds)
+        return response
+
+    def decode(self, response):
+        """
+            Decodes the JSON body of a response, recording the time taken if metrics are enabled.
+
+            :param response The Requests response object.
+            :return: The decoded data.
+        """
+        decoded = getattr(response, '_decoded', None)
+        if decoded is not None:
+            # Decoded by shared_request().
+            return decoded
+        if self.metrics is None:
+            return self.codec.decode(response.content)
+        started = time.time()
+        try:
+            return self.codec.decode(response.content)
+        finally:
+            self.metrics.observe_phase('decode', time.time() - started)
+
+    def send(self, method, uri, headers, payload):
+        """
+            Sends a request, retrying it according to the retry policy.
+
+            :return: The last Requests response object.
+            :raises ConnectionError or Timeout if the last attempt failed to connect.
+        """
+        policy = self.retry_policy
+        attempt = 0
+        while True:
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            try:
+                response = self.session.request(method, uri, headers=headers, data=payload)
+            except (requests.ConnectionError, requests.Timeout):
+                if not policy or not policy.should_retry(method, attempt):
+                    raise
+                delay = policy.backoff(attempt)
+            else:
+                if not policy or not policy.should_retry(method, attempt, response):
+                    response.retries = attempt
+                    return response
+                delay = policy.delay(attempt, response)
+                if self.rate_limiter and policy.retry_after(response) is not None:
+                    self.rate_limiter.pause(delay)
+            attempt += 1
+            time.sleep(delay)
+
+    def conditional_headers(self, validated):
+        """
+            Builds the request headers of a conditional GET.
+
+            :param validated dict The validators stored for the resource.
+            :return: dict with the headers.
+        """
+        headers = dict(self.headers)
+        if validated.get('etag'):
+            headers['If-None-Match'] = validated['etag']
+        if validated.get('last_modified'):
+            headers['If-Modified-Since'] = validated['last_modified']
+        return headers
+
+    def store_validators(self, resource_path, response):
+        """
+            Remembers the ETag and Last-Modified validators and the body of a GET response.
+
+            :param resource_path string The path of the resource.
+            :param response The Requests response object.
+        """
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified:
+            self.validator_cache.set(resource_path, {'etag': etag,
+                                                     'last_modified': last_modified,
+                                                     'content': response.content})
+        else:
+            self.validator_cache.delete(resource_path)
@@ -0,0 +1,59 @@
+from multiprocessing.pool import ThreadPool
+
+
+class AsyncApi(object):
+    """
+        Non-blocking facade over an Api.
+
+        Calls are run on a pool of worker threads sharing the connection
+        pool of the wrapped Api. Every method returns immediately with an
+        AsyncResult; use result.get() to wait for the value (re-raising any
+        HTTPError), result.ready() to poll it or the callback argument to be
+        notified on success.
+
+        Python 2 has no asyncio, so a thread pool is the concurrency
+        primitive. Thousands of operations can be in flight while only
+        `workers` connections are used.
+    """
+    """
+        Initializes the asynchronous API
+        :param Api api The Api to make the calls with.
+        :param int workers (optional) The number of concurrent calls. Defaults to Api.pool_maxsize
+        so every worker is able to keep its connection alive.
+    """
+
+    def __init__(self, api, workers=None):
+        self.api = api
+        self.workers = workers if workers else api.pool_maxsize
+        self._pool = ThreadPool(self.workers)
+
+    def submit(self, func, *args, **kwargs):
+        """
+            Runs func(*args, **kwargs) on the worker pool.
+
+            :param func The callable to run.
+            :return: AsyncResult
+        """
+        callback = kwargs.pop('callback', None)
+        return self._pool.apply_async(func, args, kwargs, callback)
+
+    def call(self, method, resource_path, payload=None, callback=None):
+        """
+            Asynchronous version of Api.call().
+
+            :return: AsyncResult with the Requests response object.
+        """
+        return self.submit(self.api.call, method, resource_path, payload, callback=callback)
+
+    def close(self):
+        """
+            Waits for the pending calls to finish and stops the workers.
+        """
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,111 @@
+from attribute_manager import AttributeManager
+from contact_manager import ContactManager
+from helpers import BackgroundIterator
+from list_manager import ListManager
+
+
+class AsyncEntityManager(object):
+    """
+    Base asynchronous entity manager.
+
+    Wraps the corresponding synchronous manager, so the mapping done by
+    construct_entity() and normalize_entity() is shared, and runs its
+    network bound methods on the workers of an AsyncApi. The entities
+    returned are ordinary entities bound to the synchronous manager.
+    """
+    """
+    The class of the wrapped synchronous manager (e.g. ContactManager).
+    :var manager_class class
+    """
+    manager_class = None
+
+    def __init__(self, async_api, **kwargs):
+        self.async_api = async_api
+        self.manager = self.manager_class(async_api.api, **kwargs)
+
+    def create(self):
+        return self.manager.create()
+
+    def construct_entity(self, data):
+        return self.manager.construct_entity(data)
+
+    def normalize_entity(self, entity):
+        return self.manager.normalize_entity(entity)
+
+    def get(self, id, callback=None):
+        """
+        Retrieves a single entity from the API.
+
+        :param id: string|int The identificator of the entity.
+        :return: AsyncResult with the constructed entity.
+        """
+        return self.async_api.submit(self.manager.get, id, callback=callback)
+
+    def save(self, entity, overwrite=False, callback=None):
+        """
+        Saves or updates an entity, see EntityManager.save().
+
+        :return: AsyncResult with the updated/created entity.
+        """
+        return self.async_api.submit(self.manager.save, entity, overwrite, callback=callback)
+
+    def overwrite(self, entity, callback=None):
+        return self.save(entity, True, callback=callback)
+
+    def delete(self, entity, callback=None):
+        """
+        Deletes an entity.
+
+        :return: AsyncResult with the Requests response object.
+        """
+        return self.async_api.submit(self.manager.delete, entity, callback=callback)
+
+    def query(self, filters=None, as_json=False, mode='entity', fields=None, callback=None):
+        """
+        Makes a search query, see EntityManager.query().
+
+        :return: AsyncResult with the PaginatedResultSet (or json).
+        """
+        return self.async_api.submit(self.manager.query, filters, as_json, mode, fields, callback=callback)
+
+    def all(self, start=0, stop=float('inf'), read_ahead=None, prefetch=0, workers=None, mode='entity', fields=None):
+        """
+        Iterates over all or between(start, stop) entities like EntityManager.all(),
+        while the next entities are fetched in the background.
+
+        Close the returned iterator (or use it in a with statement) if you stop
+        before the end, so the background thread and its connection are released.
+
+        :param start Start from entity index.
+        :param stop Stop at entity index.
+        :param read_ahead The number of entities to buffer. Defaults to one page (Api.batch_size).
+        :param prefetch (optional) The number of pages to fetch concurrently, see EntityManager.all().
+        :param workers (optional) The number of concurrent page requests.
+        :param mode (optional) 'entity' (default), 'lazy', 'dict' or 'tuple', see EntityManager.row_builder().
+        :param fields (optional) The fields kept in dict or tuple mode.
+        :return: BackgroundIterator with entities of type.
+        """
+        if read_ahead is None:
+            read_ahead = self.async_api.api.batch_size
+        return BackgroundIterator(self.manager.all(start, stop, prefetch, workers, mode, fields), read_ahead)
+
+
+class AsyncContactManager(AsyncEntityManager):
+    """
+    Asynchronous entity manager for contacts.
+    """
+    manager_class = ContactManager
+
+
+class AsyncListManager(AsyncEntityManager):
+    """
+    Asynchronous entity manager for lists.
+    """
+    manager_class = ListManager
+
+
+class AsyncAttributeManager(AsyncEntityManager):
+    """
+    Asynchronous entity manager for attributes.
+    """
+    manager_class = AttributeManager
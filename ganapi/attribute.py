@@ -5,7 +5,9 @@ class Attribute(Entity):
     """
     Represents an attribute object.
     """
-    url = None
-    name = None
-    code = None
-    usage_count = None
\ No newline at end of file
+    fields = (
+        'url',
+        'name',
+        'code',
+        'usage_count'
+    )
\ No newline at end of file
@@ -13,3 +13,5 @@ class AttributeManager(EntityManager):
         'name',
     ]
     lookup_field = 'code'
+    cache_ttl = 300
+    cache_pages = True
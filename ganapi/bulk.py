@@ -0,0 +1,150 @@
+import collections
+import time
+
+
+class BulkResult(object):
+    """
+        The outcome of a single item of a bulk operation.
+
+        :param item The input item (e.g. the entity that was saved).
+        :param status One of the status constants of BulkReport.
+        :param entity (optional) The entity returned by the API.
+        :param error (optional) The exception raised for the item (e.g. HTTPError).
+    """
+    def __init__(self, item, status, entity=None, error=None):
+        self.item = item
+        self.status = status
+        self.entity = entity
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return '<BulkResult {status}>'.format(status=self.status)
+
+
+class BulkReport(object):
+    """
+        Streaming report of a bulk operation.
+
+        Iterating over the report runs the operation and yields a BulkResult
+        for every item as soon as it completes. The counters are updated
+        while iterating; call run() to process every item at once.
+
+        :param results generator with BulkResult objects.
+    """
+    FOUND = 'found'
+    CREATED = 'created'
+    UPDATED = 'updated'
+    UNCHANGED = 'unchanged'
+    DELETED = 'deleted'
+    MISSING = 'missing'
+    FAILED = 'failed'
+
+    def __init__(self, results):
+        self._results = results
+        self.counts = collections.Counter()
+        self.failures = []
+        self.started = None
+        self.finished = None
+
+    def __iter__(self):
+        if self.started is None:
+            self.started = time.time()
+        for result in self._results:
+            self.counts[result.status] += 1
+            if not result.ok:
+                self.failures.append(result)
+            yield result
+        self.finished = time.time()
+
+    def run(self):
+        """
+            Processes all items, discarding the individual results.
+
+            :return: the report itself.
+        """
+        for _ in self:
+            pass
+        return self
+
+    @property
+    def processed(self):
+        return sum(self.counts.values())
+
+    @property
+    def found(self):
+        return self.counts[self.FOUND]
+
+    @property
+    def created(self):
+        return self.counts[self.CREATED]
+
+    @property
+    def updated(self):
+        return self.counts[self.UPDATED]
+
+    @property
+    def unchanged(self):
+        return self.counts[self.UNCHANGED]
+
+    @property
+    def deleted(self):
+        return self.counts[self.DELETED]
+
+    @property
+    def missing(self):
+        return self.counts[self.MISSING]
+
+    @property
+    def failed(self):
+        return self.counts[self.FAILED]
+
+    @property
+    def elapsed(self):
+        """
+            Seconds spent so far, or in total once the operation finished.
+        """
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def rate(self):
+        """
+            Throughput in items per second.
+        """
+        elapsed = self.elapsed
+        return self.processed / elapsed if elapsed else 0.0
+
+    def __repr__(self):
+        return '<BulkReport processed={processed} failed={failed} rate={rate:.1f}/s>'.format(processed=self.processed,
+                                                                                          failed=self.failed,
+                                                                                          rate=self.rate)
+
+
+class FetchReport(BulkReport):
+    """
+        Streaming report of a multi-get.
+
+        Yields a BulkResult per id as soon as it is fetched, with the found or
+        missing status, or failed with the exception. While iterating, the
+        entities are collected in the `entities` dict keyed by id and the ids
+        not found (404) in `missing_ids`.
+
+        :param results generator with BulkResult objects, the item of each is the id.
+    """
+    def __init__(self, results):
+        super(FetchReport, self).__init__(results)
+        self.entities = {}
+        self.missing_ids = []
+
+    def __iter__(self):
+        for result in super(FetchReport, self).__iter__():
+            if result.status == self.FOUND:
+                self.entities[result.item] = result.entity
+            elif result.status == self.MISSING:
+                self.missing_ids.append(result.item)
+            yield result
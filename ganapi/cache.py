@@ -0,0 +1,301 @@
+import collections
+import hashlib
+import marshal
+import sqlite3
+import threading
+import time
+import zlib
+from requests import HTTPError, Response
+
+
+class LRUCache(object):
+    """
+        Thread-safe in-memory cache with LRU eviction and per-entry TTLs.
+
+        This is the default cache backend of the entity managers. Any object
+        with the same get/set/delete/clear methods can be used instead.
+
+        :param max_size The maximum number of entries kept. The least recently used entry
+            is evicted when it is exceeded.
+        :param ttl (optional) The default time to live of an entry in seconds. None means no expiry.
+    """
+    def __init__(self, max_size=1024, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __getstate__(self):
+        # Locks can not be pickled, the copy gets its own.
+        state = dict(self.__dict__)
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+            Returns the cached value, marking it as recently used.
+
+            :param key The key.
+            :param default The value returned on a miss.
+        """
+        with self._lock:
+            try:
+                value, expires = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires is not None and expires <= time.time():
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data[key] = (value, expires)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """
+            Stores a value.
+
+            :param key The key.
+            :param value The value.
+            :param ttl (optional) Time to live in seconds, overrides the default ttl.
+        """
+        if ttl is None:
+            ttl = self.ttl
+        expires = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, expires)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """
+            :return: dict with the hits, misses, evictions, expirations and size of the cache.
+        """
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'size': len(self._data)}
+
+
+class SQLiteCache(object):
+    """
+        Persistent cache stored in a SQLite database, shared by processes.
+
+        It has the same get/set/delete/clear methods as LRUCache, so it can
+        be passed to the managers (and as the validator_cache of an Api) to
+        keep entities and pages between runs: a cron job started shortly
+        after the previous one reads its lists and attributes from disk.
+
+        The entries are stored under a namespace, usually the API token, of
+        which only a hash is written to disk, so several accounts can share a
+        file. Bodies are stored as zlib compressed bytes and other values
+        with marshal; nothing read from the file is unpickled. Cached errors
+        (see EntityManager.cache_not_found) keep only their status code,
+        reason, URL and body, not the request and its headers. The database
+        runs in WAL mode with a busy timeout, so many processes can read and
+        write it at the same time; every thread uses its own connection.
+
+        :param path The path of the database file.
+        :param namespace The namespace of the entries, e.g. Api.token. Caches with the same namespace share their entries.
+        :param ttl (optional) The default time to live of an entry in seconds. None means no expiry.
+        :param compress_min_size (optional) The minimum size of the bodies that are compressed.
+        :param timeout (optional) Seconds to wait for a lock held by another process.
+    """
+    schema = '''
+        CREATE TABLE IF NOT EXISTS entries (
+            namespace TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value BLOB NOT NULL,
+            expires REAL,
+            PRIMARY KEY (namespace, key)
+        ) WITHOUT ROWID;
+    '''
+    """
+        Expired entries are purged after this many writes
+        :var purge_interval int
+    """
+    purge_interval = 1000
+
+    def __init__(self, path, namespace, ttl=None, compress_min_size=256, timeout=30):
+        self.path = path
+        self.namespace = hashlib.sha1(namespace).hexdigest()
+        self.ttl = ttl
+        self.compress_min_size = compress_min_size
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self._connect()
+
+    def __getstate__(self):
+        # The copy opens its own connections.
+        state = dict(self.__dict__)
+        del state['_local'], state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connect()
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(self.path, timeout=self.timeout,
+                                                                  isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(self.schema)
+        return connection
+
+    def _count(self, stat):
+        with self._lock:
+            setattr(self, stat, getattr(self, stat) + 1)
+
+    def dumps(self, value):
+        """
+            Serializes a value to compact bytes, prefixed with its format.
+
+            :raises ValueError if the value is not a str, an HTTPError or a value marshal can serialize.
+        """
+        if isinstance(value, HTTPError):
+            # Cached 404 responses, see EntityManager.cache_not_found. The request is left out,
+            # its headers hold the token.
+            response = value.response
+            if response is None:
+                return 'e' + marshal.dumps((str(value), None, None, None, None))
+            return 'e' + marshal.dumps((str(value), response.status_code, response.reason, response.url,
+                                        response.content))
+        if isinstance(value, str):
+            if len(value) >= self.compress_min_size:
+                return 'z' + zlib.compress(value, 1)
+            return 'b' + value
+        return 'm' + marshal.dumps(value)
+
+    @staticmethod
+    def loads(data):
+        data = str(data)
+        kind, data = data[0], data[1:]
+        if kind == 'z':
+            return zlib.decompress(data)
+        if kind == 'b':
+            return data
+        if kind == 'm':
+            return marshal.loads(data)
+        if kind == 'e':
+            message, status_code, reason, url, content = marshal.loads(data)
+            response = None
+            if status_code is not None:
+                response = Response()
+                response.status_code = status_code
+                response.reason = reason
+                response.url = url
+                response._content = content
+            return HTTPError(message, response=response)
+        raise ValueError('Unknown cache entry format {kind!r}.'.format(kind=kind))
+
+    def get(self, key, default=None):
+        """
+            Returns the cached value.
+
+            :param key The key.
+            :param default The value returned on a miss.
+        """
+        row = self._connect().execute('SELECT value, expires FROM entries WHERE namespace = ? AND key = ?',
+                                      (self.namespace, key)).fetchone()
+        if row is None:
+            self._count('misses')
+            return default
+        if row[1] is not None and row[1] <= time.time():
+            self._count('expirations')
+            self._count('misses')
+            return default
+        self._count('hits')
+        return self.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        """
+            Stores a value.
+
+            :param key The key.
+            :param value The value.
+            :param ttl (optional) Time to live in seconds, overrides the default ttl.
+        """
+        if ttl is None:
+            ttl = self.ttl
+        expires = time.time() + ttl if ttl is not None else None
+        connection = self._connect()
+        connection.execute('INSERT OR REPLACE INTO entries (namespace, key, value, expires) VALUES (?, ?, ?, ?)',
+                           (self.namespace, key, sqlite3.Binary(self.dumps(value)), expires))
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % self.purge_interval == 0
+        if purge:
+            self.purge()
+
+    def delete(self, key):
+        self._connect().execute('DELETE FROM entries WHERE namespace = ? AND key = ?', (self.namespace, key))
+
+    def clear(self):
+        """
+            Removes all entries of the namespace.
+        """
+        self._connect().execute('DELETE FROM entries WHERE namespace = ?', (self.namespace,))
+
+    def purge(self):
+        """
+            Removes the expired entries of all namespaces.
+
+            :return: int The number of entries removed.
+        """
+        return self._connect().execute('DELETE FROM entries WHERE expires <= ?', (time.time(),)).rowcount
+
+    def close(self):
+        """
+            Closes the connection of the calling thread.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM entries WHERE namespace = ? AND '
+                                       '(expires IS NULL OR expires > ?)', (self.namespace, time.time())).fetchone()[0]
+
+    def stats(self):
+        """
+            :return: dict with the hits, misses, evictions, expirations and size of the cache.
+        """
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': 0,
+                'expirations': self.expirations,
+                'size': len(self)}
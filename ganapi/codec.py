@@ -0,0 +1,114 @@
+import json
+from gan_exception import GanException
+
+
+class JsonCodec(object):
+    """
+        Encodes request bodies and decodes response bodies.
+
+        :param name The name of the codec.
+        :param dumps function serializing an object to a JSON string or bytes.
+        :param loads function parsing JSON bytes.
+    """
+    def __init__(self, name, dumps, loads):
+        self.name = name
+        self.dumps = dumps
+        self.loads = loads
+
+    def encode(self, data):
+        """
+            :param data The object to serialize.
+            :return: str with the JSON document.
+        """
+        return self.dumps(data)
+
+    def decode(self, content):
+        """
+            :param content str with the JSON document, e.g. the raw body of a response.
+            :return: The decoded object.
+            :raises ValueError if content is not valid JSON.
+        """
+        return self.loads(content)
+
+    def __repr__(self):
+        return '<JsonCodec {name}>'.format(name=self.name)
+
+
+def _orjson():
+    import orjson
+    return JsonCodec('orjson', orjson.dumps, orjson.loads)
+
+
+def _ujson():
+    import ujson
+    return JsonCodec('ujson', ujson.dumps, ujson.loads)
+
+
+def _simplejson():
+    import simplejson
+    return JsonCodec('simplejson', simplejson.dumps, simplejson.loads)
+
+
+def _json():
+    return JsonCodec('json', json.dumps, json.loads)
+
+
+"""
+    The codecs in order of preference.
+    :var CODECS tuple of (name, factory) tuples
+"""
+CODECS = (
+    ('orjson', _orjson),
+    ('ujson', _ujson),
+    ('simplejson', _simplejson),
+    ('json', _json)
+)
+
+
+"""
+    The codecs get_codec() may pick by default. simplejson is left out: under Python 2 it
+    decodes ASCII strings to str instead of unicode, so field types would depend on it.
+    :var DEFAULT_CODECS tuple of names
+"""
+DEFAULT_CODECS = ('orjson', 'ujson', 'json')
+
+
+_default_codec = None
+
+
+def available_codecs():
+    """
+        :return: list with the codecs that can be imported, fastest first.
+    """
+    codecs = []
+    for name, factory in CODECS:
+        try:
+            codecs.append(factory())
+        except ImportError:
+            pass
+    return codecs
+
+
+def get_codec(name=None):
+    """
+        Returns a codec by name, or the fastest one installed.
+
+        :param name (optional) 'orjson', 'ujson', 'simplejson' or 'json'. By default the first of
+            DEFAULT_CODECS that can be imported; 'json' from the standard library is always available.
+        :return: JsonCodec
+        :raises GanException if the codec is unknown or not installed.
+    """
+    global _default_codec
+    if name is None:
+        if _default_codec is None:
+            _default_codec = [codec for codec in available_codecs() if codec.name in DEFAULT_CODECS][0]
+        return _default_codec
+    for codec_name, factory in CODECS:
+        if codec_name == name:
+            try:
+                return factory()
+            except ImportError:
+                raise GanException(u'Missing dependency',
+                                   u'The {name} JSON codec is not installed.'.format(name=name))
+    raise GanException(u'Invalid JSON codec',
+                       u'{name} is not a valid JSON codec! Valid codecs are orjson, ujson, simplejson, json.'.format(name=name))
@@ -5,20 +5,33 @@ class Contact(Entity):
     """
     Represents a contact object.
     """
-    email = None
-    attributes = None
-    first_name = None
-    last_name = None
-    lists = None
-    url = None
-    active = None
-    updated = None
-    created = None
+    fields = (
+        'email',
+        'attributes',
+        'first_name',
+        'last_name',
+        'lists',
+        'url',
+        'active',
+        'updated',
+        'created'
+    )
+    container_fields = ('attributes', 'lists')
+
+    @staticmethod
+    def subscription_hash(subscription):
+        """
+        Returns the list hash of an item of contact.lists, which is either
+        a subscription dict from the API or a List added with subscribe_to().
+        """
+        if isinstance(subscription, dict):
+            return subscription.get('hash')
+        return subscription.hash
 
     @staticmethod
     def hash_in_contacts_lists(hash, list):
 
-        if any(sub['hash'] == hash for sub in list):
+        if any(Contact.subscription_hash(sub) == hash for sub in list):
             return True
         return False
 
@@ -34,7 +47,12 @@ class Contact(Entity):
         if not isinstance(self.lists, type([])):
             self.lists = []
 
-        if not self.hash_in_contacts_lists(list.hash, self.lists):
+        if list.hash is None:
+            # A new list gets its hash when it is created, e.g. on Session.flush().
+            subscribed = any(sub is list for sub in self.lists)
+        else:
+            subscribed = self.hash_in_contacts_lists(list.hash, self.lists)
+        if not subscribed:
             # Will not activate already cancelled subscription
             # only put it back in listing.
             self.lists.append(list)
@@ -51,9 +69,12 @@ class Contact(Entity):
         if not isinstance(self.lists, type([])):
             self.lists = []
 
-        if self.hash_in_contacts_lists(list.hash, self.lists):
-            for i in (i for i, v in enumerate(self.lists) if v['hash'] == list.hash):
-                self.lists[i]['cancelled'] = True
+        for i, sub in enumerate(self.lists):
+            if self.subscription_hash(sub) == list.hash:
+                if not isinstance(sub, dict):
+                    # A list subscribed to with subscribe_to() and not saved yet.
+                    sub = self.lists[i] = {'hash': list.hash}
+                sub['cancelled'] = True
 
     def delete_subscription_from(self, list):
         """
@@ -64,8 +85,5 @@ class Contact(Entity):
 
         :param list: The List to delete contact from.
         """
-        if self.hash_in_contacts_lists(list.hash, self.lists):
-            for i in (i for i, v in enumerate(self.lists) if v['hash'] == list.hash):
-                self.lists.remove(self.lists[i])
-
-
+        if isinstance(self.lists, type([])):
+            self.lists[:] = [sub for sub in self.lists if self.subscription_hash(sub) != list.hash]
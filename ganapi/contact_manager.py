@@ -18,6 +18,7 @@ class ContactManager(EntityManager):
         'email'
     ]
     lookup_field = 'email'
+    cache_ttl = 30
 
     def normalize_entity(self, entity):
         """
@@ -32,11 +33,13 @@ class ContactManager(EntityManager):
         if not isinstance(data.get('attributes'), type(dict())):
             data['attributes'] = dict()
 
-        list_manager = ListManager(self.api)
+        list_manager = None
         data['lists'] = []
         if isinstance(getattr(entity, 'lists'), type([])):
             for list in entity.lists:
-                if isinstance(list, list_manager.entity_class):
+                if isinstance(list, ListManager.entity_class):
+                    if list_manager is None:
+                        list_manager = ListManager(self.api)
                     norm = list_manager.normalize_entity(list)
                     norm['hash'] = list.hash
                 else:
@@ -1,12 +1,105 @@
-class Entity():
+from schema import check_fields, compile_constructor, copy_container
 
-    def __init__(self, manager):
-        self.manager = manager
+
+class EntityMeta(type):
     """
-     Flag showing that the entity exists or not in the storage.
-    :var bool
+    Compiles the field schema of an entity class.
+
+    Every class declares its own fields in the `fields` tuple. They are
+    stored in __slots__, so entities carry no per-instance __dict__, and
+    a constructor assigning all fields is compiled once per class.
+    """
+    def __new__(mcs, name, bases, attrs):
+        own_fields = check_fields(attrs.get('fields', ()))
+        inherited = ()
+        for base in bases:
+            inherited += tuple(field for field in getattr(base, '_fields', ()) if field not in inherited)
+        attrs['fields'] = own_fields
+        attrs['__slots__'] = tuple(field for field in own_fields if field not in inherited) + tuple(attrs.get('__slots__', ()))
+        attrs['_fields'] = inherited + tuple(field for field in own_fields if field not in inherited)
+        attrs['_field_set'] = frozenset(attrs['_fields'])
+        cls = super(EntityMeta, mcs).__new__(mcs, name, bases, attrs)
+        cls._construct = staticmethod(compile_constructor(cls._fields, cls.container_fields))
+        return cls
+
+
+class Entity(object):
+    __metaclass__ = EntityMeta
+    __slots__ = ('manager', '_persisted', '_loaded')
     """
-    _persisted = False
+    The field names of the entity. Subclasses declare only their own fields.
+    :var fields tuple
+    """
+    fields = ()
+    """
+    The fields holding dicts or lists, copied on load so that in place changes are detected.
+    :var container_fields tuple
+    """
+    container_fields = ()
+
+    def __init__(self, manager):
+        self.manager = manager
+        # Flag showing that the entity exists or not in the storage.
+        self._persisted = False
+        # The data the entity was loaded from, None if it was not loaded from the API.
+        self._loaded = None
+        for field in self._fields:
+            setattr(self, field, None)
+
+    @classmethod
+    def from_data(cls, manager, data, lazy=False):
+        """
+        Builds an entity from the API data with the compiled constructor of the class.
+        Fields missing from data are set to None. __init__ is not called.
+
+        A lazy entity only wraps the data; each field is read from it the
+        first time it is accessed, which saves the work of the fields that
+        are never used.
+
+        :param manager: The manager of the entity.
+        :param data: dict with the transfer data from the API.
+        :param lazy: (optional) Build a lazy entity.
+        :return: The entity.
+        """
+        if lazy:
+            entity = object.__new__(cls)
+            entity.manager = manager
+            entity._persisted = False
+            entity._loaded = data
+            return entity
+        return cls._construct(cls, manager, data)
+
+    def __getattr__(self, name):
+        # Only called for unset slots, i.e. the fields of a lazy entity not accessed yet.
+        if name not in self._field_set:
+            raise AttributeError(name)
+        value = self._loaded.get(name)
+        if name in self.container_fields:
+            value = copy_container(value)
+        setattr(self, name, value)
+        return value
+
+    def __getstate__(self):
+        # Slot entities have no __dict__ to pickle. The fields of a lazy
+        # entity not accessed yet stay unset and are hydrated after loading.
+        state = {'manager': self.manager, '_persisted': self._persisted, '_loaded': self._loaded}
+        for field in self._fields:
+            try:
+                state[field] = object.__getattribute__(self, field)
+            except AttributeError:
+                pass
+        return state
+
+    def __setstate__(self, state):
+        # Entities pickled before slots were used have no _loaded.
+        self._persisted = False
+        self._loaded = None
+        for name, value in state.iteritems():
+            setattr(self, name, value)
+        if self._loaded is None:
+            for field in self._fields:
+                if field not in state:
+                    setattr(self, field, None)
 
     def is_persisted(self):
         """
@@ -29,6 +122,15 @@ class Entity():
         self._persisted = persisted
         return self
 
+    def changes(self):
+        """
+        Returns the data that save() would send, i.e. for an entity loaded
+        from the API only the fields changed since it was loaded.
+
+        :return: dict
+        """
+        return self.manager.changes(self)
+
     def save(self, overwrite=False):
         return self.manager.save(self, overwrite)
 
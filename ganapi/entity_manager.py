@@ -1,8 +1,14 @@
 import urllib
-from helpers import PaginatedResultSet
+from helpers import PaginatedResultSet, bounded_imap
 from api import GanException
+from bulk import BulkReport, BulkResult, FetchReport
+from scan import Scan
+from schema import compile_normalizer, compile_row_builder, copy_data
+from requests import HTTPError
+import itertools
 import urlparse
 import math
+import time
 
 
 class EntityManager(object):
@@ -35,9 +41,38 @@ class EntityManager(object):
     :var lookup_field string
     """
     lookup_field = None
+    """
+    Time to live in seconds of the entities cached by get(). None means no expiry.
+    :var cache_ttl int
+    """
+    cache_ttl = 60
+    """
+    Whether get() caches 404 responses, and for how many seconds.
+    :var cache_not_found bool
+    :var cache_not_found_ttl int
+    """
+    cache_not_found = False
+    cache_not_found_ttl = 10
+    """
+    Whether all() reads its pages through the cache as well. Meant for the small
+    collections that rarely change; any save or delete makes the cached pages stale.
+    :var cache_pages bool
+    """
+    cache_pages = False
 
-    def __init__(self, api):
+    def __init__(self, api, cache=None, cache_ttl=None, cache_not_found=None):
+        """
+        :param api: The Api to make the calls with.
+        :param cache: (optional) Cache backend for get(), e.g. LRUCache. May be shared between managers.
+        :param cache_ttl: (optional) Overrides the cache_ttl of the manager.
+        :param cache_not_found: (optional) Set to True to also cache 404 responses.
+        """
         self.api = api
+        self.cache = cache
+        if cache_ttl is not None:
+            self.cache_ttl = cache_ttl
+        if cache_not_found is not None:
+            self.cache_not_found = cache_not_found
 
     def get_path(self, id):
         """
@@ -79,39 +114,63 @@ class EntityManager(object):
          Method used by the entity manager to construct an entity from the API data.
 
         Given transfer data object (stdClass instance) it have to build and initialize the
-        corresponding entity. The default behaviour is to call the entity constructor
-        without arguments and fill all entity fields with the supplied data.
+        corresponding entity. The default behaviour is to use the constructor compiled
+        from the field schema of the entity class and fill all entity fields with the supplied data.
         Override this method if your entities require more complex construction procedure.
 
          :param data: transfer data object from the API.
          :return: The constructed entity.
          """
-
-        entity = self.entity_class(self)
-        for property in dir(entity):
-            if property in data:
-                setattr(entity, property, data[property])
-        return entity
+        return self.entity_class.from_data(self, data)
 
     def normalize_entity(self, entity):
         """
         Used to generate a payload for the write operations to the API from an entity.
         This method will use the contents of the writableFields array to get
-        only the writable fields from the entity and pack them in an data transfer object
+        only the writable fields from the entity and pack them in an data transfer object.
+        The normalizer is compiled once for every list of writable fields.
         Override this method if required.
 
         :param entity: Entity The entity to extract data from.
         :return: data: dict The transfer data dict
         """
-        data = {}
-        for property in self.writable_fields:
-            if getattr(entity, property):
-                data[property] = getattr(entity, property)
-        return data
+        return compile_normalizer(self.writable_fields)(entity)
 
     def create(self):
         return self.entity_class(self)
 
+    def row_builder(self, mode='entity', fields=None):
+        """
+        Returns the function used by all() and query() to build a result from the API data.
+
+        The lightweight modes skip the entity construction: 'dict' yields plain dicts and
+        'tuple' compact named tuples, projected to the given fields. Dotted fields reach
+        into nested dicts, e.g. 'attributes.city'. 'lazy' yields entities reading their
+        fields from the data on first access, see Entity.from_data().
+
+        :param mode: 'entity' (default), 'lazy', 'dict' or 'tuple'.
+        :param fields: The fields kept in the rows. In dict mode all data returned by the API
+        is kept by default, in tuple mode all fields of the entity class.
+        :return: function(data)
+        :raises ValueError if the mode or a field is invalid.
+        """
+        if mode == 'entity':
+            build = lambda data: self.construct_entity(data).set_persisted()
+        elif mode == 'lazy':
+            entity_class = self.entity_class
+            build = lambda data: entity_class.from_data(self, data, lazy=True).set_persisted()
+        elif mode == 'dict' and not fields:
+            build = lambda data: data
+        else:
+            build = compile_row_builder(fields or self.entity_class._fields, mode)
+        if mode == 'dict' and self.api.single_flight is not None:
+            # Coalesced GETs share the decoded data, every caller gets its own rows.
+            project = build
+            build = lambda data: copy_data(project(data))
+        if self.api.metrics is not None:
+            return self.api.metrics.timed('construct', build)
+        return build
+
     def get(self, id):
         """
          Retrieves a single entity from the API.
@@ -121,11 +180,62 @@ class EntityManager(object):
         :raises Exception failure (e.g. the entity is not found).
         """
         resource = self.get_path(id)
-        response = self.api.call('GET', resource)
-        result = self.construct_entity(response.json())
-        result.set_persisted()
+        if self.cache is not None:
+            cached = self.cache.get(resource)
+            if isinstance(cached, HTTPError):
+                raise cached
+            if cached is not None:
+                return self.row_builder()(self.api.codec.decode(cached))
+
+        try:
+            response = self.api.call('GET', resource)
+        except HTTPError as e:
+            if self.cache is not None and self.cache_not_found and e.response is not None \
+                    and e.response.status_code == 404:
+                self.cache.set(resource, e, self.cache_not_found_ttl)
+            raise
+
+        if self.cache is not None:
+            self.cache.set(resource, response.content, self.cache_ttl)
+        return self.row_builder()(self.api.decode(response))
+
+    def get_many(self, ids, concurrency=4):
+        """
+        Retrieves many entities concurrently.
+
+        Repeated ids are fetched once. The ids are read lazily from the
+        iterable and at most `concurrency` requests are in flight over the
+        pooled connections. Missing (404) ids and failures do not raise,
+        they are reported in the result.
 
-        return result
+        Iterate over the report to get the results as they complete, or
+        call run() and read the `entities` dict and the `missing_ids`:
+
+            report = manager.get_many(ids, concurrency=8).run()
+            report.entities, report.missing_ids, report.failures
+
+        :param ids: iterable of ids (e.g. emails of contacts).
+        :param concurrency: The number of concurrent requests.
+        :return: FetchReport yielding a BulkResult per id, in completion order.
+        """
+        def unique(ids):
+            seen = set()
+            for id in ids:
+                if id not in seen:
+                    seen.add(id)
+                    yield id
+
+        def get(id):
+            try:
+                return BulkResult(id, BulkReport.FOUND, entity=self.get(id))
+            except HTTPError as e:
+                if e.response is not None and e.response.status_code == 404:
+                    return BulkResult(id, BulkReport.MISSING)
+                return BulkResult(id, BulkReport.FAILED, error=e)
+            except Exception as e:
+                return BulkResult(id, BulkReport.FAILED, error=e)
+
+        return FetchReport(bounded_imap(get, unique(ids), concurrency, window=concurrency * 2, ordered=False))
 
     def save(self, entity, overwrite=False):
         """
@@ -134,25 +244,99 @@ class EntityManager(object):
         If the $overwrite flag is set, it will make a PUT request to the API.
         It will return the updated/created entity as result.
 
+        An entity loaded from the API is updated with a PATCH of the fields
+        changed since it was loaded, see changes(). If nothing changed no
+        request is made and the entity itself is returned.
+
         :param entity: The entity object to update/save.
         :param overwrite: Set to True if you want
         :return: The updated/created entity.
         :raises HTTPError if there is an error from the API
         :raises GanException if the normalization fails, i.e. missing lookup field.
         """
+        return self._save(entity, overwrite)[0]
+
+    def changes(self, entity):
+        """
+        Computes the data of a partial update.
+
+        For an entity loaded from the API these are the normalized fields that
+        differ from the loaded data; of a changed dict (e.g. the attributes of
+        a contact) only the changed keys are kept, unless keys were removed from
+        it, then the whole dict is sent. For any other entity it is the whole
+        normalized entity.
+
+        :param entity: The entity.
+        :return: dict with the transfer data.
+        """
         data = self.normalize_entity(entity)
-        if overwrite:
-            response = self.api.call('PUT', self.lookup_path(entity), data)
+        if entity._loaded is None:
+            return data
+        loaded = self.normalize_entity(self.entity_class.from_data(self, entity._loaded))
+        changes = {}
+        for field, value in data.items():
+            original = loaded.get(field)
+            if value == original:
+                continue
+            if isinstance(value, dict) and isinstance(original, dict) and all(key in value for key in original):
+                value = dict((key, item) for key, item in value.items() if original.get(key) != item)
+                if not value:
+                    continue
+            changes[field] = value
+        return changes
+
+    def _save(self, entity, overwrite=False):
+        if overwrite or entity.is_persisted():
+            data = self.normalize_entity(entity) if overwrite else self.changes(entity)
+            if not data:
+                return entity, None
+            path = self.lookup_path(entity)
+            response = self.api.call('PUT' if overwrite else 'PATCH', path, data)
         else:
-            if entity.is_persisted():
-                response = self.api.call('PATCH', self.lookup_path(entity), data)
+            path = None
+            uri = u'{base_path}/'.format(base_path=str.rstrip(self.base_path, '/'))
+            response = self.api.call('POST', uri, self.normalize_entity(entity))
+
+        result = self.row_builder()(self.api.decode(response))
+        # The entity now matches the stored state.
+        entity._loaded = result._loaded
+        if self.cache is not None:
+            self._invalidate_pages()
+            # The lookup field may have changed (e.g. the code of a renamed attribute).
+            if path:
+                self.cache.delete(path)
+            if getattr(result, self.lookup_field):
+                self.cache.set(self.lookup_path(result), response.content, self.cache_ttl)
+        return result, response
+
+    def bulk_save(self, entities, concurrency=4, overwrite=False):
+        """
+        Saves or updates many entities concurrently.
+
+        The entities are read lazily from the iterable (e.g. a generator), so
+        the input is never materialized, and at most `concurrency` writes are
+        in flight. A failing entity does not abort the batch, it is reported
+        with the failed status and the exception instead.
+
+        :param entities: iterable of entities to save.
+        :param concurrency: The number of concurrent requests.
+        :param overwrite: Set to True to PUT every entity, see save().
+        :return: BulkReport yielding a BulkResult per entity, in completion order.
+        """
+        def save(entity):
+            try:
+                result, response = self._save(entity, overwrite)
+            except Exception as e:
+                return BulkResult(entity, BulkReport.FAILED, error=e)
+            if response is None:
+                status = BulkReport.UNCHANGED
+            elif response.status_code == 201 or (not overwrite and not entity.is_persisted()):
+                status = BulkReport.CREATED
             else:
-                uri = u'{base_path}/'.format(base_path=str.rstrip(self.base_path, '/'))
-                response = self.api.call('POST', uri, data)
+                status = BulkReport.UPDATED
+            return BulkResult(entity, status, entity=result)
 
-        result = self.construct_entity(response.json())
-        result.set_persisted()
-        return result
+        return BulkReport(bounded_imap(save, entities, concurrency, window=concurrency * 2, ordered=False))
 
     def overwrite(self, entity):
         """
@@ -167,7 +351,7 @@ class EntityManager(object):
         """
         return self.save(entity, True)
 
-    def query(self, filters=None, as_json=False):
+    def query(self, filters=None, as_json=False, mode='entity', fields=None, prefetch=False):
         """
         Low level method for making search queries.
 
@@ -177,6 +361,9 @@ class EntityManager(object):
 
         :param filters dict of query parameters (e.g. {'search_email': 'test@', 'page': 2})
         :param as_json default False set to True to return json
+        :param mode (optional) 'entity' (default), 'lazy', 'dict' or 'tuple', see row_builder().
+        :param fields (optional) The fields kept in dict or tuple mode.
+        :param prefetch (optional) Let the PaginatedResultSet fetch the next page in the background.
         :returns class PaginatedResultSet which can iterate over pages PaginatedResultSet.entities is the current page list of entities.
         :raises RequestException if there is an error from the API.
         """
@@ -187,17 +374,29 @@ class EntityManager(object):
         response = self.api.call('GET', uri)
 
         if as_json:
-            return response.json()
-        return PaginatedResultSet(self, response.json())
-
-    def all(self, start=0, stop=float('inf')):
+            if self.api.single_flight is not None:
+                # Coalesced GETs share the decoded data.
+                return copy_data(self.api.decode(response))
+            return self.api.decode(response)
+        return PaginatedResultSet(self, self.api.decode(response), self.row_builder(mode, fields), filters,
+                                  prefetch=prefetch)
+
+    def all(self, start=0, stop=float('inf'), prefetch=0, workers=None, mode='entity', fields=None):
         """
         Method to get a generator with all or between(start, stop) entities of type.
         Will use Api.batch_size for pagination parameter to the api.
         When using start argument it will jump to the correct page after first request
         if the start item is not on the first page.
+
+        With prefetch set, all page URLs are derived from the count returned
+        by the first request and up to `prefetch` pages are fetched ahead
+        concurrently. The entities are still yielded in order.
         :param start Start from entity index.
         :param stop Stop at entity index.
+        :param prefetch (optional) The number of pages to read ahead. 0 (default) disables prefetching.
+        :param workers (optional) The number of concurrent page requests. Defaults to prefetch.
+        :param mode (optional) 'entity' (default), 'lazy', 'dict' or 'tuple', see row_builder().
+        :param fields (optional) The fields kept in dict or tuple mode.
         :raises StopIteration if end of entities or too high start.
         :raises AssertionError if start or stop are invalid.
         :raises HTTPError if the data can not be fetched.
@@ -214,12 +413,18 @@ class EntityManager(object):
             assert isinstance(stop, int)
         assert start <= stop
 
+        build = self.row_builder(mode, fields)
+        if prefetch:
+            for entity in self._prefetched_all(start, stop, prefetch, workers or prefetch, build):
+                yield entity
+            return
+
         uri = u'{base_path}/?paginate_by={batch_size}'.format(base_path=str.rstrip(self.base_path),
                                                               batch_size=self.api.batch_size)
         count = None
         count_read = 0
         while uri and (count is None or count_read < count) and count_read <= stop:
-            results = self.api.call('GET', uri).json()
+            results = self._get_page(uri)
             count = results.get('count', 0)
 
             if start > count:
@@ -227,7 +432,7 @@ class EntityManager(object):
 
             for entity in results.get('results', []):
                 if start <= count_read <= stop:
-                    yield self.construct_entity(entity).set_persisted()
+                    yield build(entity)
                 count_read += 1
 
             if self.api.batch_size < start and start > count_read + 1:
@@ -245,6 +450,86 @@ class EntityManager(object):
 
         return
 
+    def scan(self, checkpoint=None, cursor=None, checkpoint_every=1000, checkpoint_interval=None, on_checkpoint=None,
+             mode='entity', fields=None):
+        """
+        Method to get a resumable iterator over all entities of type.
+
+        Unlike all(), the position of the scan is kept in a ScanCursor which is
+        saved to the checkpoint file as the entities are processed. Calling
+        scan() again with the same checkpoint file, e.g. after the process died,
+        continues after the last checkpointed entity; once the scan is done it
+        yields nothing.
+        :param checkpoint (optional) The path of the checkpoint file, created if it does not exist.
+        :param cursor (optional) ScanCursor to resume from instead of the checkpoint file.
+        :param checkpoint_every (optional) Save the cursor after this many entities.
+        :param checkpoint_interval (optional) Save the cursor after this many seconds as well.
+        :param on_checkpoint (optional) function called with the cursor before it is saved.
+        :param mode (optional) 'entity' (default), 'lazy', 'dict' or 'tuple', see row_builder().
+        :param fields (optional) The fields kept in dict or tuple mode.
+        :raises GanException if the checkpoint is invalid or belongs to another type of entity.
+        :raises HTTPError if the data can not be fetched.
+        :return: Scan iterable with the entities, its cursor attribute holds the current ScanCursor.
+        """
+        return Scan(self, self.row_builder(mode, fields), checkpoint, cursor, checkpoint_every, checkpoint_interval,
+                    on_checkpoint)
+
+    def _page_path(self, page):
+        if page == 1:
+            return u'{base_path}/?paginate_by={batch_size}'.format(base_path=str.rstrip(self.base_path),
+                                                                   batch_size=self.api.batch_size)
+        return u'{base_path}/?paginate_by={batch_size}&page={page}'.format(base_path=str.rstrip(self.base_path),
+                                                                          batch_size=self.api.batch_size,
+                                                                          page=page)
+
+    def _fetch_page(self, page):
+        return self._get_page(self._page_path(page))
+
+    def _pages_version_key(self):
+        return u'{base_path}/#pages'.format(base_path=str.rstrip(self.base_path, '/'))
+
+    def _get_page(self, path):
+        if self.cache is None or not self.cache_pages:
+            return self.api.decode(self.api.call('GET', path))
+        # The pages are stored under a version that changes whenever the collection is written to.
+        key = u'{path}#{version}'.format(path=path, version=self.cache.get(self._pages_version_key(), 0))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return self.api.codec.decode(cached)
+        response = self.api.call('GET', path)
+        self.cache.set(key, response.content, self.cache_ttl)
+        return self.api.decode(response)
+
+    def _invalidate_pages(self):
+        if self.cache is not None and self.cache_pages:
+            # Pages of older versions expire before the version does.
+            self.cache.set(self._pages_version_key(), int(time.time() * 1000000), self.cache_ttl)
+
+    def _prefetched_all(self, start, stop, window, workers, build):
+        batch_size = self.api.batch_size
+        results = self._fetch_page(1)
+        count = results.get('count', 0)
+        if start >= count:
+            return
+
+        first_page = start // batch_size + 1
+        last_page = int(min(stop, count - 1)) // batch_size + 1
+        pages = bounded_imap(self._fetch_page, xrange(max(first_page, 2), last_page + 1), workers, window)
+        try:
+            if first_page > 1:
+                results = next(pages, {})
+
+            index = (first_page - 1) * batch_size
+            for results in itertools.chain([results], pages):
+                for entity in results.get('results', []):
+                    if index > stop:
+                        return
+                    if index >= start:
+                        yield build(entity)
+                    index += 1
+        finally:
+            pages.close()
+
     def delete(self, entity):
         """
          Deletes an entity.
@@ -252,4 +537,57 @@ class EntityManager(object):
          :param entity The entity to delete.
          :raises RequestException if there is an error from the API.
         """
-        return self.api.call('DELETE', self.lookup_path(entity))
\ No newline at end of file
+        path = self.lookup_path(entity)
+        try:
+            return self.api.call('DELETE', path)
+        finally:
+            if self.cache is not None:
+                self.cache.delete(path)
+                self._invalidate_pages()
+
+    def delete_many(self, items, concurrency=4):
+        """
+        Deletes many entities concurrently.
+
+        The items may be entities or plain ids (e.g. the emails of contacts),
+        no entities are constructed for the ids. They are read lazily from the
+        iterable and at most `concurrency` deletes are in flight. An entity
+        that does not exist (404) counts as already deleted and is reported
+        with the missing status; other failures do not abort the batch.
+
+            report = contact_manager.delete_many(emails, concurrency=16).run()
+            report.deleted, report.missing, report.failures, report.rate
+
+        :param items: iterable of entities or ids.
+        :param concurrency: The number of concurrent requests.
+        :return: BulkReport yielding a BulkResult per item, in completion order.
+        """
+        def delete(item):
+            try:
+                path = self.lookup_path(item) if isinstance(item, self.entity_class) else self.get_path(item)
+            except Exception as e:
+                return BulkResult(item, BulkReport.FAILED, error=e)
+            try:
+                self.api.call('DELETE', path)
+                return BulkResult(item, BulkReport.DELETED)
+            except HTTPError as e:
+                if e.response is not None and e.response.status_code == 404:
+                    return BulkResult(item, BulkReport.MISSING)
+                return BulkResult(item, BulkReport.FAILED, error=e)
+            except Exception as e:
+                return BulkResult(item, BulkReport.FAILED, error=e)
+            finally:
+                if self.cache is not None:
+                    self.cache.delete(path)
+
+        def results():
+            deletes = bounded_imap(delete, items, concurrency, window=concurrency * 2, ordered=False)
+            try:
+                for result in deletes:
+                    yield result
+            finally:
+                deletes.close()
+                if self.cache is not None:
+                    self._invalidate_pages()
+
+        return BulkReport(results())
\ No newline at end of file
@@ -0,0 +1,239 @@
+import csv
+import io
+import resource
+import time
+import zipfile
+from attribute_manager import AttributeManager
+from gan_exception import GanException
+from schema import compile_row_builder
+
+try:
+    import numpy
+    from numpy.lib import format as npy_format
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+class ExportReport(object):
+    """
+        Statistics of an export.
+
+        :var rows int The number of exported rows.
+        :var row_groups int The number of written row groups.
+        :var elapsed float Seconds spent.
+        :var peak_memory_kb int The peak resident memory of the process (kilobytes on Linux).
+    """
+    def __init__(self):
+        self.rows = 0
+        self.row_groups = 0
+        self.started = time.time()
+        self.elapsed = 0.0
+        self.peak_memory_kb = 0
+
+    def add(self, rows):
+        self.rows += rows
+        self.row_groups += 1
+        self.elapsed = time.time() - self.started
+        self.peak_memory_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    @property
+    def rate(self):
+        """
+            Throughput in rows per second.
+        """
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        return '<ExportReport rows={rows} rate={rate:.1f}/s peak_memory_kb={peak}>'.format(rows=self.rows,
+                                                                                         rate=self.rate,
+                                                                                         peak=self.peak_memory_kb)
+
+
+class ContactExporter(object):
+    """
+        Streams all contacts into columnar row groups.
+
+        Pages from ContactManager.all() are read as raw dicts and flattened:
+        every attribute becomes an 'attributes.<code>' column and the list
+        subscriptions become the 'lists' and 'cancelled_lists' membership
+        columns with space separated list hashes. Only one row group is held
+        in memory at a time.
+
+        :param contact_manager ContactManager to read the contacts with.
+        :param row_group_size (optional) The number of rows per row group.
+        :param attributes (optional) The attribute codes to export. Defaults to all attributes of the account.
+        :param prefetch (optional) The number of pages to prefetch, see EntityManager.all().
+    """
+    """
+        The contact fields exported as columns.
+        :var base_columns tuple
+    """
+    base_columns = ('email', 'first_name', 'last_name', 'active', 'created', 'updated')
+    membership_columns = ('lists', 'cancelled_lists')
+
+    def __init__(self, contact_manager, row_group_size=10000, attributes=None, prefetch=0):
+        self.contact_manager = contact_manager
+        self.row_group_size = row_group_size
+        self.prefetch = prefetch
+        self._attributes = list(attributes) if attributes is not None else None
+
+    @property
+    def attributes(self):
+        if self._attributes is None:
+            attribute_manager = AttributeManager(self.contact_manager.api)
+            self._attributes = [row.code for row in attribute_manager.all(mode='tuple', fields=['code'])]
+        return self._attributes
+
+    @property
+    def columns(self):
+        return (self.base_columns +
+                tuple(u'attributes.{code}'.format(code=code) for code in self.attributes) +
+                self.membership_columns)
+
+    @staticmethod
+    def memberships(data):
+        active = []
+        cancelled = []
+        for subscription in data.get('lists') or ():
+            if subscription.get('subscription_cancelled') or subscription.get('cancelled'):
+                cancelled.append(subscription.get('hash'))
+            else:
+                active.append(subscription.get('hash'))
+        return u' '.join(active), u' '.join(cancelled)
+
+    def iter_row_groups(self, start=0, stop=float('inf')):
+        """
+            Yields the contacts in row groups.
+
+            :param start Start from contact index.
+            :param stop Stop at contact index.
+            :return: generator with dicts mapping every column name to a list of values.
+        """
+        columns = self.columns
+        flat_columns = columns[:-len(self.membership_columns)]
+        build = compile_row_builder(flat_columns, 'tuple')
+        memberships = self.memberships
+
+        rows = []
+        for data in self.contact_manager.all(start, stop, prefetch=self.prefetch, mode='dict'):
+            rows.append(build(data) + memberships(data))
+            if len(rows) >= self.row_group_size:
+                yield dict(zip(columns, (list(column) for column in zip(*rows))))
+                rows = []
+        if rows:
+            yield dict(zip(columns, (list(column) for column in zip(*rows))))
+
+    def export(self, write, start=0, stop=float('inf')):
+        """
+            Passes every row group to write(row_group) and collects the statistics.
+
+            :return: ExportReport
+        """
+        report = ExportReport()
+        for row_group in self.iter_row_groups(start, stop):
+            write(row_group)
+            report.add(len(row_group['email']))
+        return report
+
+    def to_csv(self, fileobj, start=0, stop=float('inf')):
+        """
+            Writes the contacts as UTF-8 CSV with a header row.
+
+            :param fileobj A file object opened in binary mode, or a path.
+            :return: ExportReport
+        """
+        if isinstance(fileobj, basestring):
+            with open(fileobj, 'wb') as f:
+                return self.to_csv(f, start, stop)
+
+        columns = self.columns
+        writer = csv.writer(fileobj)
+        writer.writerow([column.encode('utf-8') for column in columns])
+
+        def encode(value):
+            if value is None:
+                return ''
+            if isinstance(value, unicode):
+                return value.encode('utf-8')
+            return value
+
+        def write(row_group):
+            values = [row_group[column] for column in columns]
+            writer.writerows([encode(value) for value in row] for row in zip(*values))
+
+        return self.export(write, start, stop)
+
+    def structured_array(self, row_group):
+        """
+            Converts a row group to a NumPy structured array.
+            The 'active' column is boolean, all other columns are unicode strings.
+        """
+        if numpy is None:
+            raise GanException(u'Missing dependency', u'NumPy is required for structured array exports.')
+        columns = self.columns
+        dtype = []
+        values = []
+        for column in columns:
+            if column == 'active':
+                dtype.append((column.encode('utf-8'), numpy.bool_))
+                values.append([bool(value) for value in row_group[column]])
+            else:
+                strings = [u'' if value is None else unicode(value) for value in row_group[column]]
+                dtype.append((column.encode('utf-8'), numpy.unicode_, max([len(s) for s in strings] + [1])))
+                values.append(strings)
+        return numpy.array(zip(*values), dtype=dtype)
+
+    def to_npz(self, path, start=0, stop=float('inf')):
+        """
+            Writes the contacts to a .npz archive with one structured array per row group
+            (row_group_00000, row_group_00001, ...). Requires NumPy.
+
+            :param path The path of the archive.
+            :return: ExportReport
+        """
+        if numpy is None:
+            raise GanException(u'Missing dependency', u'NumPy is required for .npz exports.')
+
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+            counter = [0]
+
+            def write(row_group):
+                buf = io.BytesIO()
+                npy_format.write_array(buf, self.structured_array(row_group), allow_pickle=False)
+                archive.writestr('row_group_{index:05d}.npy'.format(index=counter[0]), buf.getvalue())
+                counter[0] += 1
+
+            return self.export(write, start, stop)
+
+    def arrow_schema(self):
+        return pyarrow.schema([pyarrow.field(column, pyarrow.bool_() if column == 'active' else pyarrow.string())
+                               for column in self.columns])
+
+    def to_arrow(self, path, start=0, stop=float('inf')):
+        """
+            Writes the contacts to an Arrow IPC file with one record batch per row group.
+            Requires pyarrow.
+
+            :param path The path of the file.
+            :return: ExportReport
+        """
+        if pyarrow is None:
+            raise GanException(u'Missing dependency', u'pyarrow is required for Arrow exports.')
+
+        schema = self.arrow_schema()
+        sink = pyarrow.OSFile(path, 'wb')
+        writer = pyarrow.RecordBatchFileWriter(sink, schema)
+        try:
+            def write(row_group):
+                arrays = [pyarrow.array(row_group[field.name], type=field.type) for field in schema]
+                writer.write_batch(pyarrow.RecordBatch.from_arrays(arrays, schema.names))
+
+            return self.export(write, start, stop)
+        finally:
+            writer.close()
+            sink.close()
@@ -1,33 +1,66 @@
+import collections
+import math
+import Queue
+import sys
+import threading
 import urlparse
+from cache import LRUCache
+from multiprocessing.pool import ThreadPool
 
 
 class PaginatedResultSet(object):
     """
         Class to iterate result pages when searching for entities by query.
 
+        The pages visited are kept in a bounded LRU cache, so going back and
+        forth or jumping to a page with page(n) only queries the API for pages
+        not seen recently. With prefetch set, the next page is fetched in the
+        background as soon as a page has been loaded.
+
         :param manager EntityManager of Entity queried.
         :param data json data to populate class with entities and previous/next
+        :param build (optional) function building a result from the data, see EntityManager.row_builder().
+        :param filters (optional) The query parameters of the data, used to query the other pages.
+        :param cache_size (optional) The maximum number of pages kept in the cache.
+        :param prefetch (optional) Fetch the next page in the background.
         :raises
     """
-    def __init__(self, manager, data):
+    def __init__(self, manager, data, build=None, filters=None, cache_size=8, prefetch=False):
         self.manager = manager
-        self.entities = self.build_entities_list(data.get('results'))
-        self.count = data.get('count')
-        self.next_link = data.get('next')
-        self.previous_link = data.get('previous')
+        self.build = build if build else manager.row_builder()
+        self.filters = dict(filters or {})
+        self.page_number = int(self.filters.pop('page', 1))
+        self.page_size = int(self.filters['paginate_by']) if self.filters.get('paginate_by') else None
+        self.prefetch = prefetch
+        self.pages = LRUCache(max_size=max(1, cache_size))
+        self._single_flight = SingleFlight()
+        self._show(self.page_number, (self.build_entities_list(data.get('results')), data))
 
     def __iter__(self):
         return self
 
+    def __len__(self):
+        return self.num_pages
+
+    @property
+    def num_pages(self):
+        """
+            The number of pages, computed from the count of the results and the page size.
+        """
+        if not self.count:
+            return 0
+        if self.page_size:
+            return int(math.ceil(float(self.count) / self.page_size))
+        # Everything fits on the pages seen so far.
+        return self.page_number
+
     def build_entities_list(self, results):
         """
         :param results: results response of entities from api
         :return: list of constructed entities
         """
-        list = []
-        for result in results:
-            list.append(self.manager.construct_entity(result).set_persisted())
-        return list
+        build = self.build
+        return [build(result) for result in results]
 
     @staticmethod
     def url_params_to_dict(url):
@@ -39,6 +72,64 @@ class PaginatedResultSet(object):
         parsed = urlparse.parse_qsl(params)
         return dict(parsed)
 
+    def page_filters(self, number):
+        """
+        :param number: The page number.
+        :return: dict with the query parameters of the page.
+        """
+        filters = dict(self.filters)
+        if number > 1:
+            filters['page'] = number
+        return filters
+
+    def _fetch(self, number):
+        page = self.pages.get(number)
+        if page is None:
+            data = self.manager.query(filters=self.page_filters(number), as_json=True)
+            page = (self.build_entities_list(data.get('results')), data)
+            self.pages.set(number, page)
+        return page
+
+    def _load(self, number):
+        page = self.pages.get(number)
+        if page is None:
+            page = self._single_flight.do(number, self._fetch, number)
+        return page
+
+    def _prefetch(self, number):
+        try:
+            self._load(number)
+        except Exception:
+            # The page is fetched again, and the error raised, when it is shown.
+            pass
+
+    def _show(self, number, page):
+        entities, data = page
+        self.pages.set(number, page)
+        self.page_number = number
+        self.entities = entities
+        self.count = data.get('count')
+        self.next_link = data.get('next')
+        self.previous_link = data.get('previous')
+        if self.page_size is None and self.next_link:
+            self.page_size = len(entities)
+        if self.prefetch and self.next_link and self.pages.get(number + 1) is None:
+            thread = threading.Thread(target=self._prefetch, args=(number + 1,))
+            thread.daemon = True
+            thread.start()
+        return entities
+
+    def page(self, number):
+        """
+        Update Object with the given page of entity results and return list of the entities.
+        :param number: The page number, starting from 1.
+        :return: list of entities of the result page
+        :raises: IndexError if the page does not exist.
+        """
+        if number < 1 or number > max(self.page_number, self.num_pages):
+            raise IndexError(u'Page {number} out of range'.format(number=number))
+        return self._show(number, self._load(number))
+
     def next(self):
         """
         Update Object with next page of entity results and return list of the entities.
@@ -46,13 +137,7 @@ class PaginatedResultSet(object):
         :raises: StopIteration if no next is available
         """
         if self.next_link:
-            query_dict = self.url_params_to_dict(self.next_link)
-            next_data = self.manager.query(filters=query_dict, as_json=True)
-            self.count = next_data.get('count')
-            self.next_link = next_data.get('next')
-            self.previous_link = next_data.get('previous')
-            self.entities = self.build_entities_list(next_data.get('results'))
-            return self.entities
+            return self._show(self.page_number + 1, self._load(self.page_number + 1))
         else:
             raise StopIteration
 
@@ -63,12 +148,219 @@ class PaginatedResultSet(object):
         :raises: StopIteration if no previous is available
         """
         if self.previous_link:
-            query_dict = self.url_params_to_dict(self.previous_link)
-            prev_data = self.manager.query(filters=query_dict, as_json=True)
-            self.count = prev_data.get('count')
-            self.next_link = prev_data.get('next')
-            self.previous_link = prev_data.get('previous')
-            self.entities = self.build_entities_list(prev_data.get('results'))
-            return self.entities
+            return self._show(self.page_number - 1, self._load(self.page_number - 1))
         else:
-            raise StopIteration
\ No newline at end of file
+            raise StopIteration
+
+
+def _put(queue, stopped, item):
+    while not stopped.is_set():
+        try:
+            queue.put(item, timeout=0.1)
+            return True
+        except Queue.Full:
+            pass
+    return False
+
+
+def _produce(iterable, queue, stopped, done):
+    # Runs in the thread of a BackgroundIterator. It holds no reference to the
+    # iterator, so an abandoned iterator can be garbage collected and closed.
+    try:
+        for item in iterable:
+            if not _put(queue, stopped, (item, None)):
+                break
+        else:
+            _put(queue, stopped, (done, None))
+    except Exception:
+        _put(queue, stopped, (None, sys.exc_info()))
+    finally:
+        # Release the resources of a generator source, e.g. its pooled connection.
+        close = getattr(iterable, 'close', None)
+        if close is not None:
+            close()
+
+
+class BackgroundIterator(object):
+    """
+        Iterates over an iterable in a background thread.
+
+        Items are produced ahead of the consumer into a bounded buffer, so
+        the network round trips of a paginated generator overlap with the
+        processing done by the caller. Exceptions raised by the source are
+        re-raised in the consuming thread.
+
+        Call close(), or use the iterator as a context manager, when you stop
+        iterating before the end, e.g. with break; otherwise the thread keeps
+        the source open until the iterator is garbage collected.
+
+            with async_contact_manager.all() as contacts:
+                for contact in contacts:
+                    ...
+
+        :param iterable The source to iterate over.
+        :param buffer_size The maximum number of items read ahead.
+    """
+    _done = object()
+
+    def __init__(self, iterable, buffer_size=1):
+        self._queue = Queue.Queue(maxsize=max(1, buffer_size))
+        self._stopped = threading.Event()
+        self._finished = False
+        self._thread = threading.Thread(target=_produce, args=(iterable, self._queue, self._stopped, self._done))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        if self._finished:
+            raise StopIteration
+        item, exc_info = self._queue.get()
+        if exc_info:
+            self.close()
+            raise exc_info[0], exc_info[1], exc_info[2]
+        if item is self._done:
+            self.close()
+            raise StopIteration
+        return item
+
+    def close(self):
+        """
+            Stops the background thread and closes the source. Items read ahead are discarded.
+        """
+        self._finished = True
+        self._stopped.set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+
+def bounded_imap(func, iterable, workers, window=None, ordered=True):
+    """
+        Maps func over iterable on a pool of worker threads.
+
+        The input is consumed lazily and at most `window` calls are in
+        flight at any time, so arbitrarily long generators can be mapped
+        with constant memory. Exceptions raised by func are re-raised in
+        the consuming thread.
+
+        :param func The callable to apply to every item.
+        :param iterable The items.
+        :param workers The number of worker threads.
+        :param window (optional) The maximum number of pending calls. Defaults to workers.
+        :param ordered (optional) Yield the results in input order (default) or as they complete.
+        :return: generator with the results.
+    """
+    workers = max(1, workers)
+    window = max(1, window or workers)
+    pool = ThreadPool(workers)
+    try:
+        if ordered:
+            pending = collections.deque()
+            for item in iterable:
+                pending.append(pool.apply_async(func, (item,)))
+                if len(pending) >= window:
+                    yield pending.popleft().get()
+            while pending:
+                yield pending.popleft().get()
+        else:
+            done = Queue.Queue()
+
+            def run(item):
+                try:
+                    done.put((func(item), None))
+                except Exception:
+                    done.put((None, sys.exc_info()))
+
+            in_flight = 0
+            for item in iterable:
+                pool.apply_async(run, (item,))
+                in_flight += 1
+                while in_flight >= window or (in_flight and not done.empty()):
+                    result, exc_info = done.get()
+                    in_flight -= 1
+                    if exc_info:
+                        raise exc_info[0], exc_info[1], exc_info[2]
+                    yield result
+            while in_flight:
+                result, exc_info = done.get()
+                in_flight -= 1
+                if exc_info:
+                    raise exc_info[0], exc_info[1], exc_info[2]
+                yield result
+    finally:
+        pool.terminate()
+
+
+class SingleFlight(object):
+    """
+        Coalesces concurrent calls with the same key.
+
+        The first caller of a key runs the function while the callers
+        arriving before it finished wait and get the same result, or the
+        same exception re-raised. The key is forgotten as soon as the call
+        finished, so later callers run the function again.
+    """
+    class _Call(object):
+        __slots__ = ('event', 'result', 'exc_info')
+
+        def __init__(self):
+            self.event = threading.Event()
+            self.result = None
+            self.exc_info = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.shared = 0
+
+    def __getstate__(self):
+        # The calls in flight are not pickled.
+        state = dict(self.__dict__)
+        del state['_lock'], state['_calls']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, *args):
+        """
+            Runs func(*args), or waits for the call in flight for the key.
+
+            :param key The key identifying identical calls.
+            :param func The callable.
+            :return: The result of func.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+            else:
+                self.shared += 1
+        if not leader:
+            call.event.wait()
+            if call.exc_info:
+                raise call.exc_info[0], call.exc_info[1], call.exc_info[2]
+            return call.result
+
+        try:
+            call.result = func(*args)
+        except BaseException:
+            call.exc_info = sys.exc_info()
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
@@ -5,15 +5,18 @@ class List(Entity):
     """
     Represents a list of subscribers.
     """
-    email = None
-    name = None
-    sender = None
-    description = None
-    hash = None
-    responders_count = None
-    subscribers = None
-    created = None
-    url = None
-    subscribers_count = None
-    active_subscribers_count = None
-    responders = None
+    fields = (
+        'email',
+        'name',
+        'sender',
+        'description',
+        'hash',
+        'responders_count',
+        'subscribers',
+        'created',
+        'url',
+        'subscribers_count',
+        'active_subscribers_count',
+        'responders'
+    )
+    container_fields = ('responders',)
@@ -14,4 +14,6 @@ class ListManager(EntityManager):
         'sender',
         'description'
     ]
-    lookup_field = 'hash'
\ No newline at end of file
+    lookup_field = 'hash'
+    cache_ttl = 300
+    cache_pages = True
\ No newline at end of file
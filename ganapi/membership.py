@@ -0,0 +1,272 @@
+import array
+import binascii
+import collections
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def ids_to_bits(ids, size):
+    """
+        Packs integer ids into a bitset.
+
+        :param ids iterable of ints below size.
+        :param size The number of ids of the universe.
+        :return: long with bit i set for every id i.
+    """
+    if numpy is not None:
+        bools = numpy.zeros(size + -size % 8, dtype=numpy.bool_)
+        if isinstance(ids, array.array):
+            bools[numpy.frombuffer(ids, dtype=numpy.dtype(ids.typecode))] = True
+        else:
+            bools[list(ids)] = True
+        # packbits puts the first of every 8 values in the highest bit.
+        data = numpy.packbits(bools.reshape(-1, 8)[:, ::-1]).tobytes()
+    else:
+        buffer = bytearray((size + 7) // 8)
+        for id in ids:
+            buffer[id >> 3] |= 1 << (id & 7)
+        data = bytes(buffer)
+    if not data:
+        return 0L
+    # The bytes are little endian, long() parses big endian hex.
+    return long(binascii.hexlify(data[::-1]), 16)
+
+
+def bits_to_ids(bits):
+    """
+        Unpacks a bitset.
+
+        :param bits long bitset.
+        :return: list with the ids of the set bits in ascending order.
+    """
+    if not bits:
+        return []
+    hex_digits = '%x' % bits
+    data = binascii.unhexlify(('0' if len(hex_digits) % 2 else '') + hex_digits)[::-1]
+    if numpy is not None:
+        bools = numpy.unpackbits(numpy.frombuffer(data, dtype=numpy.uint8)).reshape(-1, 8)[:, ::-1]
+        return numpy.flatnonzero(bools).tolist()
+    ids = []
+    for offset, byte in enumerate(bytearray(data)):
+        if byte:
+            base = offset << 3
+            ids.extend(base + bit for bit in xrange(8) if byte >> bit & 1)
+    return ids
+
+
+class Segment(object):
+    """
+        A set of contacts of a MembershipIndex, stored as a bitset.
+
+        Segments of the same index are combined with the set operators
+        & (intersection), | (union), - (difference), ^ (symmetric difference)
+        and ~ (complement), each a single operation on the bitsets. The
+        emails are only materialized when the segment is iterated.
+
+        :param index The MembershipIndex.
+        :param bits long with bit i set for the contact with id i.
+    """
+    __slots__ = ('index', 'bits')
+
+    def __init__(self, index, bits):
+        self.index = index
+        self.bits = bits
+
+    def _other(self, other):
+        if not isinstance(other, Segment) or other.index is not self.index:
+            raise ValueError('Only segments of the same index can be combined.')
+        return other.bits
+
+    def __and__(self, other):
+        return Segment(self.index, self.bits & self._other(other))
+
+    def __or__(self, other):
+        return Segment(self.index, self.bits | self._other(other))
+
+    def __sub__(self, other):
+        return Segment(self.index, self.bits & ~self._other(other))
+
+    def __xor__(self, other):
+        return Segment(self.index, self.bits ^ self._other(other))
+
+    def __invert__(self):
+        return Segment(self.index, self.index.everyone().bits & ~self.bits)
+
+    def __eq__(self, other):
+        return isinstance(other, Segment) and other.index is self.index and other.bits == self.bits
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __len__(self):
+        return bin(self.bits).count('1')
+
+    def __nonzero__(self):
+        return bool(self.bits)
+
+    def __contains__(self, email):
+        id = self.index.id_of(email)
+        return id is not None and bool(self.bits >> id & 1)
+
+    def ids(self):
+        """
+            :return: list with the integer ids of the contacts, see MembershipIndex.id_of().
+        """
+        return bits_to_ids(self.bits)
+
+    def emails(self):
+        """
+            :return: list with the emails of the contacts, in the order they were indexed.
+        """
+        emails = self.index.emails
+        return [emails[id] for id in self.ids()]
+
+    def __iter__(self):
+        return iter(self.emails())
+
+    def __repr__(self):
+        return '<Segment {count} contacts>'.format(count=len(self))
+
+
+class MembershipIndex(object):
+    """
+        In-memory index of the list subscriptions of all contacts.
+
+        Every contact gets a compact integer id in the order it is added and
+        every list a bitset of the ids of its active and of its cancelled
+        subscribers, so segment queries like "in list A and B but not C" are
+        answered with a few bitwise operations instead of a scan over the
+        lists of every contact:
+
+            index = MembershipIndex.build(contact_manager)
+            segment = index.subscribers(a) & index.subscribers(b) - index.subscribers(c, 'all')
+
+        The bitsets are packed from the ids with NumPy if it is installed.
+        Contacts can be added until the index is queried and again
+        afterwards, which repacks the bitsets of the changed lists; a contact
+        can only be added once, build a new index to refresh it.
+
+        :var emails list The emails of the contacts by id.
+    """
+    ACTIVE = 'active'
+    CANCELLED = 'cancelled'
+    ALL = 'all'
+
+    def __init__(self):
+        self.emails = []
+        self._ids = {}
+        # Maps (status, list hash) to an array of contact ids and to the packed bitset.
+        self._members = collections.defaultdict(lambda: array.array('i'))
+        self._bitsets = {}
+        self._everyone = None
+
+    @classmethod
+    def build(cls, contact_manager, prefetch=0):
+        """
+            Builds the index with a single scan over all contacts.
+
+            :param contact_manager ContactManager to read the contacts with.
+            :param prefetch (optional) The number of pages to prefetch, see EntityManager.all().
+            :return: MembershipIndex
+        """
+        index = cls()
+        for data in contact_manager.all(prefetch=prefetch, mode='dict'):
+            index.add(data.get('email'), data.get('lists'))
+        return index
+
+    def add(self, email, subscriptions):
+        """
+            Adds a contact.
+
+            :param email The email of the contact.
+            :param subscriptions list of subscription dicts with the list hash, as in the lists of a contact.
+            :return: int The id of the contact.
+            :raises ValueError if the contact was already added.
+        """
+        if email in self._ids:
+            raise ValueError(u'{email} is already indexed.'.format(email=email))
+        id = self._ids[email] = len(self.emails)
+        self.emails.append(email)
+        self._everyone = None
+        members = self._members
+        bitsets = self._bitsets
+        for subscription in subscriptions or ():
+            get = subscription.get
+            key = (self.CANCELLED if get('subscription_cancelled') or get('cancelled') else self.ACTIVE, get('hash'))
+            members[key].append(id)
+            if bitsets:
+                # The bitset of the list is packed again on the next query.
+                bitsets.pop(key, None)
+        return id
+
+    def __len__(self):
+        return len(self.emails)
+
+    def id_of(self, email):
+        """
+            :return: int The id of the contact or None if it is not indexed.
+        """
+        return self._ids.get(email)
+
+    @property
+    def lists(self):
+        """
+            The hashes of the lists with subscribers.
+        """
+        return sorted(set(hash for status, hash in self._members))
+
+    def _bits(self, key):
+        bits = self._bitsets.get(key)
+        if bits is None:
+            members = self._members.get(key)
+            bits = self._bitsets[key] = ids_to_bits(members, len(self.emails)) if members else 0L
+        return bits
+
+    def subscribers(self, hash, status=ACTIVE):
+        """
+            Returns the subscribers of a list.
+
+            :param hash The hash of the list.
+            :param status (optional) 'active' (default), 'cancelled' or 'all' subscriptions.
+            :return: Segment
+            :raises ValueError if the status is invalid.
+        """
+        if status == self.ALL:
+            return Segment(self, self._bits((self.ACTIVE, hash)) | self._bits((self.CANCELLED, hash)))
+        if status not in (self.ACTIVE, self.CANCELLED):
+            raise ValueError(u'{status} is not a valid status! Valid statuses are active, cancelled, all.'.format(
+                status=status))
+        return Segment(self, self._bits((status, hash)))
+
+    def everyone(self):
+        """
+            :return: Segment with all contacts of the index.
+        """
+        if self._everyone is None:
+            self._everyone = (1L << len(self.emails)) - 1
+        return Segment(self, self._everyone)
+
+    def segment(self, all_of=(), any_of=(), none_of=(), status=ACTIVE):
+        """
+            Answers a segment query over the lists.
+
+            :param all_of (optional) The hashes of the lists the contacts are subscribed to, all of them.
+            :param any_of (optional) The hashes of the lists the contacts are subscribed to, at least one of them.
+            :param none_of (optional) The hashes of the lists the contacts are not subscribed to, with any status.
+            :param status (optional) The status of the subscriptions of all_of and any_of, see subscribers().
+            :return: Segment
+        """
+        segment = self.everyone()
+        for hash in all_of:
+            segment &= self.subscribers(hash, status)
+        if any_of:
+            union = Segment(self, 0L)
+            for hash in any_of:
+                union |= self.subscribers(hash, status)
+            segment &= union
+        for hash in none_of:
+            segment -= self.subscribers(hash, self.ALL)
+        return segment
@@ -0,0 +1,216 @@
+import bisect
+import collections
+import threading
+import time
+
+
+def endpoint_of(resource_path):
+    """
+        Reduces a resource path to its endpoint by replacing the identifiers with {id}
+        and dropping the query, e.g. 'contacts/john@example.com/' -> 'contacts/{id}/'.
+
+        :param resource_path string The path passed to Api.call().
+        :return: string
+    """
+    parts = resource_path.split('?', 1)[0].strip('/').split('/')
+    return u'/'.join(part if i % 2 == 0 else u'{id}' for i, part in enumerate(parts)) + u'/'
+
+
+class Histogram(object):
+    """
+        Cumulative histogram with fixed bucket bounds, as used by Prometheus.
+
+        :param buckets The upper bounds of the buckets, an implicit +Inf bucket is added.
+    """
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """
+            :return: list of (upper bound, number of observations <= upper bound) tuples, ending with +Inf.
+        """
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def snapshot(self):
+        return {'count': self.count,
+                'sum': self.sum,
+                'buckets': self.cumulative()}
+
+
+class EndpointStats(object):
+    """
+        The statistics of the calls of one method to one endpoint.
+    """
+    def __init__(self, latency_buckets, size_buckets):
+        self.latency = Histogram(latency_buckets)
+        self.bytes_sent = Histogram(size_buckets)
+        self.bytes_received = Histogram(size_buckets)
+        self.retries = 0
+        self.statuses = collections.Counter()
+
+    def snapshot(self):
+        return {'count': self.latency.count,
+                'latency': self.latency.snapshot(),
+                'bytes_sent': self.bytes_sent.snapshot(),
+                'bytes_received': self.bytes_received.snapshot(),
+                'retries': self.retries,
+                'status': dict((str(status), count) for status, count in self.statuses.items())}
+
+
+class Metrics(object):
+    """
+        Thread-safe registry of the metrics of an Api.
+
+        Records per endpoint histograms of the latency and of the bytes sent
+        and received, the number of retries and the status codes of the
+        calls, plus the time spent in each phase of a call: 'network' (the
+        HTTP round trips, retries included), 'decode' (JSON parsing) and
+        'construct' (building entities or rows from the decoded data).
+
+        :param latency_buckets (optional) The bucket bounds of the durations in seconds.
+        :param size_buckets (optional) The bucket bounds of the sizes in bytes.
+    """
+    LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+    SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576)
+    PHASES = ('network', 'decode', 'construct')
+
+    def __init__(self, latency_buckets=None, size_buckets=None):
+        self.latency_buckets = tuple(latency_buckets or self.LATENCY_BUCKETS)
+        self.size_buckets = tuple(size_buckets or self.SIZE_BUCKETS)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def __getstate__(self):
+        # Locks can not be pickled, the copy gets its own.
+        state = dict(self.__dict__)
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """
+            Discards all recorded metrics.
+        """
+        with self._lock:
+            self.endpoints = {}
+            self.phases = dict((phase, Histogram(self.latency_buckets)) for phase in self.PHASES)
+
+    def observe_request(self, method, endpoint, status, seconds, bytes_sent=0, bytes_received=0, retries=0):
+        """
+            Records a call.
+
+            :param method string The HTTP method.
+            :param endpoint string The endpoint, see endpoint_of().
+            :param status The status code of the last response or 'error' if the call failed to connect.
+            :param seconds float The duration of the call, retries included.
+            :param bytes_sent int The size of the request body.
+            :param bytes_received int The size of the response body.
+            :param retries int The number of retries.
+        """
+        with self._lock:
+            stats = self.endpoints.get((method, endpoint))
+            if stats is None:
+                stats = self.endpoints[(method, endpoint)] = EndpointStats(self.latency_buckets, self.size_buckets)
+            stats.latency.observe(seconds)
+            stats.bytes_sent.observe(bytes_sent)
+            stats.bytes_received.observe(bytes_received)
+            stats.retries += retries
+            stats.statuses[status] += 1
+            self.phases['network'].observe(seconds)
+
+    def observe_phase(self, phase, seconds):
+        """
+            Records the duration of a phase.
+
+            :param phase string One of PHASES.
+            :param seconds float The duration.
+        """
+        with self._lock:
+            self.phases[phase].observe(seconds)
+
+    def timed(self, phase, func):
+        """
+            Wraps a function so that the duration of every call is recorded as the given phase.
+
+            :return: function
+        """
+        def timed(*args, **kwargs):
+            started = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.observe_phase(phase, time.time() - started)
+        return timed
+
+    def snapshot(self):
+        """
+            :return: dict with the 'requests' per 'METHOD endpoint' and the 'phases'.
+        """
+        with self._lock:
+            return {'requests': dict((u'{0} {1}'.format(method, endpoint), stats.snapshot())
+                                     for (method, endpoint), stats in self.endpoints.items()),
+                    'phases': dict((phase, histogram.snapshot()) for phase, histogram in self.phases.items())}
+
+    def prometheus(self, prefix='ganapi'):
+        """
+            Renders the metrics in the Prometheus text exposition format.
+
+            :param prefix string The prefix of the metric names.
+            :return: string
+        """
+        lines = []
+
+        def histogram(name, help, samples):
+            lines.append(u'# HELP {0}_{1} {2}'.format(prefix, name, help))
+            lines.append(u'# TYPE {0}_{1} histogram'.format(prefix, name))
+            for labels, value in samples:
+                for bound, count in value.cumulative():
+                    lines.append(u'{0}_{1}_bucket{{{2}le="{3}"}} {4}'.format(prefix, name, labels,
+                                                                          '+Inf' if bound == float('inf') else repr(bound),
+                                                                          count))
+                lines.append(u'{0}_{1}_sum{{{2}}} {3}'.format(prefix, name, labels.rstrip(','), repr(value.sum)))
+                lines.append(u'{0}_{1}_count{{{2}}} {3}'.format(prefix, name, labels.rstrip(','), value.count))
+
+        def counter(name, help, samples):
+            lines.append(u'# HELP {0}_{1} {2}'.format(prefix, name, help))
+            lines.append(u'# TYPE {0}_{1} counter'.format(prefix, name))
+            for labels, value in samples:
+                lines.append(u'{0}_{1}{{{2}}} {3}'.format(prefix, name, labels.rstrip(','), value))
+
+        with self._lock:
+            endpoints = sorted((u'method="{0}",endpoint="{1}",'.format(method, escape(endpoint)), stats)
+                               for (method, endpoint), stats in self.endpoints.items())
+            histogram('request_duration_seconds', 'Duration of the API calls, retries included.',
+                      [(labels, stats.latency) for labels, stats in endpoints])
+            histogram('request_sent_bytes', 'Size of the request bodies.',
+                      [(labels, stats.bytes_sent) for labels, stats in endpoints])
+            histogram('response_received_bytes', 'Size of the response bodies.',
+                      [(labels, stats.bytes_received) for labels, stats in endpoints])
+            counter('request_retries_total', 'Number of retried API calls.',
+                    [(labels, stats.retries) for labels, stats in endpoints])
+            counter('responses_total', 'Number of API responses by status code.',
+                    [(u'{0}status="{1}",'.format(labels, status), count)
+                     for labels, stats in endpoints for status, count in sorted(stats.statuses.items())])
+            histogram('phase_duration_seconds', 'Time spent in the network, decode and construct phases.',
+                      [(u'phase="{0}",'.format(phase), self.phases[phase]) for phase in self.PHASES])
+        return u'\n'.join(lines) + u'\n'
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
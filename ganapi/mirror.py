@@ -0,0 +1,254 @@
+import json
+import sqlite3
+import time
+from attribute_manager import AttributeManager
+from contact_manager import ContactManager
+from list_manager import ListManager
+
+
+class SyncReport(object):
+    """
+        Statistics of a mirror synchronization.
+    """
+    def __init__(self):
+        self.added = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.deleted = 0
+        self.started = time.time()
+        self.elapsed = 0.0
+
+    def __repr__(self):
+        return '<SyncReport added={added} updated={updated} unchanged={unchanged} deleted={deleted}>'.format(
+            added=self.added, updated=self.updated, unchanged=self.unchanged, deleted=self.deleted)
+
+
+class LocalMirror(object):
+    """
+        Local SQLite mirror of the contacts, lists and attributes of an account.
+
+        sync() scans the API and only rewrites the contacts whose `updated`
+        timestamp changed since the last run; contacts, lists and attributes
+        that are gone from the API are deleted from the mirror. The lookup
+        methods answer from the indexed local tables without calling the API.
+
+        :param api The Api to synchronize from.
+        :param path The path of the SQLite database, ':memory:' for an in-memory mirror.
+        :param prefetch (optional) The number of contact pages to prefetch while synchronizing.
+    """
+    schema = '''
+        CREATE TABLE IF NOT EXISTS contacts (
+            email TEXT PRIMARY KEY,
+            first_name TEXT,
+            last_name TEXT,
+            active INTEGER,
+            created TEXT,
+            updated TEXT,
+            data TEXT,
+            generation INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS contact_attributes (
+            email TEXT NOT NULL,
+            code TEXT NOT NULL,
+            value TEXT,
+            PRIMARY KEY (email, code)
+        );
+        CREATE INDEX IF NOT EXISTS contact_attributes_value ON contact_attributes (code, value);
+        CREATE TABLE IF NOT EXISTS subscriptions (
+            email TEXT NOT NULL,
+            hash TEXT NOT NULL,
+            cancelled INTEGER NOT NULL,
+            PRIMARY KEY (email, hash)
+        );
+        CREATE INDEX IF NOT EXISTS subscriptions_hash ON subscriptions (hash, cancelled);
+        CREATE TABLE IF NOT EXISTS lists (
+            hash TEXT PRIMARY KEY,
+            name TEXT,
+            data TEXT,
+            generation INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS attributes (
+            code TEXT PRIMARY KEY,
+            name TEXT,
+            data TEXT,
+            generation INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS sync_state (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    '''
+
+    def __init__(self, api, path, prefetch=0):
+        self.api = api
+        self.prefetch = prefetch
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(self.schema)
+
+    def close(self):
+        self.connection.close()
+
+    def _state(self, key, default=None):
+        row = self.connection.execute('SELECT value FROM sync_state WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_state(self, key, value):
+        self.connection.execute('INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)', (key, value))
+
+    @property
+    def last_sync(self):
+        """
+            The time of the last completed synchronization as a UNIX timestamp, or None.
+        """
+        value = self._state('last_sync')
+        return float(value) if value is not None else None
+
+    def sync(self, batch_size=500):
+        """
+            Brings the mirror up to date with the API.
+
+            Deletions are only applied once a scan completed, so a failed sync
+            leaves the mirror consistent with the previous one.
+
+            :param batch_size The number of contacts written per transaction.
+            :return: SyncReport for the contacts.
+            :raises HTTPError if the data can not be fetched.
+        """
+        generation = int(self._state('generation', 0)) + 1
+        self._sync_simple(ListManager(self.api), 'lists', 'hash', generation)
+        self._sync_simple(AttributeManager(self.api), 'attributes', 'code', generation)
+
+        report = SyncReport()
+        batch = []
+        for data in ContactManager(self.api).all(prefetch=self.prefetch, mode='dict'):
+            batch.append(data)
+            if len(batch) >= batch_size:
+                self._sync_contacts(batch, generation, report)
+                batch = []
+        self._sync_contacts(batch, generation, report)
+
+        with self.connection:
+            stale = 'SELECT email FROM contacts WHERE generation != ?'
+            self.connection.execute('DELETE FROM contact_attributes WHERE email IN ({stale})'.format(stale=stale),
+                                    (generation,))
+            self.connection.execute('DELETE FROM subscriptions WHERE email IN ({stale})'.format(stale=stale),
+                                    (generation,))
+            report.deleted = self.connection.execute('DELETE FROM contacts WHERE generation != ?',
+                                                     (generation,)).rowcount
+            self._set_state('generation', generation)
+            self._set_state('last_sync', repr(report.started))
+        report.elapsed = time.time() - report.started
+        return report
+
+    def _sync_simple(self, manager, table, key, generation):
+        rows = [(data.get(key), data.get('name'), json.dumps(data), generation)
+                for data in manager.all(mode='dict')]
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO {table} ({key}, name, data, generation) '
+                                        'VALUES (?, ?, ?, ?)'.format(table=table, key=key), rows)
+            self.connection.execute('DELETE FROM {table} WHERE generation != ?'.format(table=table), (generation,))
+
+    def _sync_contacts(self, batch, generation, report):
+        if not batch:
+            return
+        emails = [data.get('email') for data in batch]
+        known = {}
+        for offset in range(0, len(emails), 500):
+            chunk = emails[offset:offset + 500]
+            query = 'SELECT email, updated FROM contacts WHERE email IN ({params})'.format(params=','.join('?' * len(chunk)))
+            known.update(self.connection.execute(query, chunk).fetchall())
+
+        unchanged = []
+        changed = []
+        for data in batch:
+            email = data.get('email')
+            if email in known and known[email] == data.get('updated'):
+                unchanged.append((generation, email))
+            else:
+                changed.append(data)
+                if email in known:
+                    report.updated += 1
+                else:
+                    report.added += 1
+        report.unchanged += len(unchanged)
+
+        with self.connection:
+            self.connection.executemany('UPDATE contacts SET generation = ? WHERE email = ?', unchanged)
+            changed_emails = [(data.get('email'),) for data in changed]
+            self.connection.executemany('DELETE FROM contact_attributes WHERE email = ?', changed_emails)
+            self.connection.executemany('DELETE FROM subscriptions WHERE email = ?', changed_emails)
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO contacts (email, first_name, last_name, active, created, updated, data, generation) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(data.get('email'), data.get('first_name'), data.get('last_name'), data.get('active'),
+                  data.get('created'), data.get('updated'), json.dumps(data), generation) for data in changed])
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO contact_attributes (email, code, value) VALUES (?, ?, ?)',
+                [(data.get('email'), code, value)
+                 for data in changed for code, value in (data.get('attributes') or {}).items()])
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO subscriptions (email, hash, cancelled) VALUES (?, ?, ?)',
+                [(data.get('email'), subscription.get('hash'),
+                  bool(subscription.get('subscription_cancelled') or subscription.get('cancelled')))
+                 for data in changed for subscription in (data.get('lists') or ())])
+
+    def _load(self, query, params):
+        row = self.connection.execute(query, params).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_contact(self, email):
+        """
+            :return: dict with the contact data as returned by the API, or None.
+        """
+        return self._load('SELECT data FROM contacts WHERE email = ?', (email,))
+
+    def get_list(self, hash):
+        """
+            :return: dict with the list data as returned by the API, or None.
+        """
+        return self._load('SELECT data FROM lists WHERE hash = ?', (hash,))
+
+    def get_attribute(self, code):
+        """
+            :return: dict with the attribute data as returned by the API, or None.
+        """
+        return self._load('SELECT data FROM attributes WHERE code = ?', (code,))
+
+    def is_subscribed(self, email, hash):
+        """
+            :return: True if the contact has an active subscription to the list.
+        """
+        row = self.connection.execute('SELECT 1 FROM subscriptions WHERE email = ? AND hash = ? AND cancelled = 0',
+                                      (email, hash)).fetchone()
+        return row is not None
+
+    def list_members(self, hash, include_cancelled=False):
+        """
+            :return: list with the emails of the contacts subscribed to the list.
+        """
+        query = 'SELECT email FROM subscriptions WHERE hash = ?'
+        if not include_cancelled:
+            query += ' AND cancelled = 0'
+        return [row[0] for row in self.connection.execute(query + ' ORDER BY email', (hash,))]
+
+    def count_list_members(self, hash, include_cancelled=False):
+        """
+            :return: the number of contacts subscribed to the list.
+        """
+        query = 'SELECT COUNT(*) FROM subscriptions WHERE hash = ?'
+        if not include_cancelled:
+            query += ' AND cancelled = 0'
+        return self.connection.execute(query, (hash,)).fetchone()[0]
+
+    def contacts_with_attribute(self, code, value):
+        """
+            :return: list with the emails of the contacts having the attribute value.
+        """
+        return [row[0] for row in self.connection.execute(
+            'SELECT email FROM contact_attributes WHERE code = ? AND value = ? ORDER BY email', (code, value))]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
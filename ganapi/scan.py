@@ -0,0 +1,227 @@
+import json
+import os
+import tempfile
+import time
+from gan_exception import GanException
+
+
+class ScanCursor(object):
+    """
+        The position of a resumable scan, see EntityManager.scan().
+
+        The cursor points right after the last entity processed: `offset`
+        entities of page `page` have been read and the lookup field (e.g. the
+        email) of the last one is kept in `last_key`, so a resumed scan finds
+        its place even if entities were added or removed in front of it.
+
+        :var resource str The base path of the scanned entities.
+        :var page int The page being read, starting at 1.
+        :var page_size int The page size of the scan, kept when resuming.
+        :var offset int The number of entities of the page already processed.
+        :var count int The total count reported by the API when the cursor was last moved.
+        :var last_key The lookup field of the last processed entity, None before the first one.
+        :var emitted int The number of entities processed in total.
+        :var done bool Whether the scan has finished.
+        :var state dict Application data saved with the cursor, e.g. the size of the output file.
+    """
+    fields = ('resource', 'page', 'page_size', 'offset', 'count', 'last_key', 'emitted', 'done', 'state')
+
+    def __init__(self, resource, page_size, page=1, offset=0, count=None, last_key=None, emitted=0, done=False,
+                 state=None):
+        self.resource = resource
+        self.page = page
+        self.page_size = page_size
+        self.offset = offset
+        self.count = count
+        self.last_key = last_key
+        self.emitted = emitted
+        self.done = done
+        self.state = state if state is not None else {}
+
+    def to_dict(self):
+        return dict((field, getattr(self, field)) for field in self.fields)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**dict((field, data[field]) for field in cls.fields if field in data))
+
+    def save(self, path):
+        """
+            Writes the cursor to a checkpoint file.
+
+            The file is replaced atomically, so a crash while saving leaves the previous checkpoint intact.
+
+            :param path The path of the checkpoint file.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(prefix='.checkpoint-', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as temp_file:
+                json.dump(self.to_dict(), temp_file)
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+            os.rename(temp_path, path)
+        except:
+            os.remove(temp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """
+            Reads a cursor from a checkpoint file.
+
+            :param path The path of the checkpoint file.
+            :return: ScanCursor or None if the file does not exist.
+            :raises GanException if the file is not a valid checkpoint.
+        """
+        try:
+            with open(path) as checkpoint_file:
+                data = json.load(checkpoint_file)
+        except IOError:
+            if os.path.exists(path):
+                raise
+            return None
+        except ValueError:
+            raise GanException(u'Invalid checkpoint', u'{path} is not a valid checkpoint file.'.format(path=path))
+        return cls.from_dict(data)
+
+    def __repr__(self):
+        return '<ScanCursor {resource} page={page} offset={offset} emitted={emitted}{done}>'.format(
+            resource=self.resource, page=self.page, offset=self.offset, emitted=self.emitted,
+            done=' done' if self.done else '')
+
+
+class Scan(object):
+    """
+        Iterates over all entities of a manager page by page, keeping a ScanCursor.
+
+        The cursor only moves past an entity when the next one is requested,
+        i.e. after the entity has been processed, and is saved to the
+        checkpoint file every `checkpoint_every` entities, every
+        `checkpoint_interval` seconds and when the scan finishes. A scan
+        created with the same checkpoint file resumes right after the last
+        saved entity. For exactly-once output, write the output position into
+        cursor.state from `on_checkpoint` and restore it when resuming, see
+        the README.
+
+        :param manager The EntityManager to scan.
+        :param build function building the yielded rows from the raw dicts, see EntityManager.row_builder().
+        :param checkpoint (optional) The path of the checkpoint file.
+        :param cursor (optional) ScanCursor to resume from. Defaults to the one in the checkpoint file.
+        :param checkpoint_every (optional) Save the cursor after this many entities.
+        :param checkpoint_interval (optional) Save the cursor after this many seconds.
+        :param on_checkpoint (optional) function called with the cursor before it is saved.
+        :raises GanException if the cursor belongs to another resource.
+    """
+    def __init__(self, manager, build, checkpoint=None, cursor=None, checkpoint_every=1000, checkpoint_interval=None,
+                 on_checkpoint=None):
+        self.manager = manager
+        self.build = build
+        self.checkpoint_path = checkpoint
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_interval = checkpoint_interval
+        self.on_checkpoint = on_checkpoint
+        resource = str.rstrip(manager.base_path, '/')
+        if cursor is None and checkpoint is not None:
+            cursor = ScanCursor.load(checkpoint)
+        if cursor is None:
+            cursor = ScanCursor(resource, manager.api.batch_size)
+        elif cursor.resource != resource:
+            raise GanException(u'Invalid checkpoint',
+                               u'The cursor belongs to {resource}, not {base_path}.'.format(resource=cursor.resource,
+                                                                                        base_path=resource))
+        self.cursor = cursor
+        self._iterator = None
+        self._checkpointed = (cursor.emitted, time.time())
+
+    @property
+    def resumed(self):
+        """
+            Whether the scan continues from an earlier cursor.
+        """
+        return self.cursor.emitted > 0 or self.cursor.done
+
+    def checkpoint(self):
+        """
+            Saves the cursor to the checkpoint file, after calling on_checkpoint.
+        """
+        if self.on_checkpoint is not None:
+            self.on_checkpoint(self.cursor)
+        if self.checkpoint_path is not None:
+            self.cursor.save(self.checkpoint_path)
+        self._checkpointed = (self.cursor.emitted, time.time())
+
+    def _fetch(self, page):
+        return self.manager._get_page(u'{base_path}/?paginate_by={page_size}&page={page}'.format(
+            base_path=self.cursor.resource, page_size=self.cursor.page_size, page=page))
+
+    def _locate(self, results, key):
+        lookup_field = self.manager.lookup_field
+        for index, data in enumerate(results.get('results', [])):
+            if data.get(lookup_field) == key:
+                return index
+        return None
+
+    def _resume(self):
+        """
+            Finds the page and index of the entity following cursor.last_key.
+
+            :return: (page, results, index) tuple.
+        """
+        cursor = self.cursor
+        results = self._fetch(cursor.page)
+        if cursor.last_key is None:
+            return cursor.page, results, cursor.offset
+        index = self._locate(results, cursor.last_key)
+        if index is not None:
+            return cursor.page, results, index + 1
+
+        # The entities moved: forward if some were added before the cursor, backward if some were removed.
+        count = results.get('count', 0)
+        page = None
+        if count > cursor.count and results.get('next'):
+            page = cursor.page + 1
+        elif count < cursor.count and cursor.page > 1:
+            page = cursor.page - 1
+        if page is not None:
+            other = self._fetch(page)
+            index = self._locate(other, cursor.last_key)
+            if index is not None:
+                return page, other, index + 1
+        # The last entity itself is gone.
+        return cursor.page, results, min(cursor.offset, len(results.get('results', [])))
+
+    def __iter__(self):
+        if self._iterator is None:
+            self._iterator = self._scan()
+        return self._iterator
+
+    def _scan(self):
+        cursor = self.cursor
+        if cursor.done:
+            return
+        lookup_field = self.manager.lookup_field
+        build = self.build
+        page, results, index = self._resume()
+        while True:
+            cursor.page = page
+            cursor.offset = index
+            cursor.count = results.get('count', 0)
+            rows = results.get('results', [])
+            for data in rows[index:]:
+                yield build(data)
+                cursor.offset += 1
+                cursor.last_key = data.get(lookup_field)
+                cursor.emitted += 1
+                if self.checkpoint_every and cursor.emitted - self._checkpointed[0] >= self.checkpoint_every:
+                    self.checkpoint()
+                elif self.checkpoint_interval is not None and \
+                        time.time() - self._checkpointed[1] >= self.checkpoint_interval:
+                    self.checkpoint()
+            if not results.get('next') or not rows:
+                break
+            page += 1
+            index = 0
+            results = self._fetch(page)
+        cursor.done = True
+        self.checkpoint()
@@ -0,0 +1,157 @@
+import collections
+import re
+
+_identifier = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+_normalizers = {}
+_row_builders = {}
+
+
+def _compile(name, lines, namespace):
+    source = '\n'.join(lines)
+    exec compile(source, '<ganapi.schema {name}>'.format(name=name), 'exec') in namespace
+    return namespace[name]
+
+
+def check_fields(fields):
+    """
+        Validates a field schema.
+
+        :param fields: iterable of field names.
+        :return: tuple with the field names.
+        :raises ValueError if a name is not a valid identifier or is repeated.
+    """
+    fields = tuple(fields)
+    for field in fields:
+        if not _identifier.match(field) or field.startswith('__'):
+            raise ValueError(u'Invalid field name: {field!r}'.format(field=field))
+    if len(set(fields)) != len(fields):
+        raise ValueError(u'Duplicate field names in {fields!r}'.format(fields=fields))
+    return fields
+
+
+def copy_container(value):
+    """
+        Copies a dict, or a list along with the dicts in it, like the compiled constructors do.
+    """
+    if type(value) is dict:
+        return dict(value)
+    if type(value) is list:
+        return [dict(item) if type(item) is dict else item for item in value]
+    return value
+
+
+def copy_data(value):
+    """
+        Copies decoded JSON data, i.e. all nested dicts and lists.
+    """
+    if type(value) is dict:
+        return dict((key, copy_data(item)) for key, item in value.iteritems())
+    if type(value) is list:
+        return [copy_data(item) for item in value]
+    return value
+
+
+def compile_constructor(fields, containers=()):
+    """
+        Compiles a function building an entity from API data.
+
+        The returned function(cls, manager, data) creates an instance of cls
+        without calling __init__ and assigns every field from data, or None
+        when missing, with one straight-line statement per field. The data
+        is kept as the loaded state of the entity, so the container fields
+        are copied to keep it unchanged when the entity is edited in place.
+
+        :param fields: tuple with the field names of the entity class.
+        :param containers: (optional) The fields holding dicts or lists.
+        :return: function
+    """
+    lines = ['def construct(cls, manager, data):',
+             '    entity = new(cls)',
+             '    entity.manager = manager',
+             '    entity._persisted = False',
+             '    entity._loaded = data',
+             '    get = data.get']
+    for field in check_fields(fields):
+        if field in containers:
+            # Copy dicts, and lists along with the dicts in them (e.g. subscriptions).
+            lines.append('    value = get({field!r})'.format(field=field))
+            lines.append('    if type(value) is dict:')
+            lines.append('        value = dict(value)')
+            lines.append('    elif type(value) is list:')
+            lines.append('        value = [dict(item) if type(item) is dict else item for item in value]')
+            lines.append('    entity.{field} = value'.format(field=field))
+        else:
+            lines.append('    entity.{field} = get({field!r})'.format(field=field))
+    lines.append('    return entity')
+    return _compile('construct', lines, {'new': object.__new__})
+
+
+def compile_normalizer(fields):
+    """
+        Compiles a function extracting the truthy writable fields of an entity.
+
+        The functions are cached, so every list of writable fields is only compiled once.
+
+        :param fields: sequence with the writable field names.
+        :return: function(entity) returning the transfer data dict.
+    """
+    key = tuple(fields)
+    normalizer = _normalizers.get(key)
+    if normalizer is None:
+        lines = ['def normalize(entity):',
+                 '    data = {}']
+        for field in check_fields(key):
+            lines.append('    value = entity.{field}'.format(field=field))
+            lines.append('    if value:')
+            lines.append('        data[{field!r}] = value'.format(field=field))
+        lines.append('    return data')
+        normalizer = _normalizers[key] = _compile('normalize', lines, {})
+    return normalizer
+
+
+def compile_row_builder(fields, mode='dict'):
+    """
+        Compiles a function projecting API data to a lightweight row.
+
+        A field may be a dotted path into a nested dict, e.g. 'attributes.city'.
+        Missing values are None. In tuple mode the rows are named tuples whose
+        field names have the dots (and any other character not allowed in an
+        identifier) replaced by underscores.
+
+        :param fields: sequence with the field names to keep.
+        :param mode: 'dict' or 'tuple'.
+        :return: function(data) returning the row.
+        :raises ValueError if the mode or a field name is invalid.
+    """
+    key = (tuple(fields), mode)
+    builder = _row_builders.get(key)
+    if builder is not None:
+        return builder
+
+    if mode not in ('dict', 'tuple'):
+        raise ValueError(u'Invalid row mode: {mode!r}'.format(mode=mode))
+    if len(set(key[0])) != len(key[0]):
+        raise ValueError(u'Duplicate field names in {fields!r}'.format(fields=key[0]))
+
+    values = []
+    for field in key[0]:
+        parts = field.split('.')
+        if not all(parts):
+            raise ValueError(u'Invalid field name: {field!r}'.format(field=field))
+        value = 'get({part!r})'.format(part=parts[0])
+        for part in parts[1:]:
+            value = '({value} or empty).get({part!r})'.format(value=value, part=part)
+        values.append(value)
+
+    lines = ['def build_row(data):',
+             '    get = data.get']
+    namespace = {'empty': {}}
+    if mode == 'dict':
+        items = ', '.join('{field!r}: {value}'.format(field=field, value=value) for field, value in zip(key[0], values))
+        lines.append('    return {{{items}}}'.format(items=items))
+    else:
+        names = [re.sub(r'\W', '_', field) for field in key[0]]
+        namespace['Row'] = collections.namedtuple('Row', names, rename=True)
+        lines.append('    return Row({values})'.format(values=', '.join(values)))
+    builder = _row_builders[key] = _compile('build_row', lines, namespace)
+    return builder
@@ -0,0 +1,274 @@
+import collections
+import itertools
+from attribute_manager import AttributeManager
+from bulk import BulkReport
+from contact_manager import ContactManager
+from gan_exception import GanException
+from list_manager import ListManager
+
+
+class FlushError(GanException):
+    """
+        Raised when a Session used as a context manager could not write all changes.
+
+        The failed entities stay pending in the session, so flush() can be called again.
+
+        :var report BulkReport of the flush.
+        :var failures list of the failed BulkResults, with the entity as item and the exception as error.
+    """
+    def __init__(self, report):
+        super(FlushError, self).__init__(u'Flush failed',
+                                         u'{failed} of {processed} writes failed, first error: {error}'.format(
+                                             failed=report.failed, processed=report.processed,
+                                             error=report.failures[0].error))
+        self.report = report
+        self.failures = report.failures
+
+
+class SessionManager(object):
+    """
+        The manager of the entities of a Session.
+
+        It behaves like the manager it wraps, except that save(), overwrite()
+        and delete() only record the operation; it is sent on Session.flush().
+
+        :param session The Session.
+        :param manager The EntityManager sending the requests.
+    """
+    def __init__(self, session, manager):
+        self.session = session
+        self.manager = manager
+
+    def __getattr__(self, name):
+        return getattr(self.manager, name)
+
+    def save(self, entity, overwrite=False):
+        return self.session.add(entity, overwrite)
+
+    def overwrite(self, entity):
+        return self.save(entity, True)
+
+    def delete(self, entity):
+        self.session.delete(entity)
+
+
+class Session(object):
+    """
+        Unit of work over the contacts, lists and attributes of an account.
+
+        The session keeps an identity map: get() returns the same instance
+        for the same id as long as the session lives, so a contact loaded
+        several times is fetched once and all changes (field edits,
+        subscribe_to(), unsubscribe_from()) accumulate on one object. Saving
+        or deleting an entity of the session only records it. flush() then
+        sends one request per changed entity with all its changes, with up to
+        `concurrency` requests in flight. Attributes and lists are written
+        before the contacts that may refer to them, and deleted after them.
+
+        Used as a context manager, the session is flushed when the block
+        exits without an exception, raising FlushError if any write failed.
+
+        :param api The Api to send the requests with.
+        :param concurrency (optional) The number of concurrent requests of flush().
+        :param cache (optional) Cache backend of the managers, see EntityManager.
+    """
+    """
+        The manager classes in the order their entities are written.
+        :var manager_classes tuple
+    """
+    manager_classes = (AttributeManager, ListManager, ContactManager)
+
+    def __init__(self, api, concurrency=4, cache=None):
+        self.api = api
+        self.concurrency = concurrency
+        self.managers = collections.OrderedDict()
+        for manager_class in self.manager_classes:
+            self.managers[manager_class.entity_class] = SessionManager(self, manager_class(api, cache=cache))
+        # Maps (entity class, id) to the entity.
+        self._identity_map = {}
+        self._new = []
+        self._overwrite = set()
+        self._deleted = collections.OrderedDict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            report = self.flush()
+            if report.failed:
+                raise FlushError(report)
+
+    def manager(self, entity_class):
+        """
+            :param entity_class Contact, List or Attribute.
+            :return: SessionManager of the entity class.
+            :raises GanException if the entity class is not managed by the session.
+        """
+        try:
+            return self.managers[entity_class]
+        except KeyError:
+            raise GanException(u'Invalid entity class',
+                               u'{name} entities are not managed by the session.'.format(name=entity_class.__name__))
+
+    def _key(self, entity):
+        return type(entity), getattr(entity, self.manager(type(entity)).lookup_field)
+
+    def get(self, entity_class, id):
+        """
+            Returns the entity of the session, retrieving it from the API the first time.
+
+            :param entity_class Contact, List or Attribute.
+            :param id The identificator of the entity (e.g. the email of a contact).
+            :return: The entity.
+            :raises HTTPError if the entity can not be retrieved.
+            :raises GanException if the entity was deleted in the session.
+        """
+        key = (entity_class, id)
+        if key in self._deleted:
+            raise GanException(u'Deleted entity', u'{id} was deleted in the session.'.format(id=id))
+        entity = self._identity_map.get(key)
+        if entity is None:
+            manager = self.manager(entity_class)
+            entity = manager.manager.get(id)
+            entity.manager = manager
+            self._identity_map[key] = entity
+        return entity
+
+    def create(self, entity_class):
+        """
+            Creates a new entity which is created in the API on flush().
+
+            :param entity_class Contact, List or Attribute.
+            :return: The entity.
+        """
+        entity = self.manager(entity_class).manager.create()
+        entity.manager = self.manager(entity_class)
+        self._new.append(entity)
+        return entity
+
+    def add(self, entity, overwrite=False):
+        """
+            Adds an entity to the session, e.g. one built outside of it.
+
+            New entities are created on flush(), entities loaded from the API are
+            updated. The entity is returned; if the session already holds another
+            instance with the same id, that instance is returned instead.
+
+            :param entity The entity.
+            :param overwrite (optional) PUT the whole entity on flush() instead of its changes.
+            :return: The entity of the session.
+        """
+        manager = self.manager(type(entity))
+        key = self._key(entity)
+        if key[1] is not None:
+            self._new = [new for new in self._new if new is not entity]
+            entity = self._identity_map.setdefault(key, entity)
+        elif entity.is_persisted() or overwrite:
+            raise GanException(u'Missing required property',
+                               u'Missing: {lookup_field}'.format(lookup_field=manager.lookup_field))
+        elif not any(entity is new for new in self._new):
+            # Without an id (e.g. the hash of a new list) the entity is only known after it is created.
+            self._new.append(entity)
+        entity.manager = manager
+        if overwrite:
+            self._overwrite.add(key)
+        return entity
+
+    def delete(self, entity):
+        """
+            Records the deletion of an entity, sent on flush().
+
+            :param entity The entity.
+        """
+        key = self._key(entity)
+        self._new = [new for new in self._new if new is not entity]
+        self._identity_map.pop(key, None)
+        self._overwrite.discard(key)
+        if entity.is_persisted():
+            self._deleted[key] = entity
+
+    def __contains__(self, entity):
+        return self._identity_map.get(self._key(entity)) is entity or any(entity is new for new in self._new)
+
+    def __iter__(self):
+        return itertools.chain(self._identity_map.values(), self._new)
+
+    def __len__(self):
+        return len(self._identity_map) + len(self._new)
+
+    @property
+    def dirty(self):
+        """
+            The entities that flush() would write.
+
+            :return: list of entities.
+        """
+        return [entity for entity in self if self._is_dirty(entity)]
+
+    def _is_dirty(self, entity):
+        return not entity.is_persisted() or self._key(entity) in self._overwrite or bool(entity.changes())
+
+    def _flushed(self, entity, result):
+        # Copy the stored state to the instance of the session.
+        for field in type(entity)._fields:
+            setattr(entity, field, getattr(result, field))
+        entity._loaded = result._loaded
+        entity.set_persisted()
+        key = self._key(entity)
+        self._new = [new for new in self._new if new is not entity]
+        self._overwrite.discard(key)
+        self._identity_map[key] = entity
+
+    def _save(self, entity_class, overwrite):
+        manager = self.managers[entity_class]
+        entities = [entity for entity in self
+                    if type(entity) is entity_class and (self._key(entity) in self._overwrite) == overwrite and
+                    self._is_dirty(entity)]
+        if not entities:
+            return
+        for result in manager.manager.bulk_save(entities, self.concurrency, overwrite):
+            if result.status in (BulkReport.CREATED, BulkReport.UPDATED):
+                self._flushed(result.item, result.entity)
+            yield result
+
+    def _delete(self, entity_class):
+        manager = self.managers[entity_class]
+        entities = [entity for key, entity in self._deleted.items() if key[0] is entity_class]
+        if not entities:
+            return
+        for result in manager.manager.delete_many(entities, self.concurrency):
+            if result.ok:
+                del self._deleted[self._key(result.item)]
+            yield result
+
+    def _flush(self):
+        for entity_class in self.managers:
+            for overwrite in (False, True):
+                for result in self._save(entity_class, overwrite):
+                    yield result
+        for entity_class in reversed(self.managers):
+            for result in self._delete(entity_class):
+                yield result
+
+    def flush(self):
+        """
+            Writes all recorded changes to the API.
+
+            Every new entity is created with one POST, every changed entity is
+            updated with one PATCH of all its changes and every deleted entity
+            with one DELETE. Entities that fail stay pending, so a later flush()
+            retries them.
+
+            :return: BulkReport with a BulkResult per written entity.
+        """
+        return BulkReport(self._flush()).run()
+
+    def clear(self):
+        """
+            Forgets all entities and the pending changes.
+        """
+        self._identity_map.clear()
+        del self._new[:]
+        self._overwrite.clear()
+        self._deleted.clear()
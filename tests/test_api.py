@@ -0,0 +1,258 @@
+import json
+import threading
+import time
+import unittest
+import zlib
+from ganapi import Api, GanException, LRUCache, ListManager, RetryPolicy, TokenBucket
+from httmock import HTTMock, all_requests
+from requests import HTTPError, Response
+
+
+class ApiTest(unittest.TestCase):
+    def setUp(self):
+        gan_token = 'h027MapNNujPH0gV+sXAdmzZTDffHOpJEHaBtrD3NXtNqI4dT3NLXhyTwiZr7PUOGZJNSGv/b9xVyaguX0nDrONGhudPkxtl5EoXrM4SOZHswebpSy2ehh0edrGVF7dVJVZLIlRwgViY3n3/2hMQ5Njp9JFywnOy7gMeaoKw0hYLRbd+wVqvl2oOnspXwGTTcZ9Y+cdP8jIhUUoXOieXst0IXVclAHXa+K1d15gKLcpmXzK+jx14wGEmb4t8MSU'
+        self.api = Api(token=gan_token)
+        self.start_path = '/v3'
+
+    @all_requests
+    def ok_mock(self, url, request):
+        return {'status_code': 200,
+                'content': '{}'}
+
+    def test_invalid_method(self):
+        self.assertRaises(GanException, self.api.call, 'HEAD', 'contacts/')
+
+    def test_session_is_shared(self):
+        session = self.api.session
+        self.assertTrue(session is self.api.session)
+        adapter = session.get_adapter(self.api.base_uri)
+        self.assertEqual(adapter._pool_maxsize, Api.pool_maxsize)
+
+        with HTTMock(self.ok_mock):
+            self.api.call('GET', 'contacts/')
+        self.assertTrue(session is self.api.session)
+
+    def test_pool_configuration(self):
+        api = Api(token='token', pool_connections=2, pool_maxsize=32, pool_block=True)
+        adapter = api.session.get_adapter(api.base_uri)
+        self.assertEqual(adapter._pool_connections, 2)
+        self.assertEqual(adapter._pool_maxsize, 32)
+        self.assertTrue(adapter._pool_block)
+
+    def test_session_per_thread(self):
+        api = Api(token='token', session_per_thread=True)
+        sessions = []
+
+        def worker():
+            sessions.append(api.session)
+
+        threads = [threading.Thread(target=worker) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(id(s) for s in sessions)), 3)
+
+    def test_close(self):
+        session = self.api.session
+        self.api.close()
+        self.assertFalse(session is self.api.session)
+
+    @all_requests
+    def conditional_mock(self, url, request):
+        self.requests.append(request)
+        if request.headers.get('If-None-Match') == '"v1"':
+            return {'status_code': 304,
+                    'content': ''}
+        return {'status_code': 200,
+                'headers': {'ETag': '"v1"', 'Last-Modified': 'Mon, 08 Feb 2016 14:40:17 GMT'},
+                'content': '{"hash":"2anfLVM","name":"Test list"}'}
+
+    def test_conditional_get(self):
+        api = Api(token='token', validator_cache=LRUCache())
+        list_manager = ListManager(api)
+        self.requests = []
+        with HTTMock(self.conditional_mock):
+            first = list_manager.get('2anfLVM')
+            second = list_manager.get('2anfLVM')
+        self.assertEqual(second.name, first.name)
+        self.assertFalse('If-None-Match' in self.requests[0].headers)
+        self.assertEqual(self.requests[1].headers['If-None-Match'], '"v1"')
+        self.assertEqual(self.requests[1].headers['If-Modified-Since'], 'Mon, 08 Feb 2016 14:40:17 GMT')
+
+    def test_no_conditional_get_by_default(self):
+        self.requests = []
+        with HTTMock(self.conditional_mock):
+            self.api.call('GET', 'lists/2anfLVM/')
+            self.api.call('GET', 'lists/2anfLVM/')
+        self.assertFalse('If-None-Match' in self.requests[1].headers)
+
+    @all_requests
+    def flaky_mock(self, url, request):
+        self.requests.append(request)
+        if len(self.requests) < 3:
+            return {'status_code': 503,
+                    'headers': {'Retry-After': '0'},
+                    'content': ''}
+        return {'status_code': 200,
+                'content': '{}'}
+
+    def test_retry_idempotent(self):
+        self.requests = []
+        with HTTMock(self.flaky_mock):
+            response = self.api.call('GET', 'contacts/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.requests), 3)
+
+    def test_no_retry_non_idempotent(self):
+        self.requests = []
+        with HTTMock(self.flaky_mock):
+            self.assertRaises(HTTPError, self.api.call, 'POST', 'contacts/', {'email': 'test@example.com'})
+        self.assertEqual(len(self.requests), 1)
+
+    def test_retry_rejected(self):
+        @all_requests
+        def rate_limited_mock(url, request):
+            self.requests.append(request)
+            if len(self.requests) < 2:
+                return {'status_code': 429,
+                        'content': ''}
+            return {'status_code': 201,
+                    'content': '{}'}
+
+        api = Api(token='token', retry_policy=RetryPolicy(backoff_factor=0))
+        self.requests = []
+        with HTTMock(rate_limited_mock):
+            response = api.call('POST', 'contacts/', {'email': 'test@example.com'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(self.requests), 2)
+        api = Api(token='token', retry_policy=RetryPolicy(rejected_statuses=()))
+        self.requests = []
+        with HTTMock(rate_limited_mock):
+            self.assertRaises(HTTPError, api.call, 'POST', 'contacts/', {'email': 'test@example.com'})
+        self.assertEqual(len(self.requests), 1)
+
+    def test_retries_exhausted(self):
+        api = Api(token='token', retry_policy=RetryPolicy(max_retries=1, backoff_factor=0))
+        self.requests = []
+        with HTTMock(self.flaky_mock):
+            self.assertRaises(HTTPError, api.call, 'GET', 'contacts/')
+        self.assertEqual(len(self.requests), 2)
+
+    def test_retry_delay(self):
+        policy = RetryPolicy(backoff_factor=1, max_backoff=5)
+        response = Response()
+        self.assertTrue(0 <= policy.delay(10, response) <= 5)
+        response.headers['Retry-After'] = '2'
+        self.assertEqual(policy.delay(0, response), 2)
+        response.headers['Retry-After'] = 'Wed, 21 Oct 2015 07:28:00 GMT'
+        self.assertEqual(policy.delay(0, response), 0)
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=100, capacity=1)
+        started = time.time()
+        for _ in range(4):
+            bucket.acquire()
+        self.assertTrue(time.time() - started >= 0.025)
+
+    @all_requests
+    def slow_mock(self, url, request):
+        self.requests.append(request)
+        time.sleep(0.1)
+        if url.path.endswith('/missing/'):
+            return {'status_code': 404,
+                    'content': '{"detail":"Not found."}'}
+        return {'status_code': 200,
+                'content': '{"hash":"2anfLVM","name":"Test list"}'}
+
+    def coalesced_calls(self, api, path, count=5):
+        results = []
+
+        def worker():
+            try:
+                results.append(api.decode(api.call('GET', path)))
+            except HTTPError as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(count)]
+        with HTTMock(self.slow_mock):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return results
+
+    def test_coalesce_gets(self):
+        api = Api(token='token', coalesce_gets=True)
+        self.requests = []
+        results = self.coalesced_calls(api, 'lists/2anfLVM/')
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(api.single_flight.shared, 4)
+
+        # Finished calls are not reused.
+        with HTTMock(self.slow_mock):
+            api.call('GET', 'lists/2anfLVM/')
+        self.assertEqual(len(self.requests), 2)
+
+    def test_coalesce_gets_copies_rows(self):
+        @all_requests
+        def page_mock(url, request):
+            self.requests.append(request)
+            time.sleep(0.1)
+            return {'status_code': 200,
+                    'content': '{"count":1,"next":null,"previous":null,'
+                               '"results":[{"hash":"2anfLVM","name":"Test list","responders":[{"id":1}]}]}'}
+
+        list_manager = ListManager(Api(token='token', coalesce_gets=True))
+        results = []
+
+        def worker(as_json):
+            if as_json:
+                page = list_manager.query(as_json=True)
+                row = page['results'][0]
+            else:
+                row = list_manager.query(mode='dict').entities[0]
+            results.append(row)
+            row['name'] = 'Changed'
+            row['responders'][0]['id'] = 2
+
+        self.requests = []
+        threads = [threading.Thread(target=worker, args=(i % 2 == 0,)) for i in range(4)]
+        with HTTMock(page_mock):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(len(results), 4)
+        self.assertEqual(len(set(id(row) for row in results)), 4)
+        self.assertEqual(len(set(id(row['responders'][0]) for row in results)), 4)
+
+    def test_coalesce_gets_error(self):
+        api = Api(token='token', coalesce_gets=True)
+        self.requests = []
+        results = self.coalesced_calls(api, 'lists/missing/')
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(isinstance(result, HTTPError) for result in results))
+
+    @all_requests
+    def echo_mock(self, url, request):
+        self.requests.append(request)
+        return {'status_code': 200,
+                'content': '{}'}
+
+    def test_compress_request(self):
+        api = Api(token='token', compress_threshold=100)
+        self.requests = []
+        large = {'email': 'test@example.com', 'attributes': dict(('attr{0}'.format(i), 'value') for i in range(20))}
+        with HTTMock(self.echo_mock):
+            api.call('PUT', 'contacts/test@example.com/', large)
+            api.call('PATCH', 'contacts/test@example.com/', {'first_name': 'Test'})
+        self.assertEqual(self.requests[0].headers['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(zlib.decompress(self.requests[0].body, 16 + zlib.MAX_WBITS)), large)
+        self.assertFalse('Content-Encoding' in self.requests[1].headers)
+        self.assertEqual(json.loads(self.requests[1].body), {'first_name': 'Test'})
+        self.assertTrue('gzip' in self.requests[1].headers['Accept-Encoding'])
@@ -0,0 +1,82 @@
+import unittest
+from ganapi import Api, AsyncApi, AsyncContactManager, AsyncAttributeManager, Contact, Attribute
+from httmock import HTTMock, all_requests
+from requests import HTTPError
+
+
+class AsyncManagersTest(unittest.TestCase):
+    def setUp(self):
+        gan_token = 'h027MapNNujPH0gV+sXAdmzZTDffHOpJEHaBtrD3NXtNqI4dT3NLXhyTwiZr7PUOGZJNSGv/b9xVyaguX0nDrONGhudPkxtl5EoXrM4SOZHswebpSy2ehh0edrGVF7dVJVZLIlRwgViY3n3/2hMQ5Njp9JFywnOy7gMeaoKw0hYLRbd+wVqvl2oOnspXwGTTcZ9Y+cdP8jIhUUoXOieXst0IXVclAHXa+K1d15gKLcpmXzK+jx14wGEmb4t8MSU'
+        self.api = Api(token=gan_token, codec='json')
+        self.api.batch_size = 2
+        self.async_api = AsyncApi(self.api, workers=4)
+        self.contact_manager = AsyncContactManager(self.async_api)
+        self.attribute_manager = AsyncAttributeManager(self.async_api)
+        self.start_path = '/v3'
+
+    def tearDown(self):
+        self.async_api.close()
+
+    @all_requests
+    def get_contact_mock(self, url, request):
+        email = url.path.split('/')[-2]
+        if email == 'noone@nothing.com':
+            return {'status_code': 404,
+                    'content': '{"detail":"Not found."}'}
+        content = '{"email":"%s","first_name":"Test","attributes":{},"lists":[],"active":true}' % email
+        return {'status_code': 200,
+                'content': content}
+
+    def test_get_contacts(self):
+        emails = ['tester{0}@example.com'.format(i) for i in range(20)]
+        with HTTMock(self.get_contact_mock):
+            results = [self.contact_manager.get(email) for email in emails]
+            contacts = [result.get(5) for result in results]
+        self.assertEqual([contact.email for contact in contacts], emails)
+        self.assertTrue(isinstance(contacts[0], Contact))
+        self.assertTrue(contacts[0].is_persisted())
+
+    def test_get_non_existing_contact(self):
+        with HTTMock(self.get_contact_mock):
+            result = self.contact_manager.get('noone@nothing.com')
+            self.assertRaises(HTTPError, result.get, 5)
+
+    @all_requests
+    def save_contact_mock(self, url, request):
+        self.assertEqual(url.path, self.start_path + '/contacts/')
+        self.assertEqual(request.method, 'POST')
+        self.assertEqual(request.body, '{"attributes": {}, "email": "test@example.com", "lists": []}')
+        return {'status_code': 201,
+                'content': '{"email":"test@example.com","attributes":{},"lists":[],"active":true}'}
+
+    def test_save_contact(self):
+        contact = self.contact_manager.create()
+        contact.email = 'test@example.com'
+        with HTTMock(self.save_contact_mock):
+            saved_contact = self.contact_manager.save(contact).get(5)
+        self.assertTrue(saved_contact.is_persisted())
+
+    @all_requests
+    def get_all_attr_mock(self, url, request):
+        pages = {
+            'paginate_by=2': '{"count":4,"next":"https://api.getanewsletter.com/v3/attributes/?page=2&paginate_by=2","previous":null,"results":[{"name":"attr0","code":"attr0"},{"name":"attr1","code":"attr1"}]}',
+            'page=2&paginate_by=2': '{"count":4,"next":null,"previous":"https://api.getanewsletter.com/v3/attributes/?paginate_by=2","results":[{"name":"attr2","code":"attr2"},{"name":"attr3","code":"attr3"}]}'
+        }
+        if url.query not in pages:
+            return {'status_code': 404}
+        return {'status_code': 200,
+                'content': pages[url.query]}
+
+    def test_all_attributes(self):
+        with HTTMock(self.get_all_attr_mock):
+            attrs = [attr for attr in self.attribute_manager.all()]
+        self.assertEqual([attr.name for attr in attrs], ['attr0', 'attr1', 'attr2', 'attr3'])
+        self.assertTrue(isinstance(attrs[0], Attribute))
+
+    @all_requests
+    def failing_mock(self, url, request):
+        return {'status_code': 500}
+
+    def test_all_raises_in_consumer(self):
+        with HTTMock(self.failing_mock):
+            self.assertRaises(HTTPError, list, self.attribute_manager.all())
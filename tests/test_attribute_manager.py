@@ -1,4 +1,5 @@
 import unittest
+import urlparse
 from ganapi import Api, Attribute, AttributeManager
 from httmock import HTTMock, all_requests
 from requests import HTTPError
@@ -7,7 +8,7 @@ from requests import HTTPError
 class ContactManagerTest(unittest.TestCase):
     def setUp(self):
         gan_token = 'h027MapNNujPH0gV+sXAdmzZTDffHOpJEHaBtrD3NXtNqI4dT3NLXhyTwiZr7PUOGZJNSGv/b9xVyaguX0nDrONGhudPkxtl5EoXrM4SOZHswebpSy2ehh0edrGVF7dVJVZLIlRwgViY3n3/2hMQ5Njp9JFywnOy7gMeaoKw0hYLRbd+wVqvl2oOnspXwGTTcZ9Y+cdP8jIhUUoXOieXst0IXVclAHXa+K1d15gKLcpmXzK+jx14wGEmb4t8MSU'
-        self.api = Api(token=gan_token)
+        self.api = Api(token=gan_token, codec='json')
         self.api.batch_size = 2
         self.attribute_manager = AttributeManager(self.api)
         self.start_path = '/v3'
@@ -162,3 +163,53 @@ class ContactManagerTest(unittest.TestCase):
             attributes_between = self.attribute_manager.all(start=9)
             attrs = [attr for attr in attributes_between]
             self.assertEqual(len(attrs), 0)
+
+    @all_requests
+    def get_all_attr_prefetch_mock(self, url, request):
+        self.assertEqual(url.path, self.start_path + '/attributes/')
+        query = dict(urlparse.parse_qsl(url.query))
+        self.assertEqual(query['paginate_by'], '2')
+        page = int(query.get('page', 1))
+        if page > 4:
+            return {'status_code': 404}
+        results = ['{"url":"https://api.getanewsletter.com/v3/attributes/attr%d/","name":"attr%d","code":"attr%d","usage_count":0}' % (i, i, i)
+                   for i in range((page - 1) * 2, min(page * 2, 7))]
+        content = '{"count":7,"next":null,"previous":null,"results":[%s]}' % ','.join(results)
+        return {'content': content,
+                'status_code': 200}
+
+    def test_get_all_attributes_prefetch(self):
+        with HTTMock(self.get_all_attr_prefetch_mock):
+            attrs = [attr for attr in self.attribute_manager.all(prefetch=2)]
+        self.assertEqual([attr.name for attr in attrs], ['attr%d' % i for i in range(7)])
+        self.assertTrue(isinstance(attrs[0], Attribute))
+        self.assertTrue(attrs[0].is_persisted())
+
+    def test_get_between_attributes_prefetch(self):
+        with HTTMock(self.get_all_attr_prefetch_mock):
+            attrs = [attr for attr in self.attribute_manager.all(start=3, stop=5, prefetch=3, workers=2)]
+            self.assertEqual([attr.name for attr in attrs], ['attr3', 'attr4', 'attr5'])
+            attrs = [attr for attr in self.attribute_manager.all(start=1, stop=1, prefetch=3)]
+            self.assertEqual([attr.name for attr in attrs], ['attr1'])
+
+    def test_get_too_high_start_prefetch(self):
+        with HTTMock(self.get_all_attr_prefetch_mock):
+            attrs = [attr for attr in self.attribute_manager.all(start=7, prefetch=2)]
+        self.assertEqual(len(attrs), 0)
+
+    def test_get_all_attributes_as_rows(self):
+        with HTTMock(self.get_all_attr_mock):
+            rows = list(self.attribute_manager.all(mode='dict', fields=['code', 'name']))
+            self.assertEqual(len(rows), 8)
+            self.assertEqual(rows[0], {'code': 'attribute', 'name': 'attr0'})
+
+            rows = list(self.attribute_manager.all(start=4, stop=7, mode='tuple', fields=['name']))
+            self.assertEqual([row.name for row in rows], ['attr4', 'bu3', 'bu4', 'bu5'])
+
+        with HTTMock(self.get_all_attr_prefetch_mock):
+            rows = list(self.attribute_manager.all(mode='tuple', prefetch=2))
+            self.assertEqual(len(rows), 7)
+            self.assertEqual(rows[0]._fields, Attribute._fields)
+
+    def test_invalid_row_mode(self):
+        self.assertRaises(ValueError, self.attribute_manager.row_builder, 'xml')
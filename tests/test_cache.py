@@ -0,0 +1,200 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from ganapi import Api, LRUCache, ListManager, SQLiteCache
+from httmock import HTTMock, all_requests
+from requests import HTTPError
+
+
+class LRUCacheTest(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = LRUCache(max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.stats(), {'hits': 3, 'misses': 1, 'evictions': 1, 'expirations': 0, 'size': 2})
+
+    def test_ttl(self):
+        cache = LRUCache(ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2, ttl=-1)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('b', 'missing'), 'missing')
+        self.assertEqual(cache.stats()['expirations'], 1)
+        self.assertEqual(len(cache), 1)
+
+
+class CachedManagerTest(unittest.TestCase):
+    def setUp(self):
+        gan_token = 'h027MapNNujPH0gV+sXAdmzZTDffHOpJEHaBtrD3NXtNqI4dT3NLXhyTwiZr7PUOGZJNSGv/b9xVyaguX0nDrONGhudPkxtl5EoXrM4SOZHswebpSy2ehh0edrGVF7dVJVZLIlRwgViY3n3/2hMQ5Njp9JFywnOy7gMeaoKw0hYLRbd+wVqvl2oOnspXwGTTcZ9Y+cdP8jIhUUoXOieXst0IXVclAHXa+K1d15gKLcpmXzK+jx14wGEmb4t8MSU'
+        self.api = Api(token=gan_token)
+        self.cache = LRUCache()
+        self.list_manager = ListManager(self.api, cache=self.cache, cache_not_found=True)
+        self.calls = []
+
+    @all_requests
+    def list_mock(self, url, request):
+        self.calls.append((request.method, url.path))
+        if url.path.endswith('/missing/'):
+            return {'status_code': 404,
+                    'content': '{"detail":"Not found."}'}
+        if request.method == 'DELETE':
+            return {'status_code': 204,
+                    'content': ''}
+        name = 'changed' if request.method == 'PATCH' else 'Test list'
+        return {'status_code': 200,
+                'content': '{"hash":"2anfLVM","name":"%s","subscribers_count":1,"responders":[]}' % name}
+
+    def test_get_is_cached(self):
+        with HTTMock(self.list_mock):
+            first = self.list_manager.get('2anfLVM')
+            first.responders.append('mutated')
+            second = self.list_manager.get('2anfLVM')
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(second.name, 'Test list')
+        self.assertEqual(second.responders, [])
+        self.assertTrue(second.is_persisted())
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_not_found_is_cached(self):
+        with HTTMock(self.list_mock):
+            self.assertRaises(HTTPError, self.list_manager.get, 'missing')
+            self.assertRaises(HTTPError, self.list_manager.get, 'missing')
+        self.assertEqual(len(self.calls), 1)
+
+    def test_save_refreshes_and_delete_invalidates(self):
+        with HTTMock(self.list_mock):
+            list = self.list_manager.get('2anfLVM')
+            list.name = 'changed'
+            list.save()
+            self.assertEqual(self.list_manager.get('2anfLVM').name, 'changed')
+            list.delete()
+            self.list_manager.get('2anfLVM')
+        self.assertEqual([method for method, path in self.calls], ['GET', 'PATCH', 'DELETE', 'GET'])
+
+    def test_ttl_expiry(self):
+        self.list_manager.cache_ttl = 0.01
+        with HTTMock(self.list_mock):
+            self.list_manager.get('2anfLVM')
+            time.sleep(0.02)
+            self.list_manager.get('2anfLVM')
+        self.assertEqual(len(self.calls), 2)
+
+
+def _write_entries(path, prefix):
+    cache = SQLiteCache(path, namespace='token')
+    for i in range(50):
+        cache.set('{prefix}{i}'.format(prefix=prefix, i=i), i)
+    cache.close()
+
+
+class SQLiteCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.db')
+        self.calls = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    @all_requests
+    def lists_mock(self, url, request):
+        self.calls.append((request.method, url.path))
+        if url.path.endswith('/missing/'):
+            return {'status_code': 404,
+                    'content': '{"detail":"Not found."}'}
+        if url.path.endswith('/2anfLVM/'):
+            name = 'changed' if request.method == 'PATCH' else 'Test list'
+            return {'status_code': 200,
+                    'content': '{"hash":"2anfLVM","name":"%s","subscribers_count":1,"responders":[]}' % name}
+        return {'status_code': 200,
+                'content': '{"count":1,"next":null,"previous":null,'
+                           '"results":[{"hash":"2anfLVM","name":"Test list","subscribers_count":1,"responders":[]}]}'}
+
+    def test_roundtrip(self):
+        cache = SQLiteCache(self.path, 'token', compress_min_size=10)
+        error = HTTPError('404 Client Error: Not Found')
+        cache.set('small', 'abc')
+        cache.set('large', 'x' * 100)
+        cache.set('dict', {'a': [1, 2]})
+        cache.set('error', error)
+        self.assertEqual(cache.get('small'), 'abc')
+        self.assertEqual(cache.get('large'), 'x' * 100)
+        self.assertEqual(cache.get('dict'), {'a': [1, 2]})
+        self.assertIsInstance(cache.get('error'), HTTPError)
+        self.assertEqual(str(cache.get('error')), str(error))
+        self.assertIsNone(cache.get('missing'))
+        cache.delete('small')
+        self.assertIsNone(cache.get('small'))
+        self.assertEqual(len(cache), 3)
+
+    def test_cached_not_found_keeps_no_secrets(self):
+        token = 'secret-token-value'
+        cache = SQLiteCache(self.path, token)
+        manager = ListManager(Api(token=token), cache=cache, cache_not_found=True)
+        with HTTMock(self.lists_mock):
+            self.assertRaises(HTTPError, manager.get, 'missing')
+        error = SQLiteCache(self.path, token).get(manager.get_path('missing'))
+        self.assertIsInstance(error, HTTPError)
+        self.assertEqual(error.response.status_code, 404)
+        self.assertEqual(error.response.json(), {'detail': 'Not found.'})
+        cache.close()
+        with open(self.path, 'rb') as database:
+            self.assertNotIn(token, database.read())
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(self.path + suffix):
+                with open(self.path + suffix, 'rb') as database:
+                    self.assertNotIn(token, database.read())
+
+    def test_ttl_expiry(self):
+        cache = SQLiteCache(self.path, 'token')
+        cache.set('a', 1, ttl=0.01)
+        cache.set('b', 2)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), 2)
+        self.assertEqual(cache.purge(), 1)
+        self.assertEqual(cache.stats()['expirations'], 1)
+
+    def test_persistence_and_namespaces(self):
+        cache = SQLiteCache(self.path, namespace='token')
+        cache.set('a', 1)
+        cache.close()
+        self.assertEqual(SQLiteCache(self.path, namespace='token').get('a'), 1)
+        other = SQLiteCache(self.path, namespace='other')
+        self.assertIsNone(other.get('a'))
+        other.set('a', 2)
+        other.clear()
+        self.assertEqual(SQLiteCache(self.path, namespace='token').get('a'), 1)
+
+    def test_concurrent_processes(self):
+        SQLiteCache(self.path, 'token').close()
+        processes = [multiprocessing.Process(target=_write_entries, args=(self.path, prefix)) for prefix in 'abcd']
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(len(SQLiteCache(self.path, namespace='token')), 200)
+
+    def test_warm_start(self):
+        api = Api(token='token')
+        with HTTMock(self.lists_mock):
+            self.assertEqual([list.name for list in ListManager(api, cache=SQLiteCache(self.path, 'token')).all()],
+                             ['Test list'])
+            # A new process reads the pages from disk.
+            manager = ListManager(api, cache=SQLiteCache(self.path, 'token'))
+            self.assertEqual([list.name for list in manager.all()], ['Test list'])
+            self.assertEqual(len(self.calls), 1)
+            list = manager.get('2anfLVM')
+            list.name = 'changed'
+            list.save()
+            manager.all().next()
+        self.assertEqual([method for method, path in self.calls], ['GET', 'GET', 'PATCH', 'GET'])
+
@@ -0,0 +1,47 @@
+import json
+import unittest
+from ganapi import Api, GanException, JsonCodec, ListManager
+from ganapi.codec import DEFAULT_CODECS, available_codecs, get_codec
+from httmock import HTTMock, all_requests
+
+
+class CodecTest(unittest.TestCase):
+    @all_requests
+    def list_mock(self, url, request):
+        self.bodies.append(request.body)
+        return {'status_code': 200,
+                'content': '{"hash":"2anfLVM","name":"Test list"}'}
+
+    def test_get_codec(self):
+        self.assertEqual(get_codec('json').name, 'json')
+        self.assertTrue(get_codec() is get_codec())
+        self.assertEqual(get_codec().name,
+                         [codec.name for codec in available_codecs() if codec.name in DEFAULT_CODECS][0])
+        self.assertRaises(GanException, get_codec, 'yaml')
+
+    def test_codecs_roundtrip(self):
+        data = {'email': 'test@example.com', 'attributes': {'city': u'G\u00f6teborg'}, 'lists': [], 'active': True}
+        for codec in available_codecs():
+            self.assertEqual(codec.decode(codec.encode(data)), data)
+            self.assertEqual(codec.decode(json.dumps(data)), data)
+
+    def test_custom_codec(self):
+        calls = []
+
+        def dumps(data):
+            calls.append('dumps')
+            return json.dumps(data)
+
+        def loads(content):
+            calls.append('loads')
+            return json.loads(content)
+
+        api = Api(token='token', codec=JsonCodec('counting', dumps, loads))
+        list_manager = ListManager(api)
+        self.bodies = []
+        with HTTMock(self.list_mock):
+            entity = list_manager.get('2anfLVM')
+            entity.name = 'Renamed'
+            list_manager.save(entity)
+        self.assertEqual(calls, ['loads', 'dumps', 'loads'])
+        self.assertEqual(json.loads(self.bodies[1]), {'name': 'Renamed'})
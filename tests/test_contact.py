@@ -6,7 +6,7 @@ from httmock import HTTMock, all_requests
 class ContactTest(unittest.TestCase):
     def setUp(self):
         gan_token = 'h027MapNNujPH0gV+sXAdmzZTDffHOpJEHaBtrD3NXtNqI4dT3NLXhyTwiZr7PUOGZJNSGv/b9xVyaguX0nDrONGhudPkxtl5EoXrM4SOZHswebpSy2ehh0edrGVF7dVJVZLIlRwgViY3n3/2hMQ5Njp9JFywnOy7gMeaoKw0hYLRbd+wVqvl2oOnspXwGTTcZ9Y+cdP8jIhUUoXOieXst0IXVclAHXa+K1d15gKLcpmXzK+jx14wGEmb4t8MSU'
-        self.api = Api(token=gan_token)
+        self.api = Api(token=gan_token, codec='json')
         self.contact_manager = ContactManager(self.api)
         self.list_manager = ListManager(self.api)
         self.start_path = '/v3'
@@ -31,7 +31,7 @@ class ContactTest(unittest.TestCase):
     @all_requests
     def contact_unsubscribe_mock(self, url, request):
         self.assertEqual(url.path, self.start_path + '/contacts/tester@example.com/')
-        payload = '{"attributes": {}, "email": "tester@example.com", "lists": [{"hash": "2anfLVM", "name": "Test list", "subscription_cancelled": null, "subscription_created": "2016-02-09T08:17:10Z", "cancelled": true, "subscription_id": 136363367}]}'
+        payload = '{"lists": [{"hash": "2anfLVM", "name": "Test list", "subscription_cancelled": null, "subscription_created": "2016-02-09T08:17:10Z", "cancelled": true, "subscription_id": 136363367}]}'
         self.assertEqual(request.body, payload)
         content = '{"url":"https://api.getanewsletter.com/v3/contacts/tester@example.com/","first_name":"","last_name":"","email":"tester@example.com","created":"2016-02-08T14:48:24","updated":"2016-02-09T09:09:28.878356","attributes":{},"lists":[{"subscription_cancelled":"2016-02-15T06:50:44Z","subscription_id":136363367,"hash":"2anfLVM","name":"Test list","subscription_created":"2016-02-09T08:17:10Z"}],"active":true}'
         return {'status_code': 201,
@@ -75,7 +75,7 @@ class ContactTest(unittest.TestCase):
     @all_requests
     def contact_remove_sub_mock(self, url, request):
         self.assertEqual(url.path, self.start_path + '/contacts/tester@example.com/')
-        payload = '{"attributes": {}, "email": "tester@example.com", "lists": []}'
+        payload = '{"lists": []}'
         self.assertEqual(request.body, payload)
         content = '{"url":"https://api.getanewsletter.com/v3/contacts/tester@example.com/","first_name":"","last_name":"","email":"tester@example.com","created":"2016-02-08T14:48:24","updated":"2016-02-09T09:09:28.878356","attributes":{},"lists":[],"active":true}'
         return {'status_code': 201,
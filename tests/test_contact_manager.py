@@ -1,3 +1,5 @@
+import datetime
+import json
 import unittest
 from ganapi import Api, GanException, Contact, ContactManager
 from httmock import HTTMock, all_requests
@@ -6,7 +8,7 @@ from requests import HTTPError
 class ContactManagerTest(unittest.TestCase):
     def setUp(self):
         gan_token = 'h027MapNNujPH0gV+sXAdmzZTDffHOpJEHaBtrD3NXtNqI4dT3NLXhyTwiZr7PUOGZJNSGv/b9xVyaguX0nDrONGhudPkxtl5EoXrM4SOZHswebpSy2ehh0edrGVF7dVJVZLIlRwgViY3n3/2hMQ5Njp9JFywnOy7gMeaoKw0hYLRbd+wVqvl2oOnspXwGTTcZ9Y+cdP8jIhUUoXOieXst0IXVclAHXa+K1d15gKLcpmXzK+jx14wGEmb4t8MSU'
-        self.api = Api(token=gan_token)
+        self.api = Api(token=gan_token, codec='json')
         self.contact_manager = ContactManager(self.api)
         self.start_path = '/v3'
 
@@ -90,6 +92,56 @@ class ContactManagerTest(unittest.TestCase):
         contact.set_persisted()
         self.assertRaises(GanException, contact.save)
 
+    @all_requests
+    def changed_contact_mock(self, url, request):
+        if request.method == 'GET':
+            content = '{"email":"tester@example.com","first_name":"Test","last_name":"Tester","attributes":{"city":"Stockholm","zip":"11122"},"lists":[{"hash":"2anfLVM","name":"Test list"}],"active":true}'
+            return {'status_code': 200,
+                    'content': content}
+        self.requests.append(request)
+        self.assertEqual(request.method, 'PATCH')
+        return {'status_code': 200,
+                'content': '{"email":"tester@example.com","first_name":"John","last_name":"Tester","attributes":{"city":"Lund","zip":"11122"},"lists":[{"hash":"2anfLVM","name":"Test list"}]}'}
+
+    def test_save_changed_fields(self):
+        self.requests = []
+        with HTTMock(self.changed_contact_mock):
+            contact = self.contact_manager.get('tester@example.com')
+            contact.first_name = 'John'
+            contact.attributes['city'] = 'Lund'
+            self.assertEqual(contact.changes(), {'first_name': 'John', 'attributes': {'city': 'Lund'}})
+            contact.save()
+            self.assertEqual(json.loads(self.requests[0].body), {'first_name': 'John', 'attributes': {'city': 'Lund'}})
+
+            # Saved, nothing left to send.
+            self.assertEqual(contact.changes(), {})
+            self.assertTrue(contact.save() is contact)
+        self.assertEqual(len(self.requests), 1)
+
+    def test_save_removed_attributes(self):
+        self.requests = []
+        with HTTMock(self.changed_contact_mock):
+            contact = self.contact_manager.get('tester@example.com')
+            del contact.attributes['zip']
+            self.assertEqual(contact.changes(), {'attributes': {'city': 'Stockholm'}})
+            contact.save()
+            contact = self.contact_manager.get('tester@example.com')
+            contact.attributes = {}
+            self.assertEqual(contact.changes(), {'attributes': {}})
+            contact.save()
+        self.assertEqual([json.loads(request.body) for request in self.requests],
+                         [{'attributes': {'city': 'Stockholm'}}, {'attributes': {}}])
+
+    def test_save_unchanged_contact(self):
+        self.requests = []
+        with HTTMock(self.changed_contact_mock):
+            contact = self.contact_manager.get('tester@example.com')
+            contact.lists[0]['name'] = 'Test list'
+            self.assertTrue(contact.save() is contact)
+            report = self.contact_manager.bulk_save([contact]).run()
+        self.assertEqual(report.unchanged, 1)
+        self.assertEqual(self.requests, [])
+
     @all_requests
     def overwrite_contact_mock(self, url, request):
         self.assertEqual(url.path, self.start_path + '/contacts/test@example.com/')
@@ -126,6 +178,15 @@ class ContactManagerTest(unittest.TestCase):
         self.assertEqual(len(contacts), 1)
         self.assertEqual(contacts[0].email, 'test@example.com')
 
+    def test_query_as_rows(self):
+        with HTTMock(self.find_contact_by_query_mock):
+            result = self.contact_manager.query(filters={'search_email': 'test@'}, mode='tuple',
+                                                fields=['email', 'attributes.city'])
+        self.assertEqual(len(result.entities), 1)
+        self.assertEqual(result.entities[0].email, 'test@example.com')
+        self.assertEqual(result.entities[0].attributes_city, None)
+        self.assertEqual(result.entities[0], ('test@example.com', None))
+
     @all_requests
     def delete_contact_mock(self, url, request):
         self.assertEqual(url.path, self.start_path + '/contacts/new_created@example.com/')
@@ -141,3 +202,132 @@ class ContactManagerTest(unittest.TestCase):
         with HTTMock(self.delete_contact_mock):
             deleted_contact_response = contact.delete()
             self.assertEqual(deleted_contact_response.status_code, 204)
+
+    @all_requests
+    def bulk_save_mock(self, url, request):
+        email = url.path.split('/')[-2]
+        if request.method == 'POST':
+            email = json.loads(request.body)['email']
+            if email == 'bad@example.com':
+                return {'status_code': 400,
+                        'content': '{"email":["Enter a valid email address."]}'}
+            status_code = 201
+        else:
+            self.assertEqual(request.method, 'PATCH')
+            status_code = 200
+        content = '{"email":"%s","first_name":"","attributes":{},"lists":[],"active":true}' % email
+        return {'status_code': status_code,
+                'content': content}
+
+    def test_bulk_save(self):
+        def contacts():
+            for i in range(10):
+                contact = self.contact_manager.create()
+                contact.email = 'bulk{0}@example.com'.format(i)
+                if i % 2:
+                    contact.set_persisted()
+                yield contact
+            bad_contact = self.contact_manager.create()
+            bad_contact.email = 'bad@example.com'
+            yield bad_contact
+
+        with HTTMock(self.bulk_save_mock):
+            report = self.contact_manager.bulk_save(contacts(), concurrency=3)
+            results = list(report)
+        self.assertEqual(len(results), 11)
+        self.assertEqual(report.processed, 11)
+        self.assertEqual(report.created, 5)
+        self.assertEqual(report.updated, 5)
+        self.assertEqual(report.failed, 1)
+        self.assertEqual(report.failures[0].item.email, 'bad@example.com')
+        self.assertTrue(isinstance(report.failures[0].error, HTTPError))
+        saved = [result.entity for result in results if result.ok]
+        self.assertTrue(all(isinstance(contact, Contact) and contact.is_persisted() for contact in saved))
+        self.assertTrue(report.rate > 0)
+
+    def test_bulk_save_missing_email(self):
+        contact = self.contact_manager.create()
+        contact.set_persisted()
+        report = self.contact_manager.bulk_save([contact]).run()
+        self.assertEqual(report.failed, 1)
+        self.assertTrue(isinstance(report.failures[0].error, GanException))
+
+    def test_bulk_save_bad_rows(self):
+        def contacts():
+            for i in range(4):
+                contact = self.contact_manager.create()
+                contact.email = 'bulk{0}@example.com'.format(i)
+                if i == 1:
+                    contact.attributes = {'born': datetime.datetime(2016, 2, 8)}
+                yield contact
+            yield {'email': 'not-an-entity@example.com'}
+
+        with HTTMock(self.bulk_save_mock):
+            report = self.contact_manager.bulk_save(contacts(), concurrency=2).run()
+        self.assertEqual(report.created, 3)
+        self.assertEqual(report.failed, 2)
+        self.assertEqual(sorted(type(failure.error) for failure in report.failures), [AttributeError, TypeError])
+
+    @all_requests
+    def get_many_mock(self, url, request):
+        email = url.path.split('/')[-2]
+        self.requests.append(email)
+        if email.startswith('missing'):
+            return {'status_code': 404,
+                    'content': '{"detail":"Not found."}'}
+        if email == 'broken@example.com':
+            return {'status_code': 400,
+                    'content': '{"detail":"Bad request."}'}
+        if email == 'malformed@example.com':
+            return {'status_code': 200,
+                    'content': '[]'}
+        content = '{"email":"%s","first_name":"","attributes":{},"lists":[],"active":true}' % email
+        return {'status_code': 200,
+                'content': content}
+
+    def test_get_many(self):
+        self.requests = []
+        emails = ['many{0}@example.com'.format(i % 5) for i in range(10)] + ['missing@example.com', 'broken@example.com',
+                                                                             'malformed@example.com']
+        with HTTMock(self.get_many_mock):
+            report = self.contact_manager.get_many(iter(emails), concurrency=3)
+            results = list(report)
+        self.assertEqual(len(results), 8)
+        self.assertEqual(sorted(self.requests), sorted(set(emails)))
+        self.assertEqual(sorted(report.entities), ['many{0}@example.com'.format(i) for i in range(5)])
+        self.assertEqual(report.entities['many3@example.com'].email, 'many3@example.com')
+        self.assertEqual(report.missing_ids, ['missing@example.com'])
+        self.assertEqual(report.found, 5)
+        self.assertEqual(sorted(failure.item for failure in report.failures),
+                         ['broken@example.com', 'malformed@example.com'])
+
+    @all_requests
+    def delete_many_mock(self, url, request):
+        email = url.path.split('/')[-2]
+        self.requests.append((request.method, email))
+        if email.startswith('gone'):
+            return {'status_code': 404,
+                    'content': '{"detail":"Not found."}'}
+        if email == 'broken@example.com':
+            return {'status_code': 400,
+                    'content': '{"detail":"Bad request."}'}
+        return {'status_code': 204,
+                'content': ''}
+
+    def test_delete_many(self):
+        self.requests = []
+        contact = self.contact_manager.create()
+        contact.email = 'entity@example.com'
+        items = ['delete{0}@example.com'.format(i) for i in range(6)] + \
+                [contact, 'gone@example.com', 'broken@example.com', self.contact_manager.create()]
+        with HTTMock(self.delete_many_mock):
+            report = self.contact_manager.delete_many(iter(items), concurrency=3).run()
+        self.assertEqual(sorted(self.requests), sorted(('DELETE', item if isinstance(item, str) else 'entity@example.com')
+                                                       for item in items[:-1]))
+        self.assertEqual(report.deleted, 7)
+        self.assertEqual(report.missing, 1)
+        self.assertEqual(report.failed, 2)
+        self.assertEqual(sorted(failure.item for failure in report.failures if isinstance(failure.item, str)),
+                         ['broken@example.com'])
+        self.assertIsInstance(report.failures[0].error, (HTTPError, GanException))
+        self.assertEqual(report.processed, len(items))
@@ -1,5 +1,12 @@
+import os
+import pickle
+import shutil
+import tempfile
 import unittest
-from ganapi.entity import Entity
+from ganapi import Api, ContactManager, ListManager, LRUCache, Metrics, SQLiteCache, TokenBucket
+from ganapi.contact import Contact
+from ganapi.entity import Entity, EntityMeta
+from ganapi.schema import compile_normalizer
 
 
 class EntityTest(unittest.TestCase):
@@ -12,4 +19,106 @@ class EntityTest(unittest.TestCase):
         self.assertTrue(new_entity.is_persisted())
 
         new_entity.set_persisted(False)
-        self.assertFalse(new_entity.is_persisted())
\ No newline at end of file
+        self.assertFalse(new_entity.is_persisted())
+
+    def test_slots(self):
+        contact = Contact(None)
+        self.assertEqual(contact.email, None)
+        self.assertFalse(hasattr(contact, '__dict__'))
+        self.assertRaises(AttributeError, setattr, contact, 'no_such_field', 1)
+        self.assertEqual(Contact._fields[0], 'email')
+
+    def test_from_data(self):
+        contact = Contact.from_data('manager', {'email': 'test@example.com', 'unknown': 1})
+        self.assertEqual(contact.email, 'test@example.com')
+        self.assertEqual(contact.first_name, None)
+        self.assertEqual(contact.manager, 'manager')
+        self.assertFalse(contact.is_persisted())
+
+    def test_lazy(self):
+        data = {'email': 'test@example.com', 'first_name': 'Test', 'attributes': {'city': 'Stockholm'},
+                'lists': [{'hash': '2anfLVM', 'name': 'Test list'}]}
+        manager = ContactManager(Api(token='token'))
+        contact = Contact.from_data(manager, data, lazy=True).set_persisted()
+        self.assertRaises(AttributeError, Contact.first_name.__get__, contact, Contact)
+        self.assertEqual(contact.first_name, 'Test')
+        self.assertEqual(Contact.first_name.__get__(contact, Contact), 'Test')
+        self.assertEqual(contact.last_name, None)
+        self.assertRaises(AttributeError, getattr, contact, 'no_such_field')
+
+        contact.attributes['city'] = 'Lund'
+        contact.subscribe_to(ListManager(manager.api).construct_entity({'hash': 'newHash'}))
+        self.assertEqual(data['attributes'], {'city': 'Stockholm'})
+        self.assertEqual(len(data['lists']), 1)
+        changes = contact.changes()
+        self.assertEqual(changes['attributes'], {'city': 'Lund'})
+        self.assertEqual([item['hash'] for item in changes['lists']], ['2anfLVM', 'newHash'])
+        self.assertEqual(sorted(manager.normalize_entity(contact)),
+                         ['attributes', 'email', 'first_name', 'lists'])
+
+    def test_inherited_fields(self):
+        class VipContact(Contact):
+            fields = ('email', 'level')
+
+        contact = VipContact.from_data(None, {'email': 'test@example.com', 'level': 3})
+        self.assertEqual(VipContact._fields, Contact._fields + ('level',))
+        self.assertEqual((contact.email, contact.level), ('test@example.com', 3))
+
+    def test_invalid_field(self):
+        self.assertRaises(ValueError, EntityMeta, 'Broken', (Entity,), {'fields': ('not valid',)})
+
+    def test_normalizer(self):
+        normalize = compile_normalizer(['email', 'first_name', 'lists'])
+        self.assertTrue(normalize is compile_normalizer(('email', 'first_name', 'lists')))
+        contact = Contact.from_data(None, {'email': 'test@example.com', 'first_name': '', 'lists': [1]})
+        self.assertEqual(normalize(contact), {'email': 'test@example.com', 'lists': [1]})
+
+    def test_normalizer_after_fields_changed(self):
+        manager = ListManager(Api(token='token'))
+        list = manager.construct_entity({'hash': 'hash', 'name': 'News', 'responders': ['welcome']})
+        self.assertNotIn('responders', manager.normalize_entity(list))
+        manager.writable_fields.append('responders')
+        try:
+            self.assertEqual(manager.normalize_entity(list)['responders'], ['welcome'])
+        finally:
+            manager.writable_fields.remove('responders')
+        self.assertNotIn('responders', manager.normalize_entity(list))
+
+    def test_pickle(self):
+        manager = ContactManager(Api(token='token'))
+        contact = manager.construct_entity({'email': 'test@example.com', 'attributes': {'city': 'Lund'}})
+        contact.set_persisted()
+        contact.first_name = 'Test'
+        lazy = Contact.from_data(manager, {'email': 'lazy@example.com', 'first_name': 'Lazy'}, lazy=True)
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            copy = pickle.loads(pickle.dumps(contact, protocol))
+            self.assertEqual((copy.email, copy.first_name, copy.attributes),
+                             ('test@example.com', 'Test', {'city': 'Lund'}))
+            self.assertTrue(copy.is_persisted())
+            self.assertEqual(copy.changes(), {'first_name': 'Test'})
+            self.assertEqual(copy.manager.api.token, 'token')
+            copy = pickle.loads(pickle.dumps(lazy, protocol))
+            self.assertEqual((copy.email, copy.first_name, copy.last_name), ('lazy@example.com', 'Lazy', None))
+
+    def test_pickle_all_features(self):
+        directory = tempfile.mkdtemp()
+        try:
+            api = Api(token='token', coalesce_gets=True, metrics=Metrics(), rate_limiter=TokenBucket(rate=10),
+                      validator_cache=LRUCache(), session_per_thread=True)
+            api.session
+            cache = SQLiteCache(os.path.join(directory, 'cache.db'), api.token)
+            cache.set('key', 'value')
+            for manager in (ContactManager(api, cache=LRUCache()), ContactManager(api, cache=cache)):
+                contact = manager.construct_entity({'email': 'test@example.com'})
+                copy = pickle.loads(pickle.dumps(contact, pickle.HIGHEST_PROTOCOL))
+                self.assertEqual(copy.email, 'test@example.com')
+                copy_api = copy.manager.api
+                self.assertEqual(copy_api.rate_limiter.rate, 10)
+                copy_api.rate_limiter.acquire()
+                self.assertEqual(copy_api.single_flight.do('key', lambda: 1), 1)
+                copy_api.metrics.reset()
+                copy_api.validator_cache.set('key', 'value')
+                copy.manager.cache.set('other', 'value')
+            self.assertEqual(copy.manager.cache.get('key'), 'value')
+        finally:
+            shutil.rmtree(directory)
@@ -0,0 +1,88 @@
+import csv
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import urlparse
+from ganapi import Api, ContactManager
+from ganapi.export import ContactExporter, numpy, pyarrow
+from httmock import HTTMock, all_requests
+
+
+class ContactExporterTest(unittest.TestCase):
+    def setUp(self):
+        gan_token = 'h027MapNNujPH0gV+sXAdmzZTDffHOpJEHaBtrD3NXtNqI4dT3NLXhyTwiZr7PUOGZJNSGv/b9xVyaguX0nDrONGhudPkxtl5EoXrM4SOZHswebpSy2ehh0edrGVF7dVJVZLIlRwgViY3n3/2hMQ5Njp9JFywnOy7gMeaoKw0hYLRbd+wVqvl2oOnspXwGTTcZ9Y+cdP8jIhUUoXOieXst0IXVclAHXa+K1d15gKLcpmXzK+jx14wGEmb4t8MSU'
+        self.api = Api(token=gan_token)
+        self.api.batch_size = 2
+        self.contact_manager = ContactManager(self.api)
+        self.start_path = '/v3'
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    @all_requests
+    def contacts_mock(self, url, request):
+        if url.path == self.start_path + '/attributes/':
+            return {'status_code': 200,
+                    'content': '{"count":2,"next":null,"previous":null,"results":[{"name":"City","code":"city"},{"name":"Zip code","code":"zip-code"}]}'}
+        self.assertEqual(url.path, self.start_path + '/contacts/')
+        page = int(dict(urlparse.parse_qsl(url.query)).get('page', 1))
+        contacts = [
+            u'{"email":"first@example.com","first_name":"F\u00f6rsta","active":true,"attributes":{"city":"Stockholm"},"lists":[{"hash":"aaa","subscription_cancelled":null},{"hash":"bbb","subscription_cancelled":"2016-02-15T06:50:44Z"}]}',
+            u'{"email":"second@example.com","first_name":"Second","active":false,"attributes":{"zip-code":"11122"},"lists":[]}',
+            u'{"email":"third@example.com","first_name":null,"active":true,"attributes":{},"lists":[{"hash":"aaa"},{"hash":"ccc"}]}'
+        ][(page - 1) * 2:page * 2]
+        next_link = '"https://api.getanewsletter.com/v3/contacts/?page=2&paginate_by=2"' if page == 1 else 'null'
+        content = u'{"count":3,"next":%s,"previous":null,"results":[%s]}' % (next_link, u','.join(contacts))
+        return {'status_code': 200,
+                'content': content.encode('utf-8')}
+
+    def test_row_groups(self):
+        exporter = ContactExporter(self.contact_manager, row_group_size=2)
+        with HTTMock(self.contacts_mock):
+            row_groups = list(exporter.iter_row_groups())
+        self.assertEqual([len(row_group['email']) for row_group in row_groups], [2, 1])
+        self.assertEqual(row_groups[0]['attributes.city'], ['Stockholm', None])
+        self.assertEqual(row_groups[0]['attributes.zip-code'], [None, '11122'])
+        self.assertEqual(row_groups[0]['lists'], ['aaa', ''])
+        self.assertEqual(row_groups[0]['cancelled_lists'], ['bbb', ''])
+        self.assertEqual(row_groups[1]['lists'], ['aaa ccc'])
+
+    def test_csv(self):
+        exporter = ContactExporter(self.contact_manager, row_group_size=2, attributes=['city'])
+        out = io.BytesIO()
+        with HTTMock(self.contacts_mock):
+            report = exporter.to_csv(out)
+        rows = list(csv.reader(io.BytesIO(out.getvalue())))
+        self.assertEqual(rows[0], ['email', 'first_name', 'last_name', 'active', 'created', 'updated',
+                                   'attributes.city', 'lists', 'cancelled_lists'])
+        self.assertEqual(rows[1][:2], ['first@example.com', u'F\u00f6rsta'.encode('utf-8')])
+        self.assertEqual(rows[3][1], '')
+        self.assertEqual(report.rows, 3)
+        self.assertEqual(report.row_groups, 2)
+        self.assertTrue(report.peak_memory_kb > 0)
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_npz(self):
+        path = os.path.join(self.tempdir, 'contacts.npz')
+        exporter = ContactExporter(self.contact_manager, row_group_size=2, attributes=['city'])
+        with HTTMock(self.contacts_mock):
+            exporter.to_npz(path)
+        archive = numpy.load(path)
+        self.assertEqual(sorted(archive.files), ['row_group_00000', 'row_group_00001'])
+        self.assertEqual(list(archive['row_group_00000']['active']), [True, False])
+        self.assertEqual(archive['row_group_00001']['email'][0], u'third@example.com')
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_arrow(self):
+        path = os.path.join(self.tempdir, 'contacts.arrow')
+        exporter = ContactExporter(self.contact_manager, row_group_size=2, attributes=['city'])
+        with HTTMock(self.contacts_mock):
+            exporter.to_arrow(path)
+        reader = pyarrow.RecordBatchFileReader(pyarrow.OSFile(path))
+        self.assertEqual(reader.num_record_batches, 2)
+        table = reader.read_all()
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(table.column('attributes.city').to_pylist(), [u'Stockholm', None, None])
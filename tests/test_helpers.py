@@ -0,0 +1,128 @@
+import gc
+import json
+import threading
+import time
+import unittest
+import urlparse
+from ganapi import Api, AttributeManager
+from ganapi.helpers import BackgroundIterator, bounded_imap
+from httmock import HTTMock, all_requests
+
+
+class BoundedImapTest(unittest.TestCase):
+    def test_ordered(self):
+        def slow_square(i):
+            time.sleep(0.001 * (10 - i))
+            return i * i
+        self.assertEqual(list(bounded_imap(slow_square, iter(range(10)), 4)),
+                         [i * i for i in range(10)])
+
+    def test_unordered(self):
+        results = list(bounded_imap(lambda i: i * 2, iter(range(20)), 3, window=5, ordered=False))
+        self.assertEqual(sorted(results), [i * 2 for i in range(20)])
+
+    def test_lazy_input(self):
+        consumed = []
+
+        def source():
+            for i in range(100):
+                consumed.append(i)
+                yield i
+
+        results = bounded_imap(lambda i: i, source(), 2, window=4)
+        self.assertEqual(next(results), 0)
+        self.assertTrue(len(consumed) <= 5)
+        results.close()
+
+    def test_error(self):
+        def fail(i):
+            if i == 3:
+                raise ValueError(i)
+            return i
+        self.assertRaises(ValueError, list, bounded_imap(fail, range(6), 2))
+        self.assertRaises(ValueError, list, bounded_imap(fail, range(6), 2, ordered=False))
+
+
+class BackgroundIteratorTest(unittest.TestCase):
+    def setUp(self):
+        self.closed = []
+
+    def source(self):
+        try:
+            for i in xrange(1000000):
+                yield i
+        finally:
+            self.closed.append(True)
+
+    def wait_for_threads(self, count):
+        deadline = time.time() + 2
+        while threading.active_count() > count and time.time() < deadline:
+            time.sleep(0.01)
+
+    def test_iterates_in_order(self):
+        self.assertEqual(list(BackgroundIterator(iter(range(5)), 2)), range(5))
+
+    def test_abandoned_iterators_stop(self):
+        threads = threading.active_count()
+        for _ in range(5):
+            for item in BackgroundIterator(self.source(), 4):
+                if item == 3:
+                    break
+        gc.collect()
+        self.wait_for_threads(threads)
+        self.assertEqual(threading.active_count(), threads)
+        self.assertEqual(len(self.closed), 5)
+
+    def test_context_manager(self):
+        threads = threading.active_count()
+        with BackgroundIterator(self.source(), 2) as items:
+            self.assertEqual(items.next(), 0)
+        self.wait_for_threads(threads)
+        self.assertEqual(threading.active_count(), threads)
+        self.assertEqual(self.closed, [True])
+        self.assertRaises(StopIteration, items.next)
+
+
+class PaginatedResultSetTest(unittest.TestCase):
+    def setUp(self):
+        self.attribute_manager = AttributeManager(Api(token='token'))
+        self.pages = []
+
+    @all_requests
+    def attributes_mock(self, url, request):
+        query = dict(urlparse.parse_qsl(url.query))
+        page = int(query.get('page', 1))
+        self.pages.append(page)
+        codes = ['attr{0}'.format(i) for i in range((page - 1) * 10, min(page * 10, 25))]
+        content = {'count': 25,
+                   'next': 'https://api.getanewsletter.com/v3/attributes/?paginate_by=10&page={0}'.format(page + 1) if page < 3 else None,
+                   'previous': 'https://api.getanewsletter.com/v3/attributes/?paginate_by=10' if page > 1 else None,
+                   'results': [{'name': code, 'code': code} for code in codes]}
+        return {'status_code': 200,
+                'content': json.dumps(content)}
+
+    def test_page_cache(self):
+        with HTTMock(self.attributes_mock):
+            result_set = self.attribute_manager.query({'paginate_by': 10})
+            self.assertEqual(len(result_set), 3)
+            self.assertEqual(len(result_set.next()), 10)
+            self.assertEqual(result_set.prev()[0].code, 'attr0')
+            self.assertEqual(result_set.page(3)[-1].code, 'attr24')
+            self.assertEqual(result_set.page(2)[0].code, 'attr10')
+            self.assertEqual(result_set.page_number, 2)
+            self.assertRaises(IndexError, result_set.page, 4)
+            self.assertRaises(IndexError, result_set.page, 0)
+        self.assertEqual(self.pages, [1, 2, 3])
+
+    def test_prefetch(self):
+        with HTTMock(self.attributes_mock):
+            result_set = self.attribute_manager.query({'paginate_by': 10}, prefetch=True)
+            for _ in range(100):
+                if result_set.pages.get(2) is not None:
+                    break
+                time.sleep(0.01)
+            self.assertEqual(self.pages, [1, 2])
+            self.assertEqual(result_set.next()[0].code, 'attr10')
+            self.assertEqual(result_set.next()[0].code, 'attr20')
+            self.assertRaises(StopIteration, result_set.next)
+        self.assertEqual(self.pages, [1, 2, 3])
@@ -0,0 +1,78 @@
+import json
+import random
+import unittest
+from ganapi import Api, ContactManager
+from ganapi import membership
+from ganapi.membership import MembershipIndex
+from httmock import HTTMock, all_requests
+
+
+class MembershipIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.contacts = [
+            {'email': 'first@example.com',
+             'lists': [{'hash': 'aaa', 'subscription_cancelled': None},
+                       {'hash': 'bbb', 'subscription_cancelled': '2016-02-15T06:50:44Z'}]},
+            {'email': 'second@example.com',
+             'lists': [{'hash': 'aaa', 'subscription_cancelled': None},
+                       {'hash': 'ccc', 'subscription_cancelled': None}]},
+            {'email': 'third@example.com',
+             'lists': [{'hash': 'bbb', 'subscription_cancelled': None}]},
+            {'email': 'fourth@example.com',
+             'lists': []}
+        ]
+
+    @all_requests
+    def contacts_mock(self, url, request):
+        return {'status_code': 200,
+                'content': json.dumps({'count': len(self.contacts), 'next': None, 'previous': None,
+                                       'results': self.contacts})}
+
+    def test_segments(self):
+        with HTTMock(self.contacts_mock):
+            index = MembershipIndex.build(ContactManager(Api(token='token')))
+        aaa = index.subscribers('aaa')
+        bbb = index.subscribers('bbb')
+        self.assertEqual(len(index), 4)
+        self.assertEqual(index.lists, ['aaa', 'bbb', 'ccc'])
+        self.assertEqual(aaa.emails(), ['first@example.com', 'second@example.com'])
+        self.assertEqual(bbb.emails(), ['third@example.com'])
+        self.assertEqual(index.subscribers('bbb', 'cancelled').emails(), ['first@example.com'])
+        self.assertEqual(len(index.subscribers('bbb', 'all')), 2)
+        self.assertEqual((aaa | bbb).emails(), ['first@example.com', 'second@example.com', 'third@example.com'])
+        self.assertEqual(list(aaa - index.subscribers('ccc')), ['first@example.com'])
+        self.assertEqual((aaa & index.subscribers('bbb', 'all')).emails(), ['first@example.com'])
+        self.assertEqual((~(aaa | bbb)).emails(), ['fourth@example.com'])
+        self.assertIn('second@example.com', aaa)
+        self.assertNotIn('third@example.com', aaa)
+        self.assertNotIn('unknown@example.com', aaa)
+        self.assertFalse(index.subscribers('missing'))
+        self.assertEqual(index.segment(all_of=['aaa'], none_of=['bbb']).emails(), ['second@example.com'])
+        self.assertEqual(index.segment(any_of=['bbb', 'ccc']).emails(), ['second@example.com', 'third@example.com'])
+        self.assertRaises(ValueError, index.subscribers, 'aaa', 'unknown')
+        self.assertRaises(ValueError, lambda: aaa & MembershipIndex().everyone())
+        self.assertRaises(ValueError, index.add, 'first@example.com', [])
+
+    def test_add_after_query(self):
+        index = MembershipIndex()
+        index.add('first@example.com', [{'hash': 'aaa'}])
+        self.assertEqual(len(index.subscribers('aaa')), 1)
+        index.add('second@example.com', [{'hash': 'aaa', 'cancelled': True}])
+        index.add('third@example.com', [{'hash': 'aaa'}])
+        self.assertEqual(index.subscribers('aaa').emails(), ['first@example.com', 'third@example.com'])
+        self.assertEqual(len(index.everyone()), 3)
+
+    def test_bitsets(self):
+        random.seed(1)
+        for size in (0, 1, 7, 8, 9, 1000):
+            ids = sorted(random.sample(xrange(size), size // 3))
+            bits = membership.ids_to_bits(iter(ids), size)
+            self.assertEqual(bits, sum(1 << id for id in ids))
+            self.assertEqual(membership.bits_to_ids(bits), ids)
+            numpy = membership.numpy
+            membership.numpy = None
+            try:
+                self.assertEqual(membership.ids_to_bits(iter(ids), size), bits)
+                self.assertEqual(membership.bits_to_ids(bits), ids)
+            finally:
+                membership.numpy = numpy
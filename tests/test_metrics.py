@@ -0,0 +1,70 @@
+import unittest
+from ganapi import Api, ContactManager, GanException, Metrics, RetryPolicy
+from ganapi.metrics import Histogram, endpoint_of
+from httmock import HTTMock, all_requests
+
+
+class MetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.metrics = Metrics()
+        self.api = Api(token='token', metrics=self.metrics,
+                       retry_policy=RetryPolicy(max_retries=3, backoff_factor=0))
+        self.contact_manager = ContactManager(self.api)
+        self.requests = []
+
+    @all_requests
+    def contact_mock(self, url, request):
+        self.requests.append(request)
+        if len(self.requests) == 1:
+            return {'status_code': 503,
+                    'headers': {'Retry-After': '0'},
+                    'content': ''}
+        return {'status_code': 200,
+                'content': '{"email":"test@example.com","first_name":"Test","attributes":{},"lists":[]}'}
+
+    def test_endpoint_of(self):
+        self.assertEqual(endpoint_of('contacts/test@example.com/'), 'contacts/{id}/')
+        self.assertEqual(endpoint_of('contacts/?paginate_by=25&page=2'), 'contacts/')
+        self.assertEqual(endpoint_of('lists/2anfLVM/subscribers/'), 'lists/{id}/subscribers/')
+
+    def test_histogram(self):
+        histogram = Histogram((1, 10))
+        for value in (0.5, 1, 5, 50):
+            histogram.observe(value)
+        self.assertEqual(histogram.cumulative(), [(1, 2), (10, 3), (float('inf'), 4)])
+        self.assertEqual(histogram.sum, 56.5)
+
+    def test_call_metrics(self):
+        with HTTMock(self.contact_mock):
+            contact = self.contact_manager.get('test@example.com')
+        self.assertEqual(contact.first_name, 'Test')
+
+        snapshot = self.metrics.snapshot()
+        stats = snapshot['requests']['GET contacts/{id}/']
+        self.assertEqual(stats['count'], 1)
+        self.assertEqual(stats['retries'], 1)
+        self.assertEqual(stats['status'], {'200': 1})
+        self.assertTrue(stats['bytes_received']['sum'] > 0)
+        for phase in ('network', 'decode', 'construct'):
+            self.assertEqual(snapshot['phases'][phase]['count'], 1)
+
+    def test_prometheus(self):
+        with HTTMock(self.contact_mock):
+            self.contact_manager.get('test@example.com')
+        text = self.metrics.prometheus()
+        self.assertTrue('# TYPE ganapi_request_duration_seconds histogram' in text)
+        self.assertTrue('ganapi_request_duration_seconds_count{method="GET",endpoint="contacts/{id}/"} 1' in text)
+        self.assertTrue('ganapi_request_retries_total{method="GET",endpoint="contacts/{id}/"} 1' in text)
+        self.assertTrue('ganapi_responses_total{method="GET",endpoint="contacts/{id}/",status="200"} 1' in text)
+        self.assertTrue('ganapi_phase_duration_seconds_count{phase="decode"} 1' in text)
+
+    def test_hooks(self):
+        calls = []
+        api = Api(token='token', retry_policy=False)
+        api.add_hook('pre_request', lambda method, path, payload: calls.append(('pre', method, path)))
+        api.add_hook('post_request', lambda method, path, response, seconds: calls.append(('post', response.status_code)))
+        self.requests = [None]
+        with HTTMock(self.contact_mock):
+            api.call('GET', 'contacts/test@example.com/')
+        self.assertEqual(calls, [('pre', 'GET', 'contacts/test@example.com/'), ('post', 200)])
+        self.assertRaises(GanException, api.add_hook, 'on_error', lambda: None)
@@ -0,0 +1,65 @@
+import json
+import unittest
+from ganapi import Api
+from ganapi.mirror import LocalMirror
+from httmock import HTTMock, all_requests
+
+
+class LocalMirrorTest(unittest.TestCase):
+    def setUp(self):
+        gan_token = 'h027MapNNujPH0gV+sXAdmzZTDffHOpJEHaBtrD3NXtNqI4dT3NLXhyTwiZr7PUOGZJNSGv/b9xVyaguX0nDrONGhudPkxtl5EoXrM4SOZHswebpSy2ehh0edrGVF7dVJVZLIlRwgViY3n3/2hMQ5Njp9JFywnOy7gMeaoKw0hYLRbd+wVqvl2oOnspXwGTTcZ9Y+cdP8jIhUUoXOieXst0IXVclAHXa+K1d15gKLcpmXzK+jx14wGEmb4t8MSU'
+        self.api = Api(token=gan_token)
+        self.mirror = LocalMirror(self.api, ':memory:')
+        self.start_path = '/v3'
+        self.contacts = [
+            {'email': 'first@example.com', 'updated': '2016-02-08T14:40:17', 'active': True,
+             'attributes': {'city': 'Stockholm'},
+             'lists': [{'hash': 'aaa', 'subscription_cancelled': None},
+                       {'hash': 'bbb', 'subscription_cancelled': '2016-02-15T06:50:44Z'}]},
+            {'email': 'second@example.com', 'updated': '2016-02-08T14:40:17', 'active': True,
+             'attributes': {'city': 'Gothenburg'},
+             'lists': [{'hash': 'aaa', 'subscription_cancelled': None}]}
+        ]
+
+    def tearDown(self):
+        self.mirror.close()
+
+    @all_requests
+    def api_mock(self, url, request):
+        results = {
+            '/lists/': [{'hash': 'aaa', 'name': 'List A'}, {'hash': 'bbb', 'name': 'List B'}],
+            '/attributes/': [{'code': 'city', 'name': 'City'}],
+            '/contacts/': self.contacts
+        }[url.path[len(self.start_path):]]
+        return {'status_code': 200,
+                'content': json.dumps({'count': len(results), 'next': None, 'previous': None, 'results': results})}
+
+    def test_sync_and_lookups(self):
+        with HTTMock(self.api_mock):
+            report = self.mirror.sync()
+        self.assertEqual((report.added, report.updated, report.unchanged, report.deleted), (2, 0, 0, 0))
+        self.assertEqual(self.mirror.get_contact('first@example.com')['attributes'], {'city': 'Stockholm'})
+        self.assertEqual(self.mirror.get_list('aaa')['name'], 'List A')
+        self.assertEqual(self.mirror.get_attribute('city')['name'], 'City')
+        self.assertTrue(self.mirror.is_subscribed('first@example.com', 'aaa'))
+        self.assertFalse(self.mirror.is_subscribed('first@example.com', 'bbb'))
+        self.assertEqual(self.mirror.list_members('aaa'), ['first@example.com', 'second@example.com'])
+        self.assertEqual(self.mirror.count_list_members('bbb', include_cancelled=True), 1)
+        self.assertEqual(self.mirror.contacts_with_attribute('city', 'Gothenburg'), ['second@example.com'])
+        self.assertTrue(self.mirror.last_sync is not None)
+
+    def test_incremental_sync(self):
+        with HTTMock(self.api_mock):
+            self.mirror.sync()
+            self.contacts[0] = dict(self.contacts[0], updated='2016-03-01T10:00:00', attributes={'city': 'Malmo'})
+            del self.contacts[1]
+            self.contacts.append({'email': 'third@example.com', 'updated': '2016-03-01T10:00:00', 'lists': []})
+            report = self.mirror.sync()
+        self.assertEqual((report.added, report.updated, report.unchanged, report.deleted), (1, 1, 0, 1))
+        self.assertEqual(self.mirror.get_contact('second@example.com'), None)
+        self.assertEqual(self.mirror.contacts_with_attribute('city', 'Malmo'), ['first@example.com'])
+        self.assertEqual(self.mirror.list_members('aaa'), ['first@example.com'])
+
+        with HTTMock(self.api_mock):
+            report = self.mirror.sync()
+        self.assertEqual((report.added, report.updated, report.unchanged, report.deleted), (0, 0, 2, 0))
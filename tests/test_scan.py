@@ -0,0 +1,115 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import urlparse
+from ganapi import Api, ContactManager, GanException, ScanCursor
+from httmock import HTTMock, all_requests
+
+
+class ScanTest(unittest.TestCase):
+    def setUp(self):
+        self.api = Api(token='token')
+        self.api.batch_size = 3
+        self.contact_manager = ContactManager(self.api)
+        self.emails = ['{i:02d}@example.com'.format(i=i) for i in range(10)]
+        self.directory = tempfile.mkdtemp()
+        self.checkpoint = os.path.join(self.directory, 'scan.checkpoint')
+        self.pages = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    @all_requests
+    def contacts_mock(self, url, request):
+        query = urlparse.parse_qs(url.query)
+        page_size = int(query['paginate_by'][0])
+        page = int(query.get('page', ['1'])[0])
+        self.pages.append(page)
+        emails = self.emails[(page - 1) * page_size:page * page_size]
+        has_next = page * page_size < len(self.emails)
+        return {'status_code': 200,
+                'content': json.dumps({'count': len(self.emails),
+                                       'next': 'https://api.getanewsletter.com/v3/contacts/?page=%d' % (page + 1)
+                                               if has_next else None,
+                                       'previous': None,
+                                       'results': [{'email': email, 'first_name': email[:2]} for email in emails]})}
+
+    def test_full_scan(self):
+        with HTTMock(self.contacts_mock):
+            scan = self.contact_manager.scan(self.checkpoint, mode='dict', fields=['email'])
+            emails = [row['email'] for row in scan]
+        self.assertEqual(emails, self.emails)
+        self.assertEqual(self.pages, [1, 2, 3, 4])
+        cursor = ScanCursor.load(self.checkpoint)
+        self.assertTrue(cursor.done)
+        self.assertEqual(cursor.emitted, 10)
+        with HTTMock(self.contacts_mock):
+            self.assertEqual(list(self.contact_manager.scan(self.checkpoint)), [])
+
+    def scan_until_crash(self, processed, checkpoint_every=2, on_checkpoint=None):
+        with HTTMock(self.contacts_mock):
+            scan = self.contact_manager.scan(self.checkpoint, checkpoint_every=checkpoint_every,
+                                             on_checkpoint=on_checkpoint)
+            for contact in scan:
+                if len(processed) == 5:
+                    # The process dies while handling the sixth contact.
+                    return
+                processed.append(contact.email)
+
+    def test_resume(self):
+        processed = []
+        self.scan_until_crash(processed)
+        self.assertEqual(ScanCursor.load(self.checkpoint).emitted, 4)
+        # The output of the contacts after the last checkpoint is discarded.
+        del processed[4:]
+        with HTTMock(self.contacts_mock):
+            scan = self.contact_manager.scan(self.checkpoint)
+            self.assertTrue(scan.resumed)
+            processed.extend(contact.email for contact in scan)
+        self.assertEqual(processed, self.emails)
+
+    def test_resume_after_changes(self):
+        processed = []
+        self.scan_until_crash(processed)
+        # Contacts before the cursor were removed and added.
+        self.emails.remove('00@example.com')
+        self.emails.remove('01@example.com')
+        self.emails.append('10@example.com')
+        del processed[4:]
+        with HTTMock(self.contacts_mock):
+            processed.extend(contact.email for contact in self.contact_manager.scan(self.checkpoint))
+        self.assertEqual(processed, ['{i:02d}@example.com'.format(i=i) for i in range(11)])
+
+        self.emails = ['{i:02d}@example.com'.format(i=i) for i in range(10)]
+        os.remove(self.checkpoint)
+        processed = []
+        self.scan_until_crash(processed)
+        self.emails.insert(0, '-1@example.com')
+        del processed[4:]
+        with HTTMock(self.contacts_mock):
+            processed.extend(contact.email for contact in self.contact_manager.scan(self.checkpoint))
+        self.assertEqual(processed, ['{i:02d}@example.com'.format(i=i) for i in range(10)])
+
+    def test_on_checkpoint_state(self):
+        output = []
+
+        def on_checkpoint(cursor):
+            cursor.state['output_size'] = len(output)
+
+        self.scan_until_crash(output, on_checkpoint=on_checkpoint)
+        cursor = ScanCursor.load(self.checkpoint)
+        del output[cursor.state['output_size']:]
+        with HTTMock(self.contacts_mock):
+            for contact in self.contact_manager.scan(cursor=cursor, on_checkpoint=on_checkpoint):
+                output.append(contact.email)
+        self.assertEqual(output, self.emails)
+        self.assertEqual(cursor.state['output_size'], 10)
+
+    def test_invalid_checkpoint(self):
+        with open(self.checkpoint, 'w') as checkpoint_file:
+            checkpoint_file.write('{')
+        self.assertRaises(GanException, self.contact_manager.scan, self.checkpoint)
+        cursor = ScanCursor('lists', 3)
+        self.assertRaises(GanException, self.contact_manager.scan, cursor=cursor)
@@ -0,0 +1,141 @@
+import json
+import threading
+import unittest
+from ganapi import Api, Contact, FlushError, GanException, List, Session
+from httmock import HTTMock, all_requests
+
+
+class SessionTest(unittest.TestCase):
+    def setUp(self):
+        self.api = Api(token='token')
+        self.session = Session(self.api, concurrency=3)
+        self.requests = []
+        self.lock = threading.Lock()
+
+    @all_requests
+    def api_mock(self, url, request):
+        resource, id = url.path.split('/')[2:4]
+        body = json.loads(request.body) if request.body else None
+        with self.lock:
+            self.requests.append((request.method, resource, id, body))
+        if request.method == 'DELETE':
+            return {'status_code': 204,
+                    'content': ''}
+        if resource == 'lists':
+            data = {'hash': id or 'newHash', 'name': 'News', 'responders': []}
+        else:
+            data = {'email': id, 'first_name': 'John', 'last_name': None, 'attributes': {'city': 'Lund'},
+                    'lists': [], 'active': True}
+        data.update(body or {})
+        return {'status_code': 201 if request.method == 'POST' else 200,
+                'content': json.dumps(data)}
+
+    def test_identity_map(self):
+        with HTTMock(self.api_mock):
+            first = self.session.get(Contact, 'john@example.com')
+            second = self.session.get(Contact, 'john@example.com')
+        self.assertIs(first, second)
+        self.assertIn(first, self.session)
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(self.session.dirty, [])
+
+    def test_flush_coalesces_changes(self):
+        with HTTMock(self.api_mock):
+            list = self.session.create(List)
+            list.name = 'News'
+            contact = self.session.get(Contact, 'john@example.com')
+            contact.first_name = 'Johnny'
+            contact.save()
+            self.session.get(Contact, 'john@example.com').attributes['city'] = 'Malmo'
+            self.session.get(Contact, 'john@example.com').subscribe_to(list)
+            other = self.session.get(Contact, 'jane@example.com')
+            other.save()
+            self.assertEqual(len(self.requests), 2)
+            self.assertEqual(self.session.dirty, [contact, list])
+
+            report = self.session.flush()
+
+        writes = [(method, resource, id, body) for method, resource, id, body in self.requests if method != 'GET']
+        self.assertEqual(writes[0][:3], ('POST', 'lists', ''))
+        self.assertEqual(writes[1], ('PATCH', 'contacts', 'john@example.com',
+                                     {'first_name': 'Johnny', 'attributes': {'city': 'Malmo'},
+                                      'lists': [{'hash': 'newHash', 'name': 'News'}]}))
+        self.assertEqual(len(writes), 2)
+        self.assertEqual(report.created, 1)
+        self.assertEqual(report.updated, 1)
+        self.assertEqual(list.hash, 'newHash')
+        self.assertTrue(list.is_persisted())
+        self.assertIs(self.session.get(List, 'newHash'), list)
+        self.assertEqual(self.session.dirty, [])
+        with HTTMock(self.api_mock):
+            self.assertEqual(self.session.flush().processed, 0)
+        self.assertEqual(len(self.requests), 4)
+
+    def test_subscribe_to_several_lists(self):
+        with HTTMock(self.api_mock):
+            news = self.session.create(List)
+            news.name = 'News'
+            offers = self.session.get(List, 'offers')
+            for list in (news, offers, news, offers):
+                contact = self.session.get(Contact, 'john@example.com')
+                contact.subscribe_to(list)
+                contact.save()
+            self.assertEqual(len(contact.lists), 2)
+            report = self.session.flush()
+
+        self.assertEqual(report.failed, 0)
+        writes = [(method, resource, id, body) for method, resource, id, body in self.requests if method != 'GET']
+        self.assertEqual(writes[1][:3], ('PATCH', 'contacts', 'john@example.com'))
+        self.assertEqual([item['hash'] for item in writes[1][3]['lists']], ['newHash', 'offers'])
+        contact.unsubscribe_from(offers)
+        self.assertEqual((contact.lists[1]['hash'], contact.lists[1]['cancelled']), ('offers', True))
+        contact.delete_subscription_from(offers)
+        self.assertEqual(len(contact.lists), 1)
+
+    def test_delete_and_context_manager(self):
+        with HTTMock(self.api_mock):
+            with Session(self.api) as session:
+                contact = session.get(Contact, 'john@example.com')
+                contact.delete()
+                self.assertRaises(GanException, session.get, Contact, 'john@example.com')
+                new = session.create(Contact)
+                new.email = 'new@example.com'
+                new.save()
+                self.assertIs(session.get(Contact, 'new@example.com'), new)
+        self.assertEqual([(method, id) for method, resource, id, body in self.requests],
+                         [('GET', 'john@example.com'), ('POST', ''), ('DELETE', 'john@example.com')])
+
+    def test_failed_entities_stay_pending(self):
+        @all_requests
+        def failing_mock(url, request):
+            return {'status_code': 400,
+                    'content': '{"detail":"Bad request."}'}
+
+        with HTTMock(self.api_mock):
+            contact = self.session.get(Contact, 'john@example.com')
+        contact.first_name = 'Johnny'
+        with HTTMock(failing_mock):
+            report = self.session.flush()
+        self.assertEqual(report.failed, 1)
+        self.assertEqual(self.session.dirty, [contact])
+        with HTTMock(self.api_mock):
+            self.assertEqual(self.session.flush().updated, 1)
+        self.assertEqual(self.session.dirty, [])
+
+    def test_context_manager_raises_on_failure(self):
+        @all_requests
+        def failing_mock(url, request):
+            if request.method == 'GET':
+                return self.api_mock(url, request)
+            return {'status_code': 400,
+                    'content': '{"detail":"Bad request."}'}
+
+        with HTTMock(failing_mock):
+            with self.assertRaises(FlushError) as raised:
+                with self.session as session:
+                    session.get(Contact, 'john@example.com').first_name = 'Johnny'
+        self.assertEqual(raised.exception.report.failed, 1)
+        self.assertEqual(raised.exception.failures[0].item.email, 'john@example.com')
+        self.assertEqual(raised.exception.failures[0].error.response.status_code, 400)
+        self.assertEqual(len(self.session.dirty), 1)
+